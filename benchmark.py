@@ -0,0 +1,561 @@
+#!/usr/bin/env python3
+"""Benchmarks for the installer's own overhead, without a real Docker host.
+
+Puts fake 'docker', 'sudo' and 'usermod' executables first on PATH, serves a
+fake Docker Engine API on a unix socket and drives ImmichInstallerApp with a
+stubbed Tk root. Reports:
+
+  * log:       lines/sec through run_live_command -> LogSink -> log window
+  * discovery: time to find installations in a synthetic /home tree
+  * install:   end-to-end install time, with a per-step breakdown
+
+Example:
+    ./benchmark.py --files 1000000 --latency 0.05 --fail-rate 0.1
+"""
+import argparse
+import heapq
+import http.server
+import json
+import os
+import shutil
+import socketserver
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import types
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+FAKE_DOCKER = r"""#!/bin/sh
+# Simulated docker CLI (benchmark.py)
+[ -n "$FAKE_DOCKER_LOG" ] && echo "$*" >> "$FAKE_DOCKER_LOG"
+sleep "${FAKE_DOCKER_LATENCY:-0}"
+fail() {
+    r=$(od -An -N2 -tu2 /dev/urandom | tr -d ' ')
+    [ $((r % 10000)) -lt "${FAKE_DOCKER_FAIL_PERMYRIAD:-0}" ]
+}
+pull_output() {
+    awk -v n="${FAKE_PULL_LINES:-1000}" 'BEGIN {
+        for (i = 0; i < n; i++)
+            printf "%012x Downloading [=====>        ]  %d.%dMB/120.5MB\n", i % 7, i % 120, i % 10
+    }'
+}
+case "$1" in
+    --version) echo "Docker version 99.0.0, build fake" ;;
+    compose)
+        case "$2" in
+            pull) fail && { echo "simulated pull failure" >&2; exit 1; }; pull_output ;;
+        esac ;;
+    pull) fail && { echo "simulated pull failure" >&2; exit 1; }; pull_output ;;
+    exec)
+        case "$*" in
+            *redis-cli*) echo PONG ;;
+            *"SELECT tablename"*) printf 'assets\nalbums\n' ;;
+            *"count(*)"*) printf 'assets|1200\nalbums|12\n' ;;
+            *3003/predict*) echo "COLD 2.5"; echo "WARM 0.2" ;;
+            *) echo "/var/run/postgresql:5432 - accepting connections" ;;
+        esac ;;
+    logs) echo "fake log line" ;;
+    run)
+        mount=$(echo "$*" | sed -n 's/.* -v \([^ :]*\):\/backup.*/\1/p')
+        case "$*" in
+            *"--entrypoint pg_dump"*)
+                # Database dump (see --backup): a table of contents and a few compressed data files
+                echo "fake toc" > "$mount/toc.dat"
+                for table in 3001 3002 3003 3004; do
+                    head -c $((${FAKE_DUMP_MB:-8} * 196608)) /dev/urandom | base64 | gzip -1 > "$mount/$table.dat.gz"
+                done ;;
+            *"--entrypoint pg_restore"*) ;;
+            *) cat > /dev/null ;;
+        esac ;;
+    volume) echo "$*" | awk '{print $NF}' ;;
+esac
+exit 0
+"""
+
+FAKE_SUDO = r"""#!/bin/sh
+# Simulated sudo (benchmark.py): checks the password line, then runs the command unprivileged
+while [ $# -gt 0 ]; do
+    case "$1" in
+        -p) shift 2 ;;
+        --) shift; break ;;
+        -*) shift ;;
+        *) break ;;
+    esac
+done
+IFS= read -r pw
+sleep "${FAKE_SUDO_LATENCY:-0}"
+if [ "$pw" != "${FAKE_SUDO_PASSWORD:-benchmark}" ]; then
+    echo "Sorry, try again." >&2
+    sleep 3600
+    exit 1
+fi
+exec "$@"
+"""
+
+FAKE_USERMOD = "#!/bin/sh\nexit 0\n"
+
+
+# --- Stubbed Tk ---
+
+class HeadlessRoot:
+    """Stands in for tk.Tk: collects after() callbacks and runs them from pump()."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._timers = []
+        self._seq = 0
+
+    def title(self, *args):
+        pass
+
+    def geometry(self, *args):
+        pass
+
+    def after(self, ms, func, *args):
+        with self._lock:
+            self._seq += 1
+            heapq.heappush(self._timers, (time.monotonic() + ms / 1000, self._seq, func, args))
+
+    def pump(self, until, timeout=3600):
+        """Runs due callbacks like Tk's mainloop until until() is true."""
+        deadline = time.monotonic() + timeout
+        while not until():
+            if time.monotonic() > deadline:
+                raise TimeoutError("benchmark did not finish in time")
+            with self._lock:
+                due = self._timers[0][0] if self._timers else None
+                callback = heapq.heappop(self._timers) if due is not None and due <= time.monotonic() else None
+            if callback:
+                callback[2](*callback[3])
+            else:
+                time.sleep(0.002)
+
+
+class FakeVar:
+    def __init__(self, value=None):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+
+
+class FakeWidget:
+    def __init__(self, *args, **kwargs):
+        self.options = kwargs
+
+    def pack(self, *args, **kwargs):
+        pass
+
+    def config(self, **kwargs):
+        self.options.update(kwargs)
+
+    configure = config
+
+    def __setitem__(self, key, value):
+        self.options[key] = value
+
+    def bind(self, *args):
+        pass
+
+    def create_window(self, *args, **kwargs):
+        return 1
+
+    def yview(self, *args):
+        pass
+
+    def set(self, *args):
+        pass
+
+
+class FakeText(FakeWidget):
+    """Keeps the lines like a Tk Text widget so LogSink's trimming is exercised."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lines = []
+
+    def insert(self, index, text):
+        self.lines.extend(text.split("\n")[:-1])
+
+    def index(self, index):
+        return f"{len(self.lines) + 1}.0"
+
+    def delete(self, first, last):
+        del self.lines[:int(last.split(".")[0]) - 1]
+
+    def see(self, index):
+        pass
+
+
+def stub_tk(installer):
+    installer.tk = types.SimpleNamespace(
+        Tk=HeadlessRoot, StringVar=FakeVar, BooleanVar=lambda value=False: FakeVar(value),
+        IntVar=lambda value=0: FakeVar(value), Label=FakeWidget, Frame=FakeWidget, Entry=FakeWidget,
+        Button=FakeWidget, Checkbutton=FakeWidget, Spinbox=FakeWidget, Canvas=FakeWidget,
+        Scrollbar=FakeWidget, END="end")
+    installer.ttk = types.SimpleNamespace(Progressbar=FakeWidget)
+    installer.scrolledtext = types.SimpleNamespace(ScrolledText=FakeText)
+    installer.messagebox = types.SimpleNamespace(
+        showinfo=lambda *a, **k: None, showerror=lambda *a, **k: None, askyesno=lambda *a, **k: True)
+    installer.filedialog = types.SimpleNamespace(
+        askdirectory=lambda **k: "", askopenfilename=lambda **k: "", asksaveasfilename=lambda **k: "")
+
+
+# --- Fake Docker Engine API ---
+
+class FakeEngine:
+    """Just enough of the Engine API for pulls, teardown and readiness probes."""
+
+    def __init__(self, pull_events, fail_rate, latency, fail_first=0, layer_delay=0.0):
+        self.pull_events = pull_events
+        self.fail_rate = fail_rate
+        self.fail_first = fail_first    # The first pulls fail for sure (for tests)
+        self.layer_delay = layer_delay  # Seconds per layer, so that pulls overlap (for tests)
+        self.latency = latency
+        self.present = set()
+        self.lock = threading.Lock()
+        self.pulls = 0
+        self.failures = 0
+        self.active = 0
+        self.max_active = 0  # Most pulls running at the same time
+
+
+def make_handler(engine):
+    import random
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _json(self, code, body):
+            data = json.dumps(body).encode()
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _chunk(self, obj):
+            data = (json.dumps(obj) + "\r\n").encode()
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+
+        def _image_ref(self, prefix, suffix):
+            from urllib.parse import unquote
+            return unquote(self.path.split("?")[0][len(prefix):-len(suffix)])
+
+        def do_GET(self):
+            time.sleep(engine.latency)
+            path = self.path.split("?")[0]
+            if path.startswith("/images/") and path.endswith("/json"):
+                ref = self._image_ref("/images/", "/json")
+                if ref in engine.present:
+                    return self._json(200, {"Id": f"sha256:{ref}", "RepoDigests": [f"{ref.rsplit(':', 1)[0]}@sha256:fake"]})
+                return self._json(404, {"message": f"No such image: {ref}"})
+            if path.startswith("/distribution/"):
+                return self._json(200, {"Descriptor": {"digest": "sha256:fake"}})
+            if path == "/containers/json" or path == "/networks":
+                return self._json(200, [])
+            if path == "/volumes":
+                return self._json(200, {"Volumes": []})
+            if path.startswith("/containers/"):
+                return self._json(200, {"State": {"Status": "running", "Running": True, "Health": {"Status": "healthy"}},
+                                        "RestartCount": 0, "Image": "sha256:fake"})
+            return self._json(404, {"message": "not faked"})
+
+        def do_POST(self):
+            time.sleep(engine.latency)
+            path = self.path.split("?")[0]
+            if path == "/images/create":
+                from urllib.parse import parse_qs, urlparse
+                query = parse_qs(urlparse(self.path).query)
+                ref = f"{query['fromImage'][0]}:{query.get('tag', ['latest'])[0]}"
+                with engine.lock:
+                    engine.pulls += 1
+                    fail = engine.pulls <= engine.fail_first or random.random() < engine.fail_rate
+                    engine.failures += fail
+                    engine.active += 1
+                    engine.max_active = max(engine.max_active, engine.active)
+                try:
+                    self.send_response(200)
+                    self.send_header("Transfer-Encoding", "chunked")
+                    self.end_headers()
+                    layers = 5
+                    per_layer = max(1, engine.pull_events // layers)
+                    for layer in range(layers):
+                        layer_id = f"{layer:012x}"
+                        for i in range(per_layer):
+                            self._chunk({"status": "Downloading", "id": layer_id,
+                                         "progressDetail": {"current": (i + 1) * 100000, "total": per_layer * 100000}})
+                        time.sleep(engine.layer_delay)
+                        if fail and layer == layers // 2:
+                            self._chunk({"error": "simulated connection reset"})
+                            break
+                        self._chunk({"status": "Pull complete", "id": layer_id})
+                    else:
+                        engine.present.add(ref)
+                    self.wfile.write(b"0\r\n\r\n")
+                finally:
+                    with engine.lock:
+                        engine.active -= 1
+                return
+            if path == "/volumes/prune":
+                return self._json(200, {"VolumesDeleted": [], "SpaceReclaimed": 0})
+            return self._json(404, {"message": "not faked"})
+
+        def do_DELETE(self):
+            self.send_response(204)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+    return Handler
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class _PingServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+
+class _PingHandler(http.server.BaseHTTPRequestHandler):
+    """Immich's /api/server/ping, plus a model hub with two small files per model."""
+    model_file_size = 256 * 1024
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.startswith("/api/models/"):
+            data = json.dumps([{"type": "file", "path": path, "size": self.model_file_size}
+                               for path in ("textual/model.onnx", "visual/model.onnx")]).encode()
+        elif "/resolve/main/" in self.path:
+            data = b"\0" * self.model_file_size
+        else:
+            data = b'{"res":"pong"}'
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+# --- Benchmarks ---
+
+def run_in_app(root, target):
+    """Runs target on a worker thread while the main thread pumps the Tk stand-in."""
+    result = {}
+
+    def worker():
+        try:
+            result["value"] = target()
+        except Exception as e:
+            result["error"] = e
+
+    thread = threading.Thread(target=worker, daemon=True)
+    thread.start()
+    root.pump(lambda: not thread.is_alive())
+    if "error" in result:
+        raise result["error"]
+    return result.get("value")
+
+
+def bench_log(installer, app, root, lines, sudo_pw):
+    os.environ["FAKE_PULL_LINES"] = str(lines)
+    widget = app.log_area
+    results = {}
+    for label, password in (("direct", None), ("sudo session", sudo_pw)):
+        start = time.monotonic()
+        run_in_app(root, lambda: app.run_live_command("docker compose pull", sudo_pw=password))
+        # Done once the sink has handed everything to the window (batches beyond LOG_MAX_LINES are cut)
+        root.pump(lambda: app.log_sink._queue.empty())
+        elapsed = time.monotonic() - start
+        results[label] = {"lines": lines, "seconds": round(elapsed, 3), "lines_per_sec": int(lines / elapsed),
+                          "window_lines": len(widget.lines)}
+    app.close_privileged_session()
+    return results
+
+
+def build_tree(root_dir, files, installs=3, users=20):
+    """Synthetic /home: users with deep photo folders and a few Immich installs."""
+    marker = os.path.join(root_dir, f".bench-files-{files}")
+    if os.path.exists(marker):
+        return 0.0
+    shutil.rmtree(root_dir, ignore_errors=True)
+    start = time.monotonic()
+    per_dir = 250
+    dirs = max(1, files // per_dir)
+    for d in range(dirs):
+        user = d % users
+        path = os.path.join(root_dir, f"user{user}", "Pictures", str(2000 + d % 25), f"{d // 25 % 12 + 1:02d}", f"event{d}")
+        os.makedirs(path, exist_ok=True)
+        for f in range(per_dir):
+            open(os.path.join(path, f"IMG_{f:05d}.jpg"), "wb").close()
+    for i in range(installs):
+        install = os.path.join(root_dir, f"user{i}", "immich")
+        os.makedirs(os.path.join(install, "postgres"), exist_ok=True)
+        with open(os.path.join(install, "docker-compose.yml"), "w") as f:
+            f.write("name: immich\n")
+    open(marker, "w").close()
+    return time.monotonic() - start
+
+
+def bench_discovery(installer, app, root, tree, files, sudo_pw):
+    build_seconds = build_tree(tree, files)
+    installer.DISCOVERY_ROOTS = [tree]
+    installer.COMMON_INSTALL_PATHS = []
+    results = {"files": files, "tree_build_seconds": round(build_seconds, 1)}
+
+    start = time.monotonic()
+    found = installer.scan_for_installations(roots=[tree])
+    results["scandir_seconds"] = round(time.monotonic() - start, 3)
+    results["found"] = len(found)
+
+    start = time.monotonic()
+    subprocess.run(f"find {tree} -name 'docker-compose.yml' -type f 2>/dev/null | xargs grep -l 'immich' >/dev/null",
+                   shell=True)
+    results["legacy_find_seconds"] = round(time.monotonic() - start, 3)
+
+    run_in_app(root, lambda: app.find_immich_installations(sudo_pw, rescan=True))
+    start = time.monotonic()
+    run_in_app(root, lambda: app.find_immich_installations(sudo_pw, rescan=False))
+    results["indexed_seconds"] = round(time.monotonic() - start, 3)
+    return results
+
+
+def bench_install(installer, app, root, workdir, sudo_pw, preflight, backup):
+    small_tree = os.path.join(workdir, "install-roots")
+    build_tree(small_tree, 2000, installs=2, users=2)
+    installer.DISCOVERY_ROOTS = [small_tree]
+    installer.COMMON_INSTALL_PATHS = []
+    for name in ("inst", "photos", "ext"):
+        os.makedirs(os.path.join(workdir, name), exist_ok=True)
+    app.root_pass.set(sudo_pw)
+    app.install_path.set(os.path.join(workdir, "inst"))
+    app.photos_path.set(os.path.join(workdir, "photos"))
+    app.ext_lib_path.set(os.path.join(workdir, "ext"))
+    app.stop_existing_var.set(True)
+    app.rescan_var.set(True)
+    app.preflight_var.set(preflight)
+    app.update_var.set(False)
+    if backup:
+        # Dump the (fake) database before the removal and load it back after the start
+        app.backup_path.set(os.path.join(workdir, "backups"))
+        app.restore_backup_var.set(True)
+
+    start = time.monotonic()
+    run_in_app(root, app.install_logic)
+    total = time.monotonic() - start
+    steps = {e["name"]: round(e["duration_s"], 3) for e in app.tracer.events if e["category"] == "step"}
+    subprocesses = [e for e in app.tracer.events if e["category"] == "subprocess"]
+    return {"seconds": round(total, 3), "steps": steps, "subprocesses": len(subprocesses),
+            "subprocess_seconds": round(sum(e["duration_s"] for e in subprocesses), 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", choices=["log", "discovery", "install"], action="append",
+                        help="run only these benchmarks (repeatable)")
+    parser.add_argument("--lines", type=int, default=200000, help="pull-progress lines for the log benchmark")
+    parser.add_argument("--files", type=int, default=1000000, help="files in the synthetic /home tree")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every fake docker/API call")
+    parser.add_argument("--sudo-latency", type=float, default=0.0, help="seconds added to every fake sudo start")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="probability that a pull fails (0..1)")
+    parser.add_argument("--pull-events", type=int, default=2000, help="progress events per image pull")
+    parser.add_argument("--preflight", action="store_true", help="include the storage preflight in the install")
+    parser.add_argument("--backup", action="store_true", help="include the database backup and restore in the install")
+    parser.add_argument("--dump-mb", type=int, default=8, help="size of each simulated database table for --backup")
+    parser.add_argument("--workdir", help="keep synthetic trees here between runs (default: temporary)")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+    selected = args.only or ["log", "discovery", "install"]
+
+    workdir = os.path.abspath(args.workdir) if args.workdir else tempfile.mkdtemp(prefix="immich-bench-")
+    bindir = os.path.join(workdir, "bin")
+    home = os.path.join(workdir, "home")
+    os.makedirs(bindir, exist_ok=True)
+    os.makedirs(home, exist_ok=True)
+    for name, content in (("docker", FAKE_DOCKER), ("sudo", FAKE_SUDO), ("usermod", FAKE_USERMOD)):
+        path = os.path.join(bindir, name)
+        with open(path, "w") as f:
+            f.write(content)
+        os.chmod(path, 0o755)
+
+    sudo_pw = "benchmark"
+    os.environ.update({
+        "HOME": home,  # Keeps the installer's log, index and traces inside the workdir
+        "PATH": bindir + os.pathsep + os.environ.get("PATH", ""),
+        "FAKE_DOCKER_LATENCY": str(args.latency),
+        "FAKE_DOCKER_FAIL_PERMYRIAD": str(int(args.fail_rate * 10000)),
+        "FAKE_SUDO_LATENCY": str(args.sudo_latency),
+        "FAKE_SUDO_PASSWORD": sudo_pw,
+        "FAKE_DUMP_MB": str(args.dump_mb),
+    })
+
+    sys.path.insert(0, HERE)
+    import installer
+    stub_tk(installer)
+
+    engine = FakeEngine(args.pull_events, args.fail_rate, args.latency)
+    socket_path = os.path.join(workdir, "docker.sock")
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    api_server = _UnixServer(socket_path, make_handler(engine))
+    threading.Thread(target=api_server.serve_forever, daemon=True).start()
+    ping_server = _PingServer(("127.0.0.1", 0), _PingHandler)
+    threading.Thread(target=ping_server.serve_forever, daemon=True).start()
+    installer.DOCKER_SOCKET = socket_path
+    installer.SERVER_PING_URL = f"http://127.0.0.1:{ping_server.server_address[1]}/api/server/ping"
+    installer.ML_MODEL_HUB = f"http://127.0.0.1:{ping_server.server_address[1]}"
+    installer.PULL_RETRY_BACKOFF = 0.1
+
+    root = HeadlessRoot()
+    app = installer.ImmichInstallerApp(root)
+
+    results = {"workdir": workdir}
+    if "log" in selected:
+        print(f"log: pushing {args.lines:,} lines through the log window...", flush=True)
+        results["log"] = bench_log(installer, app, root, args.lines, sudo_pw)
+    if "discovery" in selected:
+        print(f"discovery: scanning a synthetic tree of {args.files:,} files...", flush=True)
+        results["discovery"] = bench_discovery(installer, app, root, os.path.join(workdir, "tree"), args.files,
+                                             sudo_pw)
+    if "install" in selected:
+        print("install: running install_logic end to end...", flush=True)
+        results["install"] = bench_install(installer, app, root, workdir, sudo_pw, args.preflight, args.backup)
+        results["install"]["api_pulls"] = engine.pulls
+        results["install"]["api_pull_failures"] = engine.failures
+
+    print()
+    if "log" in results:
+        for label, r in results["log"].items():
+            print(f"log ({label}): {r['lines_per_sec']:,} lines/s ({r['lines']:,} lines in {r['seconds']}s, "
+                  f"{r['window_lines']} kept in window)")
+    if "discovery" in results:
+        r = results["discovery"]
+        print(f"discovery: scandir {r['scandir_seconds']}s, legacy find|grep {r['legacy_find_seconds']}s, "
+              f"from index {r['indexed_seconds']}s ({r['found']} installs in {r['files']:,} files)")
+    if "install" in results:
+        r = results["install"]
+        print(f"install: {r['seconds']}s end to end, {r['subprocesses']} subprocesses "
+              f"({r['subprocess_seconds']}s), {r['api_pulls']} API pulls ({r['api_pull_failures']} failed)")
+        width = max(map(len, r["steps"]), default=0)
+        for name, seconds in r["steps"].items():
+            print(f"  {name:<{width}}  {seconds:>8.3f}s")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    api_server.shutdown()
+    ping_server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
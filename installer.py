@@ -1,24 +1,57 @@
 #!/usr/bin/env python3
 import sys
 import os
+import argparse
 import subprocess
 import threading
+import queue
 import secrets
 import time
 import urllib.request
 import shutil
+import glob
+import json
+import re
+import collections
+import gzip
+import tarfile
+import hashlib
+import random
+import statistics
+import difflib
+import contextlib
+import itertools
+import shlex
+import tempfile
+import fnmatch
+import fcntl
+import socket
+import http.client
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# tkinter is only imported when the window is opened (see load_tk), so headless runs
+# start faster and work on images without python3-tk
+tk = filedialog = messagebox = scrolledtext = ttk = None
 
-# Check for tkinter dependency explicitly to avoid silent crashes
-try:
-    import tkinter as tk
-    from tkinter import filedialog, messagebox, scrolledtext
-except ImportError:
-    print("ERROR: 'tkinter' is missing.")
-    print("Please install it by running: sudo apt install python3-tk -y")
-    sys.exit(1)
+
+def load_tk():
+    global tk, filedialog, messagebox, scrolledtext, ttk
+    # Check for tkinter dependency explicitly to avoid silent crashes
+    try:
+        import tkinter as tk
+        from tkinter import filedialog, messagebox, scrolledtext, ttk
+    except ImportError:
+        print("ERROR: 'tkinter' is missing.")
+        print("Please install it by running: sudo apt install python3-tk -y")
+        print("Or install without a window: ./installer.py --config install.json")
+        sys.exit(1)
 
 # --- Configuration & Templates ---
 
+# Indexes and reports kept between runs
+STATE_DIR = os.path.join(os.path.expanduser("~"), ".immich-installer")
+
 DOCKER_COMPOSE_TEMPLATE = """
 name: immich
 
@@ -36,16 +69,23 @@ services:
     command: ['start.sh', 'immich']
     volumes:
       - {PHOTOS_PATH}:/usr/src/app/upload
-      - {EXTERNAL_LIB_PATH}:{EXTERNAL_LIB_PATH}:ro
-      - /etc/localtime:/etc/localtime:ro
+{HOT_STORAGE_VOLUMES}      - {EXTERNAL_LIB_PATH}:{EXTERNAL_LIB_PATH}:ro
+{CONFIG_FILE_VOLUME}      - /etc/localtime:/etc/localtime:ro
     env_file:
       - .env
     ports:
       - 2283:2283
     depends_on:
-      - redis
-      - database
+      redis:
+        condition: service_healthy
+      database:
+        condition: service_healthy
     restart: always
+    deploy:
+      resources:
+        limits:
+          cpus: '{SERVER_CPUS}'
+          memory: {SERVER_MEMORY}
     networks:
       - immich_internal
       - immich_public
@@ -57,20 +97,49 @@ services:
       - model-cache:/cache
     env_file:
       - .env
+    healthcheck:
+      test: python3 -c "import urllib.request; urllib.request.urlopen('http://localhost:3003/ping', timeout=5)"
+      interval: 15s
+      timeout: 10s
+      retries: 5
+      start_period: 2m
     restart: always
+    deploy:
+      resources:
+        limits:
+          cpus: '{ML_CPUS}'
+          memory: {ML_MEMORY}
     networks:
       - immich_internal
 
   redis:
     container_name: immich_redis
     image: redis:6.2-alpine
+    healthcheck:
+      test: redis-cli ping || exit 1
+      interval: 10s
+      timeout: 5s
+      retries: 5
     restart: always
+    deploy:
+      resources:
+        limits:
+          cpus: '{REDIS_CPUS}'
     networks:
       - immich_internal
 
   database:
     container_name: immich_postgres
     image: tensorchord/pgvecto-rs:pg14-v0.2.0
+    command: >-
+      postgres
+      -c shared_preload_libraries=vectors.so
+      -c 'search_path="$$user", public, vectors'
+      -c shared_buffers={PG_SHARED_BUFFERS}
+      -c effective_cache_size={PG_EFFECTIVE_CACHE_SIZE}
+      -c work_mem={PG_WORK_MEM}
+      -c max_wal_size={PG_MAX_WAL_SIZE}
+      -c wal_compression=on
     environment:
       POSTGRES_PASSWORD: {DB_PASSWORD}
       POSTGRES_USER: postgres
@@ -78,7 +147,18 @@ services:
       POSTGRES_INITDB_ARGS: '--data-checksums'
     volumes:
       - {INSTALL_PATH}/postgres:/var/lib/postgresql/data
+    healthcheck:
+      test: pg_isready --dbname=immich --username=postgres || exit 1
+      interval: 10s
+      timeout: 5s
+      retries: 5
+      start_period: 2m
     restart: always
+    deploy:
+      resources:
+        limits:
+          cpus: '{PG_CPUS}'
+          memory: {PG_MEMORY}
     networks:
       - immich_internal
 
@@ -98,443 +178,4569 @@ DB_HOSTNAME=immich_postgres
 DB_USERNAME=postgres
 DB_DATABASE_NAME=immich
 REDIS_HOSTNAME=immich_redis
+
+# Hardware tuning (see installer log for the chosen profile)
+MACHINE_LEARNING_WORKERS={ML_WORKERS}
+MACHINE_LEARNING_MODEL_TTL={ML_MODEL_TTL}
+MACHINE_LEARNING_REQUEST_THREADS={ML_REQUEST_THREADS}
+{CONFIG_FILE_ENV}{HOT_STORAGE_ENV}"""
+
+# Partial Immich system config; everything not listed keeps Immich's default. Only
+# written with the job_config_file setting: while IMMICH_CONFIG_FILE is set, Immich's
+# whole Administration > Settings page is read-only.
+IMMICH_CONFIG_TEMPLATE = """{{
+  "job": {{
+    "thumbnailGeneration": {{ "concurrency": {JOB_THUMBNAILS} }},
+    "metadataExtraction": {{ "concurrency": {JOB_METADATA} }},
+    "videoConversion": {{ "concurrency": {JOB_VIDEO} }},
+    "smartSearch": {{ "concurrency": {JOB_SMART_SEARCH} }},
+    "faceDetection": {{ "concurrency": {JOB_FACES} }},
+    "backgroundTask": {{ "concurrency": {JOB_BACKGROUND} }}
+  }}
+}}
 """
 
-class ImmichInstallerApp:
-    def __init__(self, root):
-        self.root = root
-        self.root.title("Immich Installer for Raspberry Pi")
-        self.root.geometry("600x800")  # Increased height for new checkbox
+# --- Hardware tuning ---
 
-        # Variables
-        self.root_pass = tk.StringVar()
-        self.install_path = tk.StringVar()
-        self.photos_path = tk.StringVar()
-        self.ext_lib_path = tk.StringVar()
-        self.stop_existing_var = tk.BooleanVar(value=True)  # Default: checked
+def read_cpuinfo(path="/proc/cpuinfo"):
+    """Returns (cpu_count, model_name) from /proc/cpuinfo."""
+    cores = 0
+    model = ""
+    try:
+        with open(path, "r") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                key = key.strip()
+                if key == "processor":
+                    cores += 1
+                elif key in ("Model", "model name") and not model:
+                    model = value.strip()
+    except OSError:
+        pass
+    return cores or os.cpu_count() or 1, model or "unknown CPU"
 
-        self._build_ui()
 
-    def _build_ui(self):
-        pad_opts = {'padx': 10, 'pady': 2}
-        
-        # Header
-        tk.Label(self.root, text="Immich Auto-Installer", font=("Arial", 16, "bold")).pack(pady=15)
+def read_meminfo(path="/proc/meminfo"):
+    """Returns total RAM in MB."""
+    try:
+        with open(path, "r") as f:
+            for line in f:
+                if line.startswith("MemTotal:"):
+                    return int(line.split()[1]) // 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return 2048
 
-        # 1. Root Password
-        frame1 = tk.Frame(self.root)
-        frame1.pack(fill='x', padx=10, pady=5)
-        tk.Label(frame1, text="Root Password (sudo):", width=25, anchor='w', font=("Arial", 10, "bold")).pack(side='left')
-        tk.Entry(frame1, textvariable=self.root_pass, show="*").pack(side='left', fill='x', expand=True)
-        # Hint 1
-        tk.Label(self.root, text="Required to install Docker and system services.", 
-                 fg="gray", font=("Arial", 9)).pack(anchor='w', padx=10)
 
-        tk.Frame(self.root, height=10).pack() # Spacer
+NETWORK_FILESYSTEMS = ("nfs", "nfs4", "cifs", "smb3", "smbfs", "9p", "ceph", "glusterfs", "afs", "lustre",
+                       "davfs", "fuse.sshfs", "fuse.glusterfs", "fuse.rclone", "fuse.s3fs")
 
-        # 2. Install Path
-        frame2 = tk.Frame(self.root)
-        frame2.pack(fill='x', padx=10, pady=5)
-        tk.Label(frame2, text="Where to install Immich:", width=25, anchor='w', font=("Arial", 10, "bold")).pack(side='left')
-        tk.Entry(frame2, textvariable=self.install_path).pack(side='left', fill='x', expand=True)
-        tk.Button(frame2, text="Browse", command=lambda: self.browse_dir(self.install_path)).pack(side='left', padx=5)
-        # Hint 2
-        tk.Label(self.root, text="Absolute path, e.g. /home/<username>/immich", 
-                 fg="gray", font=("Arial", 9)).pack(anchor='w', padx=10)
 
-        tk.Frame(self.root, height=10).pack() # Spacer
+def mount_source(path, mountinfo="/proc/self/mountinfo"):
+    """Returns (fstype, source) of the mount that contains path, or (None, None)."""
+    best, found = -1, (None, None)
+    try:
+        with open(mountinfo, "r") as f:
+            for line in f:
+                fields, _, rest = line.partition(" - ")
+                fields, rest = fields.split(), rest.split()
+                if len(fields) < 5 or len(rest) < 2:
+                    continue
+                # Spaces and tabs in mount points are octal-escaped (\040)
+                mount_point = re.sub(r"\\([0-7]{3})", lambda m: chr(int(m.group(1), 8)), fields[4])
+                inside = path == mount_point or path.startswith(mount_point.rstrip("/") + "/")
+                # Later mounts on the same mount point hide earlier ones
+                if inside and len(mount_point) >= best:
+                    best, found = len(mount_point), (rest[0], rest[1])
+    except OSError:
+        pass
+    return found
 
-        # 3. Photos Path
-        frame3 = tk.Frame(self.root)
-        frame3.pack(fill='x', padx=10, pady=5)
-        tk.Label(frame3, text="Where to store photo files:", width=25, anchor='w', font=("Arial", 10, "bold")).pack(side='left')
-        tk.Entry(frame3, textvariable=self.photos_path).pack(side='left', fill='x', expand=True)
-        tk.Button(frame3, text="Browse", command=lambda: self.browse_dir(self.photos_path)).pack(side='left', padx=5)
-        # Hint 3
-        tk.Label(self.root, text="Absolute path, e.g. /mnt/external_drive/photos", 
-                 fg="gray", font=("Arial", 9)).pack(anchor='w', padx=10)
 
-        tk.Frame(self.root, height=10).pack() # Spacer
+def block_device_type(dev):
+    """Classifies a block device number: 'sd', 'nvme', 'usb-hdd', 'usb-ssd', 'hdd', 'ssd' or 'unknown'."""
+    sys_path = f"/sys/dev/block/{os.major(dev)}:{os.minor(dev)}"
+    if not os.path.exists(sys_path):
+        return "unknown"
+    real = os.path.realpath(sys_path)
+    # Partitions have a 'partition' file; the queue information lives on the parent disk
+    if os.path.exists(os.path.join(real, "partition")):
+        real = os.path.dirname(real)
+    name = os.path.basename(real)
+    if name.startswith("mmcblk"):
+        return "sd"
+    if name.startswith("nvme"):
+        return "nvme"
+    try:
+        with open(os.path.join(real, "queue", "rotational"), "r") as f:
+            rotational = f.read().strip() == "1"
+    except OSError:
+        return "unknown"
+    kind = "hdd" if rotational else "ssd"
+    return f"usb-{kind}" if "/usb" in real else kind
 
-        # 4. External Library
-        frame4 = tk.Frame(self.root)
-        frame4.pack(fill='x', padx=10, pady=5)
-        tk.Label(frame4, text="External Library Path:", width=25, anchor='w', font=("Arial", 10, "bold")).pack(side='left')
-        tk.Entry(frame4, textvariable=self.ext_lib_path).pack(side='left', fill='x', expand=True)
-        tk.Button(frame4, text="Browse", command=lambda: self.browse_dir(self.ext_lib_path)).pack(side='left', padx=5)
-        # Hint 4
-        tk.Label(self.root, text="Absolute path, e.g. /mnt/nas/photos", 
-                 fg="gray", font=("Arial", 9)).pack(anchor='w', padx=10)
 
-        tk.Frame(self.root, height=15).pack() # Spacer
+def device_type(path):
+    """Classifies the storage behind path: 'sd', 'nvme', 'usb-hdd', 'usb-ssd', 'hdd', 'ssd', 'network' or 'unknown'."""
+    # The install path may not exist yet, so look at the closest existing parent
+    path = os.path.realpath(path or "/")
+    while not os.path.exists(path):
+        path = os.path.dirname(path)
+    try:
+        dev = os.stat(path).st_dev
+    except OSError:
+        return "unknown"
+    if os.major(dev) != 0:
+        return block_device_type(dev)
+    # Major 0 is used by network filesystems, but also by btrfs, ZFS, overlayfs and tmpfs:
+    # tell them apart by the filesystem type and classify the backing device if there is one
+    fstype, source = mount_source(path)
+    if fstype is None:
+        return "unknown"
+    if fstype.startswith("nfs") or fstype in NETWORK_FILESYSTEMS:
+        return "network"
+    if source.startswith("/dev/"):
+        try:
+            return block_device_type(os.stat(source).st_rdev)
+        except OSError:
+            pass
+    return "unknown"
 
-        # 5. Checkbox to stop existing Immich instances
-        stop_frame = tk.Frame(self.root)
-        stop_frame.pack(fill='x', padx=10, pady=5)
-        
-        stop_existing_check = tk.Checkbutton(
-            stop_frame, 
-            text='⚠️ Completely remove existing Immich instances (including database)',
-            variable=self.stop_existing_var,
-            font=('Arial', 10, 'bold')
-        )
-        stop_existing_check.pack(anchor='w')
-        
 
-        # Install Button
-        self.btn_install = tk.Button(self.root, text="INSTALL IMMICH", bg="green", fg="white", font=("Arial", 12, "bold"), command=self.start_install)
-        self.btn_install.pack(pady=25, ipadx=20)
+SLOW_DEVICES = ("sd", "hdd", "usb-hdd", "network")
 
-        # Log Window
-        tk.Label(self.root, text="Installation Log:").pack(anchor='w', padx=10)
-        self.log_area = scrolledtext.ScrolledText(self.root, height=12, state='disabled')
-        self.log_area.pack(fill='both', expand=True, padx=10, pady=(0, 10))
+# Container memory limits share one budget; the rest of the RAM is left to the OS,
+# Redis and the page cache. Each service gets its floor, then its share of the rest.
+MEMORY_BUDGET_PERCENT = 90
+MEMORY_FLOORS = {"server": 512, "ml": 512, "postgres": 256}  # MB
+MEMORY_SHARES = {"server": 50, "ml": 30, "postgres": 20}     # Percent of the budget above the floors
 
-    def browse_dir(self, var):
-        directory = filedialog.askdirectory()
-        if directory:
-            var.set(directory)
 
-    def log(self, message):
-        """Thread-safe logging to the text area"""
-        def _log():
-            self.log_area.configure(state='normal')
-            self.log_area.insert(tk.END, str(message).strip() + "\n")
-            self.log_area.see(tk.END)
-            self.log_area.configure(state='disabled')
-        self.root.after(0, _log)
-
-    def run_command(self, cmd, sudo_pw=None, cwd=None):
-        """Runs shell command and waits for result (no streaming)."""
-        try:
-            if sudo_pw:
-                cmd_str = f"echo '{sudo_pw}' | sudo -S {cmd}"
-                process = subprocess.Popen(cmd_str, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, cwd=cwd)
-            else:
-                process = subprocess.Popen(cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, cwd=cwd)
-            
-            stdout, stderr = process.communicate()
-            
-            if process.returncode != 0:
-                raise Exception(f"Command failed: {cmd}\nError: {stderr}")
-            return stdout
-        except Exception as e:
-            raise e
+def memory_limits(mem):
+    """{service: MB} container limits that together stay within MEMORY_BUDGET_PERCENT of mem.
 
-    def run_live_command(self, cmd, sudo_pw=None, cwd=None):
-        """Runs shell command and streams output to log window line-by-line."""
-        try:
-            full_cmd = cmd
-            if sudo_pw:
-                full_cmd = f"echo '{sudo_pw}' | sudo -S {cmd}"
-            
-            # Merge stderr into stdout to capture Docker progress
-            process = subprocess.Popen(
-                full_cmd, 
-                shell=True, 
-                stdout=subprocess.PIPE, 
-                stderr=subprocess.STDOUT, 
-                text=True, 
-                cwd=cwd,
-                bufsize=1
-            )
+    When even the floors do not fit, the whole budget is split by MEMORY_SHARES.
+    """
+    budget = mem * MEMORY_BUDGET_PERCENT // 100
+    spare = budget - sum(MEMORY_FLOORS.values())
+    if spare < 0:
+        return {name: budget * share // 100 for name, share in MEMORY_SHARES.items()}
+    return {name: MEMORY_FLOORS[name] + spare * MEMORY_SHARES[name] // 100 for name in MEMORY_FLOORS}
 
-            # Read output stream
-            for line in process.stdout:
-                self.log(line)
-            
-            process.wait()
-            if process.returncode != 0:
-                raise Exception(f"Command failed: {cmd}")
 
-        except Exception as e:
-            raise e
+def hardware_tuning(install_path, photos_path, ext_path):
+    """Picks Postgres, ML, job, Redis and container limits for this machine.
 
-    def find_immich_installations(self, sudo_pw):
-        """Find all possible Immich installation directories"""
-        self.log("Searching for existing Immich installations...")
-        
-        possible_locations = []
-        
-        # Method 1: Find docker-compose.yml files with 'immich' in them
-        try:
-            result = self.run_command(
-                "find /home -name 'docker-compose.yml' -type f 2>/dev/null | xargs grep -l 'immich' 2>/dev/null || true",
-                sudo_pw=sudo_pw
-            )
-            if result.strip():
-                for compose_file in result.strip().split('\n'):
-                    if compose_file:
-                        install_dir = os.path.dirname(compose_file)
-                        possible_locations.append(install_dir)
-                        self.log(f"  Found: {install_dir}")
-        except Exception as e:
-            self.log(f"  Search method 1 skipped: {e}")
-        
-        # Method 2: Look for common installation paths
-        common_paths = [
-            "/home/*/immich",
-            "/opt/immich",
-            "/srv/immich",
-            "/var/lib/immich"
-        ]
-        
-        for pattern in common_paths:
-            try:
-                result = self.run_command(f"ls -d {pattern} 2>/dev/null || true", sudo_pw=sudo_pw)
-                if result.strip():
-                    for path in result.strip().split('\n'):
-                        if path and path not in possible_locations:
-                            possible_locations.append(path)
-                            self.log(f"  Found: {path}")
-            except:
-                pass
-        
-        return possible_locations
+    Returns (profile, settings): profile describes the detected hardware,
+    settings holds the values for the compose/.env/immich.json templates.
+    """
+    cores, model = read_cpuinfo()
+    mem = read_meminfo()
+    devices = {
+        "install": device_type(install_path),
+        "photos": device_type(photos_path),
+        "external": device_type(ext_path),
+    }
+    size = "small" if mem < 3000 else "medium" if mem < 6000 else "large"
+
+    def mb(value):
+        return f"{int(value)}MB"
+
+    def clamp(value, low, high):
+        return max(low, min(high, value))
+
+    slow_photos = devices["photos"] in SLOW_DEVICES
+    slow_db = devices["install"] in SLOW_DEVICES
+    limits = memory_limits(mem)
+    settings = {
+        # Postgres
+        "PG_SHARED_BUFFERS": mb(clamp(mem // 8, 128, 2048)),
+        "PG_EFFECTIVE_CACHE_SIZE": mb(clamp(mem // 2, 256, 8192)),
+        "PG_WORK_MEM": mb(clamp(mem // 256, 4, 32)),
+        # Fewer, larger checkpoints are kinder to SD cards and spinning disks
+        "PG_MAX_WAL_SIZE": "2GB" if slow_db else "1GB",
+        # Machine learning: one worker; unload models quickly when RAM is tight
+        "ML_WORKERS": 1,
+        "ML_MODEL_TTL": {"small": 60, "medium": 300, "large": 600}[size],
+        "ML_REQUEST_THREADS": clamp(cores // 2, 1, 4),
+        # Immich jobs
+        "JOB_THUMBNAILS": clamp(cores // 2 if slow_photos else cores - 1, 1, 4),
+        "JOB_METADATA": clamp(cores // 2, 1, 4),
+        "JOB_VIDEO": 1,
+        "JOB_SMART_SEARCH": 1 if size == "small" else 2,
+        "JOB_FACES": 1 if size == "small" else 2,
+        "JOB_BACKGROUND": clamp(cores // 2, 1, 5),
+        # Redis holds the job queues; no memory cap, a big library scan must not make enqueues fail
+        "REDIS_CPUS": 1,
+        # Container limits. Memory comes from one budget (see memory_limits); the server gets
+        # the largest share for thumbnails and transcoding (sharp, ffmpeg). CPU limits are only
+        # caps, idle cores stay available to the other services.
+        "SERVER_MEMORY": f"{limits['server']}M",
+        "SERVER_CPUS": cores,
+        "ML_MEMORY": f"{limits['ml']}M",
+        "ML_CPUS": max(1, cores - 1),
+        "PG_MEMORY": f"{limits['postgres']}M",
+        "PG_CPUS": cores,
+    }
+    profile = {"size": size, "cores": cores, "model": model, "memory_mb": mem, "devices": devices}
+    return profile, settings
+
+
+def describe_tuning(profile, settings):
+    """Human readable summary lines for the log."""
+    devices = profile["devices"]
+    return [
+        f"Hardware: {profile['model']}, {profile['cores']} cores, {profile['memory_mb']} MB RAM -> '{profile['size']}' profile",
+        f"Storage: install={devices['install']}, photos={devices['photos']}, external library={devices['external']}",
+        f"Postgres: shared_buffers={settings['PG_SHARED_BUFFERS']}, effective_cache_size={settings['PG_EFFECTIVE_CACHE_SIZE']}, "
+        f"work_mem={settings['PG_WORK_MEM']}, max_wal_size={settings['PG_MAX_WAL_SIZE']}",
+        f"Machine learning: {settings['ML_WORKERS']} worker, {settings['ML_REQUEST_THREADS']} threads, "
+        + (f"model TTL {settings['ML_MODEL_TTL']}s" if settings["ML_MODEL_TTL"] else "models stay loaded"),
+        f"Jobs: thumbnails={settings['JOB_THUMBNAILS']}, metadata={settings['JOB_METADATA']}, video={settings['JOB_VIDEO']}, "
+        f"smart search={settings['JOB_SMART_SEARCH']}, faces={settings['JOB_FACES']}",
+        f"Limits: server {settings['SERVER_MEMORY']}/{settings['SERVER_CPUS']} CPU, ML {settings['ML_MEMORY']}/{settings['ML_CPUS']} CPU, "
+        f"postgres {settings['PG_MEMORY']}/{settings['PG_CPUS']} CPU "
+        f"(memory limits together at most {MEMORY_BUDGET_PERCENT}% of RAM)",
+    ]
+
+
+# --- Storage preflight ---
+
+PREFLIGHT_FILE_MB = 64        # Size of the sequential test file
+PREFLIGHT_TIME_LIMIT = 5      # Seconds per test at most, so slow disks do not stall the install
+PREFLIGHT_RANDOM_OPS = 2000   # 4K random reads at most
+PREFLIGHT_FSYNC_OPS = 50      # 4K write+fsync rounds at most
+PREFLIGHT_REPORT_FILE = os.path.join(STATE_DIR, "preflight.json")
+
+
+def _drop_cache(fd):
+    # Make the read tests hit the device instead of the page cache
+    if hasattr(os, "posix_fadvise"):
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+
+
+def benchmark_path(path, size_mb=PREFLIGHT_FILE_MB, time_limit=PREFLIGHT_TIME_LIMIT):
+    """Short I/O test in a temporary file under path (or its closest existing parent).
+
+    Returns a dict with seq_write_mbs, seq_read_mbs, random_read_iops and
+    fsync_ms (median), or {'error': ...} when the directory is not writable.
+    """
+    directory = os.path.abspath(path)
+    while not os.path.isdir(directory):
+        directory = os.path.dirname(directory)
+    test_file = os.path.join(directory, f".immich-preflight-{secrets.token_hex(4)}")
+    block = os.urandom(1024 * 1024)
+    result = {"directory": directory}
+    try:
+        fd = os.open(test_file, os.O_CREAT | os.O_RDWR | os.O_EXCL, 0o600)
+    except OSError as e:
+        return {"directory": directory, "error": f"not writable ({e.strerror})"}
+    try:
+        # Sequential write, including the final fsync
+        written = 0
+        start = time.monotonic()
+        while written < size_mb * 1024 * 1024 and time.monotonic() - start < time_limit:
+            written += os.write(fd, block)
+        os.fsync(fd)
+        elapsed = time.monotonic() - start
+        result["seq_write_mbs"] = round(written / elapsed / 1e6, 1)
+
+        # Sequential read
+        _drop_cache(fd)
+        read = 0
+        start = time.monotonic()
+        while read < written and time.monotonic() - start < time_limit:
+            data = os.pread(fd, len(block), read)
+            if not data:
+                break
+            read += len(data)
+        elapsed = time.monotonic() - start
+        result["seq_read_mbs"] = round(read / elapsed / 1e6, 1)
+
+        # 4K random reads
+        _drop_cache(fd)
+        blocks = max(1, written // 4096)
+        ops = 0
+        start = time.monotonic()
+        while ops < PREFLIGHT_RANDOM_OPS and time.monotonic() - start < time_limit:
+            os.pread(fd, 4096, random.randrange(blocks) * 4096)
+            ops += 1
+        result["random_read_iops"] = int(ops / (time.monotonic() - start))
 
-    def completely_remove_immich(self, sudo_pw, inst_path):
-        """Completely remove all Immich containers, volumes, networks, and data"""
+        # fsync latency of small writes, the pattern of the Postgres WAL
+        latencies = []
+        page = os.urandom(4096)
+        start = time.monotonic()
+        while len(latencies) < PREFLIGHT_FSYNC_OPS and time.monotonic() - start < time_limit:
+            t = time.monotonic()
+            os.pwrite(fd, page, 0)
+            os.fsync(fd)
+            latencies.append((time.monotonic() - t) * 1000)
+        result["fsync_ms"] = round(statistics.median(latencies), 2)
+    except OSError as e:
+        result["error"] = str(e)
+    finally:
+        os.close(fd)
         try:
-            self.log("=" * 60)
-            self.log("REMOVING EXISTING IMMICH INSTALLATION")
-            self.log("=" * 60)
-            
-            # Step 1: Find all Immich installation directories
-            installation_dirs = self.find_immich_installations(sudo_pw)
-            
-            # Step 2: Stop and remove containers using docker compose down
-            self.log("\nStep 1: Stopping Immich using docker compose down...")
-            for install_dir in installation_dirs:
-                try:
-                    compose_file = os.path.join(install_dir, "docker-compose.yml")
-                    if os.path.exists(compose_file):
-                        self.log(f"Running 'docker compose down -v' in {install_dir}...")
-                        self.run_command("docker compose down -v --remove-orphans", sudo_pw=sudo_pw, cwd=install_dir)
-                        self.log(f"✓ Stopped and removed containers from {install_dir}")
-                except Exception as e:
-                    self.log(f"Warning: Could not run docker compose down in {install_dir}: {e}")
-            
-            # Step 3: Force remove any remaining Immich containers
-            self.log("\nStep 2: Force removing any remaining Immich containers...")
-            try:
-                result = self.run_command("docker ps -aq --filter name=immich", sudo_pw=sudo_pw)
-                if result.strip():
-                    container_ids = result.strip().split('\n')
-                    self.log(f"Force removing {len(container_ids)} container(s)...")
-                    self.run_command(f"docker rm -f {' '.join(container_ids)}", sudo_pw=sudo_pw)
-                    self.log("✓ Containers force removed")
-                else:
-                    self.log("No remaining containers found")
-            except Exception as e:
-                self.log(f"Warning: {e}")
-            
-            # Step 4: Remove Immich Docker volumes
-            self.log("\nStep 3: Removing Immich Docker volumes...")
+            os.remove(test_file)
+        except OSError:
+            pass
+    return result
+
+
+def database_score(result):
+    """Higher is better for a Postgres data directory: random reads and fast fsync."""
+    if "error" in result:
+        return None
+    return result["random_read_iops"] / max(result["fsync_ms"], 0.01)
+
+
+def run_preflight(paths, log):
+    """Benchmarks each distinct device behind paths ({label: path}) and writes the JSON report.
+
+    Returns {label: result}. Paths on the same device share one test.
+    """
+    results = {}
+    by_device = {}
+    for label, path in paths.items():
+        directory = os.path.abspath(path)
+        while not os.path.isdir(directory):
+            directory = os.path.dirname(directory)
+        dev = os.stat(directory).st_dev
+        if dev in by_device:
+            results[label] = dict(results[by_device[dev]], shared_with=by_device[dev])
+            continue
+        by_device[dev] = label
+        log(f"  Testing {label} storage ({path})...")
+        result = benchmark_path(path)
+        result["device"] = device_type(path)
+        results[label] = result
+        if "error" in result:
+            log(f"    skipped: {result['error']}")
+        else:
+            log(f"    {result['device']}: write {result['seq_write_mbs']} MB/s, read {result['seq_read_mbs']} MB/s, "
+                f"{result['random_read_iops']} random 4K reads/s, fsync {result['fsync_ms']} ms")
+
+    report = {"time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+              "paths": paths,
+              "results": results}
+    try:
+        os.makedirs(STATE_DIR, exist_ok=True)
+        with open(PREFLIGHT_REPORT_FILE, "w") as f:
+            json.dump(report, f, indent=2)
+    except OSError:
+        pass
+    return results
+
+
+def preflight_warnings(paths, results):
+    """Placement advice, e.g. when the Postgres data would land on the slowest device."""
+    warnings = []
+    scores = {label: database_score(result) for label, result in results.items()}
+    install_score = scores.get("install")
+    if install_score is None:
+        return warnings
+    better = [(score, label) for label, score in scores.items()
+              if label != "install" and score is not None and score > install_score * 1.5
+              # Postgres must not live on NFS/SMB, however fast it looks
+              and results[label].get("device") != "network"]
+    if better:
+        _, label = max(better)
+        warnings.append(
+            f"The database ({paths['install']}/postgres) is on the slowest device tested "
+            f"({results['install']['device']}). The {label} path ({paths[label]}) is on a faster "
+            f"device ({results[label]['device']}); consider installing Immich there.")
+    if results["install"].get("fsync_ms", 0) > 20:
+        warnings.append(f"fsync takes {results['install']['fsync_ms']} ms at {paths['install']}; "
+                        f"database writes will be slow there.")
+    return warnings
+
+
+# --- Library pre-scan ---
+
+LIBRARY_SCAN_WORKERS = 8             # Directories listed at the same time (hides NAS latency)
+LIBRARY_SCAN_TIME_LIMIT = 300        # Seconds; after that the estimate covers what was seen so far
+LIBRARY_SAMPLE_EVERY = 50            # Read the header of every Nth photo to find its resolution
+LIBRARY_HEADER_BYTES = 64 * 1024     # Bytes read from a sampled photo
+LIBRARY_REPORT_INTERVAL = 10         # Seconds between progress lines in the log
+LIBRARY_REPORT_FILE = os.path.join(STATE_DIR, "library-scan.json")
+
+PHOTO_EXTENSIONS = {".jpg", ".jpeg", ".png", ".heic", ".heif", ".webp", ".gif", ".tif", ".tiff",
+                    ".avif", ".jxl", ".bmp"}
+RAW_EXTENSIONS = {".dng", ".cr2", ".cr3", ".nef", ".arw", ".orf", ".rw2", ".raf", ".pef", ".srw", ".raw"}
+VIDEO_EXTENSIONS = {".mp4", ".mov", ".m4v", ".avi", ".mkv", ".mts", ".m2ts", ".3gp", ".webm", ".mpg", ".wmv"}
+
+# Resolution classes in megapixels; decoding cost grows with the pixel count
+RESOLUTION_CLASSES = (("up to 12 MP", 12), ("12-24 MP", 24), ("24-50 MP", 50), ("over 50 MP", None))
+
+# Rough per-asset costs on a 4-core Raspberry Pi 4 with the default job settings,
+# scaled by core count in estimate_workload. Good to a factor of two, not better.
+THUMBNAIL_BYTES_PER_ASSET = 300 * 1024               # Preview JPEG + small WebP thumbnail
+THUMBNAIL_SECONDS = {"up to 12 MP": 0.6, "12-24 MP": 1.2, "24-50 MP": 2.5, "over 50 MP": 5.0,
+                     "raw": 4.0, "video": 1.5, "unknown": 1.0}
+ML_SECONDS_PER_ASSET = 2.5                           # CLIP embedding + face detection/recognition
+VIDEO_BITRATE = 16e6 / 8                             # Bytes/s of a typical phone video, to guess durations
+TRANSCODE_SPEED = 0.5                                # Seconds of 720p video encoded per second
+ENCODED_VIDEO_RATIO = 0.3                            # Encoded size relative to the original
+REFERENCE_CORES = 4
+
+
+def image_resolution(header):
+    """(width, height) from the first bytes of a JPEG, PNG, WebP, GIF or HEIC/AVIF file, or None."""
+    if header[:8] == b"\x89PNG\r\n\x1a\n" and len(header) >= 24:
+        return int.from_bytes(header[16:20], "big"), int.from_bytes(header[20:24], "big")
+    if header[:6] in (b"GIF87a", b"GIF89a") and len(header) >= 10:
+        return int.from_bytes(header[6:8], "little"), int.from_bytes(header[8:10], "little")
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP" and len(header) >= 30:
+        if header[12:16] == b"VP8X":
+            return int.from_bytes(header[24:27], "little") + 1, int.from_bytes(header[27:30], "little") + 1
+        if header[12:16] == b"VP8 ":
+            return (int.from_bytes(header[26:28], "little") & 0x3FFF,
+                    int.from_bytes(header[28:30], "little") & 0x3FFF)
+        if header[12:16] == b"VP8L":
+            bits = int.from_bytes(header[21:25], "little")
+            return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if header[:2] == b"\xff\xd8":
+        # Walk the JPEG segments up to the first start-of-frame marker
+        pos = 2
+        while pos + 9 <= len(header):
+            if header[pos] != 0xFF:
+                return None
+            marker = header[pos + 1]
+            if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+                pos += 2
+                continue
+            if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+                return int.from_bytes(header[pos + 7:pos + 9], "big"), int.from_bytes(header[pos + 5:pos + 7], "big")
+            pos += 2 + int.from_bytes(header[pos + 2:pos + 4], "big")
+        return None
+    if header[4:8] == b"ftyp":
+        # HEIC/AVIF: the largest 'ispe' (image spatial extents) box is the full image, the others are tiles
+        sizes = []
+        pos = header.find(b"ispe")
+        while pos != -1 and pos + 16 <= len(header):
+            sizes.append((int.from_bytes(header[pos + 8:pos + 12], "big"), int.from_bytes(header[pos + 12:pos + 16], "big")))
+            pos = header.find(b"ispe", pos + 4)
+        return max(sizes, key=lambda s: s[0] * s[1]) if sizes else None
+    return None
+
+
+def resolution_class(size):
+    if not size:
+        return "unknown"
+    megapixels = size[0] * size[1] / 1e6
+    for name, limit in RESOLUTION_CLASSES:
+        if limit is None or megapixels <= limit:
+            return name
+
+
+def _new_library_stats():
+    return {"files": collections.Counter(), "bytes": collections.Counter(),
+            "resolution": collections.Counter(), "count": 0, "dirs": 0, "errors": 0}
+
+
+def _scan_library_dir(directory, stats, photo_counter):
+    """Lists one directory into stats; returns its subdirectories."""
+    subdirs = []
+    with os.scandir(directory) as it:
+        for entry in it:
             try:
-                result = self.run_command("docker volume ls -q --filter name=immich", sudo_pw=sudo_pw)
-                if result.strip():
-                    volume_names = result.strip().split('\n')
-                    self.log(f"Found {len(volume_names)} Docker volume(s):")
-                    for vol in volume_names:
-                        self.log(f"  - {vol}")
-                    self.run_command(f"docker volume rm -f {' '.join(volume_names)}", sudo_pw=sudo_pw)
-                    self.log("✓ Docker volumes removed")
-                else:
-                    self.log("No Immich Docker volumes found")
-            except Exception as e:
-                self.log(f"Warning: {e}")
-            
-            # Step 5: Remove Immich networks
-            self.log("\nStep 4: Removing Immich networks...")
+                if entry.is_dir(follow_symlinks=False):
+                    # Same rule as Immich's library scan: hidden folders are ignored
+                    if not entry.name.startswith("."):
+                        subdirs.append(entry.path)
+                    continue
+                if not entry.is_file(follow_symlinks=False) or entry.name.startswith("."):
+                    continue
+                ext = os.path.splitext(entry.name)[1].lower()
+                kind = ("photo" if ext in PHOTO_EXTENSIONS else "raw" if ext in RAW_EXTENSIONS
+                        else "video" if ext in VIDEO_EXTENSIONS else "other")
+                stats["files"][kind] += 1
+                stats["count"] += 1
+                stats["bytes"][kind] += entry.stat(follow_symlinks=False).st_size
+                if kind == "photo" and next(photo_counter) % LIBRARY_SAMPLE_EVERY == 0:
+                    with open(entry.path, "rb") as f:
+                        stats["resolution"][resolution_class(image_resolution(f.read(LIBRARY_HEADER_BYTES)))] += 1
+            except OSError:
+                stats["errors"] += 1
+    stats["dirs"] += 1
+    return subdirs
+
+
+def scan_library(top, workers=LIBRARY_SCAN_WORKERS, time_limit=LIBRARY_SCAN_TIME_LIMIT, log=None, stop=None):
+    """Walks top with a pool of os.scandir workers and classifies every file.
+
+    Only counters are kept, so memory stays flat however many files there are;
+    directories waiting to be listed go on a LIFO queue, which keeps that
+    frontier small too. The scan ends early after time_limit or once the stop
+    event is set. Returns the merged stats plus 'seconds' and 'complete'.
+    """
+    pending = queue.LifoQueue()
+    pending.put(top)
+    deadline = time.monotonic() + time_limit
+    stopped = threading.Event()
+    stop = stop or threading.Event()
+    photo_counter = itertools.count()
+    per_worker = [_new_library_stats() for _ in range(max(1, workers))]
+
+    def worker(stats):
+        while True:
+            directory = pending.get()
             try:
-                result = self.run_command("docker network ls -q --filter name=immich", sudo_pw=sudo_pw)
-                if result.strip():
-                    network_ids = result.strip().split('\n')
-                    self.log(f"Removing {len(network_ids)} network(s)...")
-                    self.run_command(f"docker network rm {' '.join(network_ids)}", sudo_pw=sudo_pw)
-                    self.log("✓ Networks removed")
-                else:
-                    self.log("No Immich networks found")
-            except Exception as e:
-                self.log(f"Warning: {e}")
-            
-            # Step 6: CRITICAL - Remove bind-mounted PostgreSQL data directories
-            self.log("\nStep 5: Removing bind-mounted PostgreSQL data directories...")
-            for install_dir in installation_dirs:
-                postgres_dir = os.path.join(install_dir, "postgres")
-                if os.path.exists(postgres_dir):
-                    self.log(f"Deleting PostgreSQL data at: {postgres_dir}")
-                    try:
-                        # Use sudo to remove as postgres user may own these files
-                        self.run_command(f"rm -rf '{postgres_dir}'", sudo_pw=sudo_pw)
-                        self.log(f"✓ Deleted: {postgres_dir}")
-                    except Exception as e:
-                        self.log(f"Error deleting {postgres_dir}: {e}")
-                        # Try with shutil as fallback
-                        try:
-                            shutil.rmtree(postgres_dir, ignore_errors=True)
-                            self.log(f"✓ Deleted (fallback): {postgres_dir}")
-                        except Exception as e2:
-                            self.log(f"Could not delete {postgres_dir}: {e2}")
-            
-            # Step 7: Also check the new installation path
-            if inst_path:
-                postgres_dir = os.path.join(inst_path, "postgres")
-                if os.path.exists(postgres_dir):
-                    self.log(f"Deleting PostgreSQL data at new install path: {postgres_dir}")
+                if directory is None:
+                    return
+                if stopped.is_set() or stop.is_set() or time.monotonic() > deadline:
+                    stopped.set()
+                    continue
+                for subdir in _scan_library_dir(directory, stats, photo_counter):
+                    pending.put(subdir)
+            except OSError:
+                stats["errors"] += 1
+            finally:
+                pending.task_done()
+
+    start = time.monotonic()
+    threads = [threading.Thread(target=worker, args=(stats,), daemon=True) for stats in per_worker]
+    for thread in threads:
+        thread.start()
+    next_report = start + LIBRARY_REPORT_INTERVAL
+    # pending.join() cannot time out, so poll its counter to log progress meanwhile
+    while pending.unfinished_tasks:
+        time.sleep(0.1)
+        if log and time.monotonic() >= next_report:
+            next_report += LIBRARY_REPORT_INTERVAL
+            log(f"  ...{sum(stats['count'] for stats in per_worker):,} files in "
+                f"{sum(stats['dirs'] for stats in per_worker):,} folders so far")
+    for _ in threads:
+        pending.put(None)
+    for thread in threads:
+        thread.join()
+
+    result = _new_library_stats()
+    for stats in per_worker:
+        for key in ("files", "bytes", "resolution"):
+            result[key].update(stats[key])
+        for key in ("count", "dirs", "errors"):
+            result[key] += stats[key]
+    result["seconds"] = time.monotonic() - start
+    result["complete"] = not stopped.is_set()
+    return result
+
+
+def estimate_workload(stats, cores):
+    """Rough thumbnail space and processing time for a scanned library on a machine with this many cores."""
+    files = stats["files"]
+    assets = files["photo"] + files["raw"] + files["video"]
+    sampled = sum(stats["resolution"].values())
+    if sampled:
+        # Spread the sampled resolution mix over all photos
+        thumbnail_seconds = sum(files["photo"] * count / sampled * THUMBNAIL_SECONDS[name]
+                                for name, count in stats["resolution"].items())
+    else:
+        thumbnail_seconds = files["photo"] * THUMBNAIL_SECONDS["unknown"]
+    thumbnail_seconds += files["raw"] * THUMBNAIL_SECONDS["raw"] + files["video"] * THUMBNAIL_SECONDS["video"]
+    speed = cores / REFERENCE_CORES
+    return {
+        "assets": assets,
+        "thumbnail_bytes": assets * THUMBNAIL_BYTES_PER_ASSET,
+        "encoded_video_bytes": int(stats["bytes"]["video"] * ENCODED_VIDEO_RATIO),
+        "thumbnail_seconds": thumbnail_seconds / speed,
+        "ml_seconds": assets * ML_SECONDS_PER_ASSET / speed,
+        "transcode_seconds": stats["bytes"]["video"] / VIDEO_BITRATE / TRANSCODE_SPEED / speed,
+    }
+
+
+def describe_library(stats, estimate):
+    """Human readable summary lines for the log."""
+    files, sizes = stats["files"], stats["bytes"]
+    lines = [
+        f"{stats['count']:,} files ({format_bytes(sum(sizes.values()))}) in {stats['dirs']:,} folders, "
+        f"scanned in {format_duration(stats['seconds'])}"
+        + ("" if stats["complete"] else " (stopped early, numbers are a lower bound)"),
+        f"Photos: {files['photo']:,} ({format_bytes(sizes['photo'])}), RAW: {files['raw']:,} ({format_bytes(sizes['raw'])}), "
+        f"videos: {files['video']:,} ({format_bytes(sizes['video'])}), other: {files['other']:,}",
+    ]
+    sampled = sum(stats["resolution"].values())
+    if sampled:
+        mix = ", ".join(f"{name} {stats['resolution'][name] * 100 // sampled}%"
+                        for name, _ in RESOLUTION_CLASSES + (("unknown", None),) if stats["resolution"][name])
+        lines.append(f"Photo resolutions ({sampled:,} sampled): {mix}")
+    lines.append(f"Estimated thumbnails: {format_bytes(estimate['thumbnail_bytes'])}, "
+                 f"transcoded videos: up to {format_bytes(estimate['encoded_video_bytes'])}")
+    lines.append(f"Estimated processing: thumbnails {format_duration(estimate['thumbnail_seconds'])}, "
+                 f"machine learning {format_duration(estimate['ml_seconds'])}, "
+                 f"video transcoding {format_duration(estimate['transcode_seconds'])}")
+    return lines
+
+
+def library_warnings(estimate, thumbs_path):
+    """Warns when thumbnails will not fit next to the uploads or the first scan will take days."""
+    warnings = []
+    directory = os.path.abspath(thumbs_path)
+    while not os.path.isdir(directory):
+        directory = os.path.dirname(directory)
+    needed = estimate["thumbnail_bytes"] + estimate["encoded_video_bytes"]
+    free = shutil.disk_usage(directory).free
+    if needed > free:
+        warnings.append(f"Thumbnails and transcoded videos for the external library need about {format_bytes(needed)}, "
+                        f"but only {format_bytes(free)} is free at {thumbs_path}.")
+    busy = estimate["thumbnail_seconds"] + estimate["ml_seconds"] + estimate["transcode_seconds"]
+    if busy > 24 * 3600:
+        warnings.append(f"Processing the external library will keep this machine busy for about {format_duration(busy)} "
+                        f"after you start the library scan in Immich.")
+    return warnings
+
+
+# --- Discovery ---
+
+DISCOVERY_INDEX_FILE = os.path.join(STATE_DIR, "installations.json")
+
+# File names 'docker compose' picks up on its own, in its order of preference
+COMPOSE_FILENAMES = ("compose.yaml", "compose.yml", "docker-compose.yaml", "docker-compose.yml")
+
+DISCOVERY_ROOTS = ["/home", "/opt", "/srv"]
+DISCOVERY_MAX_DEPTH = 4       # Directory levels below each root that are searched
+DISCOVERY_WORKERS = 4
+# Directories that never hold an install but can contain huge trees
+DISCOVERY_SKIP_NAMES = {"postgres", "model-cache", "node_modules", "upload", "library",
+                        "thumbs", "encoded-video", "lost+found"}
+
+COMMON_INSTALL_PATHS = [
+    "/home/*/immich",
+    "/opt/immich",
+    "/srv/immich",
+    "/var/lib/immich"
+]
+
+
+def find_compose_file(directory):
+    """Returns the compose file docker compose would use in directory, or None."""
+    for name in COMPOSE_FILENAMES:
+        path = os.path.join(directory, name)
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def _is_immich_compose(path):
+    try:
+        with open(path, "r", errors="ignore") as f:
+            return "immich" in f.read()
+    except OSError:
+        return False
+
+
+def _scan_tree(top, max_depth, skip_paths):
+    """Iterative os.scandir walk of top. Returns directories holding an Immich compose file.
+
+    Hidden directories, DISCOVERY_SKIP_NAMES, skip_paths and anything we are not
+    allowed to read are not descended into. Symlinks are not followed.
+    """
+    found = []
+    stack = [(top, 0)]
+    while stack:
+        directory, depth = stack.pop()
+        compose_file = None
+        subdirs = []
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
                     try:
-                        self.run_command(f"rm -rf '{postgres_dir}'", sudo_pw=sudo_pw)
-                        self.log(f"✓ Deleted: {postgres_dir}")
-                    except Exception as e:
-                        try:
-                            shutil.rmtree(postgres_dir, ignore_errors=True)
-                            self.log(f"✓ Deleted (fallback): {postgres_dir}")
-                        except:
-                            self.log(f"Warning: Could not delete {postgres_dir}")
-                
-                # Also remove any leftover .env and docker-compose.yml
-                for filename in ['.env', 'docker-compose.yml']:
-                    filepath = os.path.join(inst_path, filename)
-                    if os.path.exists(filepath):
-                        try:
-                            os.remove(filepath)
-                            self.log(f"✓ Removed old {filename}")
-                        except Exception as e:
-                            self.log(f"Warning: Could not remove {filepath}: {e}")
-            
-            # Step 8: Clean up orphaned volumes
-            self.log("\nStep 6: Cleaning up orphaned Docker volumes...")
-            try:
-                self.run_command("docker volume prune -f", sudo_pw=sudo_pw)
-                self.log("✓ Orphaned volumes cleaned")
-            except Exception as e:
-                self.log(f"Warning: {e}")
-            
-            self.log("\n" + "=" * 60)
-            self.log("✓ COMPLETE REMOVAL FINISHED")
-            self.log("All Immich containers, volumes, networks, and data removed")
-            self.log("Database will be created fresh with new password")
-            self.log("=" * 60 + "\n")
-                
-        except Exception as e:
-            self.log(f"ERROR during removal: {str(e)}")
-            raise
+                        if entry.name in COMPOSE_FILENAMES and entry.is_file(follow_symlinks=False):
+                            compose_file = compose_file or entry.path
+                        elif depth < max_depth and entry.is_dir(follow_symlinks=False):
+                            if entry.name.startswith(".") or entry.name in DISCOVERY_SKIP_NAMES:
+                                continue
+                            if entry.path in skip_paths:
+                                continue
+                            subdirs.append(entry.path)
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+        if compose_file and _is_immich_compose(compose_file):
+            found.append(directory)
+        stack.extend((d, depth + 1) for d in subdirs)
+    return found
 
-    def install_logic(self):
-        pw = self.root_pass.get()
-        inst_path = self.install_path.get()
-        p_path = self.photos_path.get()
-        ext_path = self.ext_lib_path.get()
 
-        if not all([pw, inst_path, p_path, ext_path]):
-            messagebox.showerror("Error", "All fields are required.")
-            self.btn_install.config(state='normal')
-            return
+def scan_for_installations(roots=None, max_depth=DISCOVERY_MAX_DEPTH, skip_paths=(), workers=DISCOVERY_WORKERS):
+    """Searches roots for Immich compose files, one thread pool job per top-level directory."""
+    roots = DISCOVERY_ROOTS if roots is None else roots
+    skip = {os.path.realpath(p) for p in skip_paths if p}
+    skip |= {p.rstrip("/") for p in skip_paths if p}
+
+    found = []
+    jobs = []
+    for root in roots:
+        if not os.path.isdir(root):
+            continue
+        # The root itself is only checked, its children are scanned in parallel
+        compose_file = find_compose_file(root)
+        if compose_file and _is_immich_compose(compose_file):
+            found.append(root)
+        try:
+            with os.scandir(root) as it:
+                for entry in it:
+                    if (entry.is_dir(follow_symlinks=False) and not entry.name.startswith(".")
+                            and entry.name not in DISCOVERY_SKIP_NAMES and entry.path not in skip):
+                        jobs.append(entry.path)
+        except OSError:
+            continue
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for dirs in pool.map(lambda top: _scan_tree(top, max_depth - 1, skip), jobs):
+            found.extend(dirs)
+    return sorted(set(found))
+
+
+def discover_installations(known, rescan, roots, patterns, skip_paths=()):
+    """Known installations that still exist (or a scan of roots when there are none
+    or rescan is set), plus the directories matching patterns.
+
+    Returns (locations, scanned).
+    """
+    existing = [path for path in known if os.path.isdir(path)]
+    scanned = rescan or not existing
+    locations = scan_for_installations(roots, skip_paths=skip_paths) if scanned else existing
+    for pattern in patterns:
+        for path in sorted(glob.glob(pattern)):
+            if os.path.isdir(path) and path not in locations:
+                locations.append(path)
+    return locations, scanned
+
+
+# Runs as root, so home directories with mode 0700 and root-only directories are
+# searched too: loads this file (argv[1]) and prints discover_installations(**argv[2])
+# as JSON.
+DISCOVERY_SCRIPT = r"""
+import importlib.util, json, sys
+spec = importlib.util.spec_from_file_location("immich_installer_discovery", sys.argv[1])
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+print(json.dumps(module.discover_installations(**json.loads(sys.argv[2]))))
+"""
+
+
+def load_known_installations():
+    """Installation directories remembered from earlier runs."""
+    try:
+        with open(DISCOVERY_INDEX_FILE, "r") as f:
+            return list(json.load(f).get("installations", []))
+    except (OSError, ValueError):
+        return []
+
+
+def save_known_installations(paths):
+    try:
+        os.makedirs(STATE_DIR, exist_ok=True)
+        tmp_file = DISCOVERY_INDEX_FILE + ".tmp"
+        with open(tmp_file, "w") as f:
+            json.dump({"installations": sorted(set(paths)), "updated": int(time.time())}, f, indent=2)
+        os.replace(tmp_file, DISCOVERY_INDEX_FILE)
+    except OSError:
+        pass
+
+
+# --- Privileged commands ---
 
+SUDO_TIMEOUT = 15  # Seconds to wait for sudo to accept the password
+TEARDOWN_WORKERS = 4  # Removal steps that may run at the same time
+INSTALL_WORKERS = 3   # Install steps that may run at the same time
+
+# Runs as root behind a single sudo prompt. Reads one JSON request per line from
+# stdin and answers with JSON frames tagged with the request id, so several
+# commands can be in flight at once. Lines that are not JSON are ignored.
+PRIVILEGED_HELPER = r"""
+import json, os, subprocess, sys, threading
+lock = threading.Lock()
+
+def send(msg):
+    data = json.dumps(msg) + "\n"
+    with lock:
+        sys.stdout.write(data)
+        sys.stdout.flush()
+
+def reap(p):
+    # Like p.wait(), but also returns the CPU time the command used
+    _, status, usage = os.wait4(p.pid, 0)
+    p.returncode = os.waitstatus_to_exitcode(status)
+    return usage.ru_utime + usage.ru_stime
+
+def run(req):
+    merge = req.get("merge", False)
+    try:
+        p = subprocess.Popen(req["cmd"], shell=True, cwd=req.get("cwd"), stdin=subprocess.DEVNULL,
+                             stdout=subprocess.PIPE,
+                             stderr=subprocess.STDOUT if merge else subprocess.PIPE,
+                             text=True, errors="replace")
+    except OSError as e:
+        send({"id": req["id"], "type": "exit", "code": 127, "stdout": "", "stderr": str(e), "cpu": 0})
+        return
+    if merge:
+        for line in p.stdout:
+            send({"id": req["id"], "type": "line", "data": line})
+        cpu = reap(p)
+        send({"id": req["id"], "type": "exit", "code": p.returncode, "stdout": "", "stderr": "", "cpu": cpu})
+    else:
+        err = []
+        reader = threading.Thread(target=lambda: err.append(p.stderr.read()))
+        reader.start()
+        out = p.stdout.read()
+        reader.join()
+        cpu = reap(p)
+        send({"id": req["id"], "type": "exit", "code": p.returncode, "stdout": out, "stderr": err[0], "cpu": cpu})
+
+send({"type": "ready"})
+for raw in sys.stdin:
+    try:
+        req = json.loads(raw)
+    except ValueError:
+        continue
+    threading.Thread(target=run, args=(req,), daemon=True).start()
+"""
+
+
+class PrivilegedSession:
+    """One long-lived root helper process shared by all sudo commands.
+
+    The password is written once to sudo's stdin; every command after that is
+    sent over the same pipe instead of starting a new 'sudo' each time.
+    """
+
+    def __init__(self, password, timeout=SUDO_TIMEOUT):
+        self.password = password
+        self._send_lock = threading.Lock()
+        self._pending = {}
+        self._ids = itertools.count(1)
+        self._ready = threading.Event()
+        self._stderr_tail = []
+        # -k: always ask for the password, so it never ends up in the helper's stdin as a command
+        self.process = subprocess.Popen(
+            ["sudo", "-S", "-k", "-p", "", sys.executable, "-u", "-c", PRIVILEGED_HELPER],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            bufsize=1
+        )
+        threading.Thread(target=self._read_stdout, daemon=True).start()
+        threading.Thread(target=self._read_stderr, daemon=True).start()
         try:
-            # 1. Check Docker
-            self.log("Checking for Docker...")
-            docker_installed = False
+            self.process.stdin.write(password + "\n")
+            self.process.stdin.flush()
+        except OSError:
+            pass
+        if not self._ready.wait(timeout):
+            # sudo is waiting for another password attempt
+            self.process.kill()
+            self.process.wait()
+            details = " ".join(self._stderr_tail).strip()
+            raise Exception(f"sudo authentication failed. {details}".strip())
+
+    def _read_stdout(self):
+        for raw in self.process.stdout:
             try:
-                self.run_command("docker --version")
-                self.log("Docker is already installed.")
-                docker_installed = True
-            except:
-                self.log("Docker not found. Installing...")
-                
-                # --- Docker Install ---
-                self.log("Downloading Docker installation script...")
-                try:
-                    urllib.request.urlretrieve("https://get.docker.com", "get-docker.sh")
-                except Exception as e:
-                    raise Exception(f"Failed to download Docker script: {e}")
-
-                self.log("Running Docker installer...")
-                self.run_command("sh get-docker.sh", sudo_pw=pw)
-                self.log("Docker installed successfully.")
-                docker_installed = True
-            
-            # ALWAYS ensure user is in the docker group (even if docker was already installed)
-            if docker_installed:
-                user = os.getenv('USER')
-                self.log(f"Ensuring {user} is in 'docker' group...")
-                try:
-                    self.run_command(f"usermod -aG docker {user}", sudo_pw=pw)
-                except Exception as e:
-                    self.log(f"Warning: Could not add user to group: {e}")
-
-            # 1.5. Completely remove existing Immich if checkbox is checked
-            if self.stop_existing_var.get():
-                self.completely_remove_immich(pw, inst_path)
-
-            # Ensure Install Directory exists
-            if not os.path.exists(inst_path):
-                os.makedirs(inst_path)
-                self.log(f"Created installation directory: {inst_path}")
-
-            # 2. Generate Credentials & Config
-            db_password = secrets.token_urlsafe(16)
-            self.log(f"Generated new database password: {db_password[:8]}... (truncated)")
-            
-            # 3. Create docker-compose.yml
-            compose_content = DOCKER_COMPOSE_TEMPLATE.format(
-                PHOTOS_PATH=p_path,
-                EXTERNAL_LIB_PATH=ext_path,
-                DB_PASSWORD=db_password,
-                INSTALL_PATH=inst_path
-            )
+                msg = json.loads(raw)
+            except ValueError:
+                continue
+            if msg.get("type") == "ready":
+                self._ready.set()
+                continue
+            with self._send_lock:
+                q = self._pending.get(msg.get("id"))
+            if q:
+                q.put(msg)
+        # Helper is gone: release everyone still waiting for an answer
+        with self._send_lock:
+            waiting = list(self._pending.values())
+        for q in waiting:
+            q.put({"type": "exit", "code": -1, "stdout": "", "stderr": "Privileged session ended unexpectedly"})
 
-            # 4. Create .env file
-            env_content = ENV_TEMPLATE.format(
-                PHOTOS_PATH=p_path,
-                DB_PASSWORD=db_password
-            )
+    def _read_stderr(self):
+        for line in self.process.stderr:
+            self._stderr_tail = (self._stderr_tail + [line.strip()])[-5:]
 
-            self.log(f"Writing configuration files to {inst_path}...")
-            
-            with open(os.path.join(inst_path, "docker-compose.yml"), "w") as f:
-                f.write(compose_content)
-            
-            with open(os.path.join(inst_path, ".env"), "w") as f:
-                f.write(env_content)
-            
-            self.log("✓ Configuration files written")
-
-            # 5. Pull Images (with logging)
-            self.log("-----------------------------------------")
-            self.log("Downloading Immich Images...")
-            self.log("This may take a while. Please wait...")
-            
-            # We explicitly pull first to show the download logs
-            self.run_live_command("docker compose pull", sudo_pw=pw, cwd=inst_path)
-            
-            # 6. Start Immich
-            self.log("-----------------------------------------")
-            self.log("Starting Immich containers...")
-            self.run_live_command("docker compose up -d", sudo_pw=pw, cwd=inst_path)
+    def is_alive(self):
+        return self.process.poll() is None
 
-            self.log("-----------------------------------------")
-            self.log("SUCCESS! Immich is starting up.")
-            self.log("Access Immich at: http://<YOUR_PI_IP>:2283")
-            self.log("-----------------------------------------")
-            self.log("NOTE: To run 'docker' commands without sudo later,")
-            self.log("you MUST reboot your Raspberry Pi or log out/in.")
-            self.log("-----------------------------------------")
-            messagebox.showinfo("Success", "Immich Installed!\n\nPlease reboot your system to finalize Docker permissions.")
+    def run(self, cmd, cwd=None, on_line=None):
+        """Runs cmd as root. Returns (returncode, stdout, stderr).
 
-        except Exception as e:
-            self.log(f"ERROR: {str(e)}")
-            messagebox.showerror("Installation Failed", str(e))
+        With on_line, stderr is merged into stdout and each line is passed to
+        on_line as it arrives (stdout/stderr are then returned empty).
+        """
+        return self.run_measured(cmd, cwd=cwd, on_line=on_line)[:3]
+
+    def run_measured(self, cmd, cwd=None, on_line=None):
+        """Like run(), plus the CPU seconds used by the command and its children."""
+        req_id = next(self._ids)
+        q = queue.SimpleQueue()
+        request = json.dumps({"id": req_id, "cmd": cmd, "cwd": cwd, "merge": on_line is not None})
+        with self._send_lock:
+            self._pending[req_id] = q
+            try:
+                self.process.stdin.write(request + "\n")
+                self.process.stdin.flush()
+            except OSError:
+                del self._pending[req_id]
+                raise Exception(f"Command failed: {cmd}\nError: privileged session is not running")
+        try:
+            while True:
+                msg = q.get()
+                if msg["type"] == "line":
+                    on_line(msg["data"])
+                elif msg["type"] == "exit":
+                    return msg["code"], msg.get("stdout", ""), msg.get("stderr", ""), msg.get("cpu", 0.0)
         finally:
-            self.btn_install.config(state='normal')
-            if os.path.exists("get-docker.sh"):
-                os.remove("get-docker.sh")
+            with self._send_lock:
+                self._pending.pop(req_id, None)
+
+    def close(self):
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+# --- Docker Engine API ---
+
+DOCKER_SOCKET = "/var/run/docker.sock"
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path, timeout=60):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class DockerAPI:
+    """Minimal Docker Engine API client over the local unix socket.
+
+    Every request uses its own connection, so one client can be shared by
+    several threads.
+    """
+
+    def __init__(self, socket_path=None):
+        self.socket_path = socket_path or DOCKER_SOCKET
+
+    @staticmethod
+    def available(socket_path=None):
+        """True if we may talk to the daemon directly (root or active 'docker' group)."""
+        socket_path = socket_path or DOCKER_SOCKET
+        return os.path.exists(socket_path) and os.access(socket_path, os.R_OK | os.W_OK)
+
+    def request(self, method, path, query=None, body=None):
+        if query:
+            path = f"{path}?{urllib.parse.urlencode(query)}"
+        conn = _UnixHTTPConnection(self.socket_path)
+        try:
+            headers = {"Content-Type": "application/json"} if body is not None else {}
+            conn.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+            response = conn.getresponse()
+            data = response.read()
+        finally:
+            conn.close()
+        if response.status >= 400:
+            try:
+                message = json.loads(data).get("message", "")
+            except ValueError:
+                message = data.decode(errors="replace")
+            raise Exception(f"Docker API {method} {path} failed ({response.status}): {message}")
+        return json.loads(data) if data else None
+
+    def stream(self, method, path, query=None):
+        """Yields the JSON objects of a streaming endpoint (e.g. image pull progress)."""
+        if query:
+            path = f"{path}?{urllib.parse.urlencode(query)}"
+        conn = _UnixHTTPConnection(self.socket_path, timeout=600)
+        try:
+            conn.request(method, path)
+            response = conn.getresponse()
+            if response.status >= 400:
+                raise Exception(f"Docker API {method} {path} failed ({response.status}): "
+                                f"{response.read().decode(errors='replace').strip()}")
+            for raw in response:
+                if raw.strip():
+                    yield json.loads(raw)
+        finally:
+            conn.close()
+
+    def save_images(self, images):
+        """Returns an open response streaming 'docker save' output for images. Caller closes it."""
+        conn = _UnixHTTPConnection(self.socket_path, timeout=600)
+        query = urllib.parse.urlencode([("names", image) for image in images])
+        conn.request("GET", f"/images/get?{query}")
+        response = conn.getresponse()
+        if response.status >= 400:
+            message = response.read().decode(errors="replace").strip()
+            conn.close()
+            raise Exception(f"Docker API image export failed ({response.status}): {message}")
+        return response
+
+    def load_images(self, chunks):
+        """Streams a tar archive (an iterable of bytes) into 'docker load'. Returns the daemon's messages."""
+        conn = _UnixHTTPConnection(self.socket_path, timeout=600)
+        try:
+            conn.request("POST", "/images/load?quiet=1", body=chunks,
+                         headers={"Content-Type": "application/x-tar"}, encode_chunked=True)
+            response = conn.getresponse()
+            data = response.read().decode(errors="replace")
+        finally:
+            conn.close()
+        if response.status >= 400:
+            raise Exception(f"Docker API image import failed ({response.status}): {data.strip()}")
+        messages = []
+        for raw in data.splitlines():
+            try:
+                event = json.loads(raw)
+            except ValueError:
+                continue
+            if "error" in event:
+                raise Exception(f"Docker API image import failed: {event['error']}")
+            if event.get("stream"):
+                messages.append(event["stream"].strip())
+        return messages
+
+
+# Engine API endpoints of the resources removed in bulk: (list path, list query, remove path, remove query)
+DOCKER_RESOURCES = {
+    "container": ("/containers/json", {"all": "1"}, "/containers/{}", {"force": "1", "v": "1"}),
+    "volume": ("/volumes", {}, "/volumes/{}", {"force": "1"}),
+    "network": ("/networks", {}, "/networks/{}", {}),
+}
+
+
+# Runs as root when the socket is not accessible to us: forwards one streaming
+# Engine API request and prints the raw JSON lines. argv: socket method path
+DOCKER_API_RELAY = r"""
+import http.client, json, socket, sys
+class Conn(http.client.HTTPConnection):
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(sys.argv[1])
+conn = Conn("localhost", timeout=600)
+conn.request(sys.argv[2], sys.argv[3])
+response = conn.getresponse()
+if response.status >= 400:
+    print(json.dumps({"error": response.read().decode(errors="replace").strip(), "status": response.status}), flush=True)
+    sys.exit(1)
+for line in response:
+    sys.stdout.write(line.decode(errors="replace"))
+    sys.stdout.flush()
+"""
+
+
+def compose_images(compose_content):
+    """Image references used by a compose file, in order of appearance."""
+    images = []
+    for image in re.findall(r"^\s*image:\s*['\"]?([^\s'\"]+)", compose_content, re.MULTILINE):
+        if image not in images:
+            images.append(image)
+    return images
+
+
+def split_image_ref(image):
+    """Splits 'repo:tag' into the (fromImage, tag) pair the pull API expects."""
+    if "@" in image:
+        return image, ""
+    name, sep, tag = image.rpartition(":")
+    if sep and "/" not in tag:
+        return name, tag
+    return image, "latest"
+
+
+# --- Offline image bundles ---
+
+BUNDLE_CHUNK_SIZE = 4 * 1024 * 1024   # Uncompressed bytes per gzip member
+BUNDLE_WORKERS = os.cpu_count() or 4  # Compression threads (zlib releases the GIL)
+BUNDLE_COMPRESSLEVEL = 6
+
+
+def _read_full(src, size):
+    """Reads up to size bytes, looping over short reads from pipes and sockets."""
+    parts = []
+    remaining = size
+    while remaining > 0:
+        data = src.read(remaining)
+        if not data:
+            break
+        parts.append(data)
+        remaining -= len(data)
+    return b"".join(parts)
+
+
+def parallel_gzip(src, dst, workers=BUNDLE_WORKERS, chunk_size=BUNDLE_CHUNK_SIZE, level=BUNDLE_COMPRESSLEVEL):
+    """Compresses src into dst as a multi-member gzip stream, one chunk per thread.
+
+    Any gzip reader (gzip -dc, Python's gzip module) reads the result as one
+    stream. Returns (sha256 of the compressed output, bytes read, bytes written).
+    """
+    sha = hashlib.sha256()
+    size_in = size_out = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = collections.deque()
+
+        def write_oldest():
+            nonlocal size_out
+            data = pending.popleft().result()
+            sha.update(data)
+            dst.write(data)
+            size_out += len(data)
+
+        while True:
+            chunk = _read_full(src, chunk_size)
+            if not chunk:
+                break
+            size_in += len(chunk)
+            pending.append(pool.submit(gzip.compress, chunk, level, mtime=0))
+            # Bounded read-ahead keeps memory at a few chunks per worker
+            while len(pending) >= workers * 2:
+                write_oldest()
+        while pending:
+            write_oldest()
+    return sha.hexdigest(), size_in, size_out
+
+
+def file_sha256(path, chunk_size=BUNDLE_CHUNK_SIZE):
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def write_checksum_file(path, digest):
+    with open(path + ".sha256", "w") as f:
+        f.write(f"{digest}  {os.path.basename(path)}\n")
+
+
+def read_checksum_file(path):
+    """Expected sha256 of path from its .sha256 file, or None if there is none."""
+    try:
+        with open(path + ".sha256", "r") as f:
+            return f.read().split()[0]
+    except (OSError, IndexError):
+        return None
+
+
+def sudo_popen(args, sudo_pw, **kwargs):
+    """Starts args under sudo with the password as the first line of stdin.
+
+    Used for streaming binary data (docker save/load) that does not fit the
+    line-based PrivilegedSession. The returned process' stdin (if piped) is
+    positioned right after the password.
+    """
+    stdin_wanted = kwargs.pop("stdin", None)
+    process = subprocess.Popen(["sudo", "-S", "-k", "-p", ""] + list(args), stdin=subprocess.PIPE, **kwargs)
+    process.stdin.write((sudo_pw + "\n").encode())
+    process.stdin.flush()
+    if stdin_wanted is None:
+        process.stdin.close()
+    return process
+
+
+def sudo_stream_in(args, sudo_pw, feed):
+    """Runs args under sudo and calls feed(stdin) to write its input; raises if the command fails."""
+    process = sudo_popen(args, sudo_pw, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    try:
+        feed(process.stdin)
+    finally:
+        try:
+            process.stdin.close()
+        except BrokenPipeError:
+            pass
+        stderr = process.stderr.read().decode(errors="replace")
+        process.wait()
+    if process.returncode != 0:
+        raise Exception(f"{' '.join(args[:3])} failed: {stderr.strip() or 'exit ' + str(process.returncode)}")
+
+
+# --- Database backup ---
+
+BACKUP_CONTAINER = "immich_postgres"
+BACKUP_JOBS = min(4, os.cpu_count() or 4)  # Parallel pg_dump/pg_restore jobs (one connection and core each)
+BACKUP_COMPRESSLEVEL = 6                   # pg_dump's own gzip, done by each job for its tables
+BACKUP_MANIFEST = "SHA256SUMS"             # Same format as sha256sum, so 'sha256sum -c' works too
+BACKUP_INFO = "backup.json"                # Source installation and row counts, checked after a restore
+BACKUP_PREFIX = "immich-db-"
+BACKUP_READY_TIMEOUT = 120                 # Seconds to wait for the database to accept connections
+# Tables whose row counts must match after a restore (names differ between Immich versions)
+BACKUP_COUNT_TABLES = ("assets", "asset", "albums", "album", "person", "asset_faces", "asset_face",
+                       "users", "user")
+
+
+def backup_name(install_dir):
+    """Folder name for a backup of install_dir: sorts by time, tells installations apart."""
+    slug = re.sub(r"[^A-Za-z0-9]+", "-", install_dir or "").strip("-") or "unknown"
+    return f"{BACKUP_PREFIX}{time.strftime('%Y%m%d-%H%M%S')}-{slug}"
+
+
+def write_manifest(directory, workers=BUNDLE_WORKERS):
+    """Writes the sha256 of every file in directory (one level) to its manifest."""
+    names = sorted(name for name in os.listdir(directory)
+                   if name != BACKUP_MANIFEST and os.path.isfile(os.path.join(directory, name)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        digests = list(pool.map(lambda name: file_sha256(os.path.join(directory, name)), names))
+    with open(os.path.join(directory, BACKUP_MANIFEST), "w") as f:
+        for name, digest in zip(names, digests):
+            f.write(f"{digest}  {name}\n")
+
+
+def read_manifest(directory):
+    """{file name: sha256} from a backup's manifest."""
+    digests = {}
+    with open(os.path.join(directory, BACKUP_MANIFEST), "r") as f:
+        for line in f:
+            if line.strip():
+                digest, name = line.rstrip("\n").split("  ", 1)
+                digests[name] = digest
+    return digests
+
+
+def verify_backup(directory, workers=BUNDLE_WORKERS):
+    """Names of the files in a backup that are missing or do not match the manifest."""
+    try:
+        expected = read_manifest(directory)
+    except (OSError, ValueError):
+        return [BACKUP_MANIFEST]
+
+    def matches(name):
+        try:
+            return file_sha256(os.path.join(directory, name)) == expected[name]
+        except OSError:
+            return False
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return [name for name, ok in zip(expected, pool.map(matches, expected)) if not ok]
+
+
+def read_backup_info(directory):
+    try:
+        with open(os.path.join(directory, BACKUP_INFO), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def find_backups(backup_root):
+    """Complete backups under backup_root, newest first (unfinished ones have no manifest)."""
+    try:
+        names = os.listdir(backup_root)
+    except OSError:
+        return []
+    paths = [os.path.join(backup_root, name) for name in names if name.startswith(BACKUP_PREFIX)]
+    return sorted((path for path in paths if os.path.isfile(os.path.join(path, BACKUP_MANIFEST))), reverse=True)
+
+
+# --- Machine learning models ---
+
+# Immich's default models; the ML service looks for them in <cache>/<type>/<name>
+ML_MODELS = {"clip": "ViT-B-32__openai", "facial-recognition": "buffalo_l"}
+ML_MODEL_HUB = "https://huggingface.co"
+ML_MODEL_REPO = "immich-app"
+ML_MODEL_SKIP = ("*.armnn", "*.rknn", ".gitattributes")  # Files for other accelerators
+ML_MODEL_DIR = os.path.join(STATE_DIR, "models")         # Downloads, kept for the next install
+ML_CACHE_VOLUME = "immich_model-cache"                   # model-cache volume of the "immich" project
+ML_DOWNLOAD_WORKERS = 4
+ML_REPORT_INTERVAL = 10       # Seconds between download progress lines
+ML_WARMUP_TIMEOUT = 600       # Loading the models on a Pi 3 can take minutes
+
+# Runs inside the ML container (its port 3003 is not published): sends one image
+# and one text request to /predict twice and prints "COLD <s>" and "WARM <s>".
+ML_WARMUP_SCRIPT = r"""
+import json, struct, sys, time, urllib.request, uuid, zlib
+clip, faces, timeout = sys.argv[1], sys.argv[2], float(sys.argv[3])
+def png(size):
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+    rows = b"".join(b"\x00" + b"\x80" * (size * 3) for _ in range(size))
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", size, size, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(rows)) + chunk(b"IEND", b""))
+def predict(entries, field, data, filename=None):
+    boundary = uuid.uuid4().hex
+    body = b""
+    for name, value, fname in (("entries", json.dumps(entries).encode(), None), (field, data, filename)):
+        disposition = f'form-data; name="{name}"' + (f'; filename="{fname}"' if fname else "")
+        body += f"--{boundary}\r\nContent-Disposition: {disposition}\r\n\r\n".encode() + value + b"\r\n"
+    body += f"--{boundary}--\r\n".encode()
+    request = urllib.request.Request("http://localhost:3003/predict", data=body,
+                                     headers={"Content-Type": f"multipart/form-data; boundary={boundary}"})
+    urllib.request.urlopen(request, timeout=timeout).read()
+image = {"clip": {"visual": {"modelName": clip}},
+         "facial-recognition": {"detection": {"modelName": faces, "options": {"minScore": 0.7}},
+                                "recognition": {"modelName": faces}}}
+text = {"clip": {"textual": {"modelName": clip}}}
+for label in ("COLD", "WARM"):
+    start = time.monotonic()
+    predict(image, "image", png(64), "warmup.png")
+    predict(text, "text", b"a photo of a dog")
+    print(f"{label} {time.monotonic() - start:.3f}", flush=True)
+"""
+
+
+def model_files(model_name, hub=None):
+    """(path, size) of the files in a model's repository on the hub."""
+    url = f"{hub or ML_MODEL_HUB}/api/models/{ML_MODEL_REPO}/{model_name}/tree/main?recursive=true"
+    with urllib.request.urlopen(url, timeout=30) as response:
+        entries = json.load(response)
+    return [(entry["path"], entry.get("size") or 0) for entry in entries
+            if entry.get("type") == "file"
+            and not any(fnmatch.fnmatch(os.path.basename(entry["path"]), pattern) for pattern in ML_MODEL_SKIP)]
+
+
+def download_file(url, path, size=0, on_bytes=None, chunk_size=1024 * 1024):
+    """Downloads url to path, resuming the .part file of an interrupted run. Returns bytes downloaded."""
+    if os.path.isfile(path) and (not size or os.path.getsize(path) == size):
+        return 0
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    partial = path + ".part"
+    offset = os.path.getsize(partial) if os.path.exists(partial) else 0
+    downloaded = 0
+    if not size or offset < size:
+        request = urllib.request.Request(url, headers={"Range": f"bytes={offset}-"} if offset else {})
+        with urllib.request.urlopen(request, timeout=60) as response:
+            if response.status != 206:
+                offset = 0  # The server ignored the range, start over
+            with open(partial, "ab" if offset else "wb") as f:
+                for chunk in iter(lambda: response.read(chunk_size), b""):
+                    f.write(chunk)
+                    downloaded += len(chunk)
+                    if on_bytes:
+                        on_bytes(len(chunk))
+    os.replace(partial, path)
+    return downloaded
+
+
+def fetch_models(models, target, log, hub=None, workers=ML_DOWNLOAD_WORKERS):
+    """Downloads the files of all models into target/<type>/<name>, several at a time.
+
+    Files that are already complete are skipped. Returns (bytes downloaded, total bytes).
+    """
+    hub = hub or ML_MODEL_HUB
+    files = []
+    for model_type, name in models.items():
+        for path, size in model_files(name, hub):
+            files.append((f"{hub}/{ML_MODEL_REPO}/{name}/resolve/main/{path}",
+                          os.path.join(target, model_type, name, path), size))
+    total = sum(size for _, _, size in files)
+    done = 0
+    lock = threading.Lock()
+
+    def on_bytes(count):
+        nonlocal done
+        with lock:
+            done += count
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = {pool.submit(download_file, url, path, size, on_bytes) for url, path, size in files}
+        while pending:
+            finished, pending = wait(pending, timeout=ML_REPORT_INTERVAL)
+            for future in finished:
+                future.result()
+            if pending:
+                rate = done / max(time.monotonic() - start, 0.001)
+                log(f"  Models: {format_bytes(done)} downloaded ({format_bytes(rate)}/s), "
+                    f"{len(pending)} of {len(files)} files left")
+    return done, total
+
+
+def model_bundle_reader(path):
+    """Opens a model bundle (tar, optionally gzip-compressed) for reading the raw tar stream."""
+    with open(path, "rb") as f:
+        compressed = f.read(2) == b"\x1f\x8b"
+    return gzip.open(path, "rb") if compressed else open(path, "rb")
+
+
+# --- Pull progress ---
+
+PULL_CONCURRENCY = 2          # Images downloaded at the same time (1-2 works best on Wi-Fi)
+PULL_RETRIES = 3              # Attempts per image; finished layers are kept between attempts
+PULL_RETRY_BACKOFF = 5        # Seconds before the first retry, doubled after each failure
+PROGRESS_REFRESH_MS = 500     # How often the progress bar is redrawn
+PULL_LOG_INTERVAL = 10        # Seconds between aggregated progress lines in the log
+PULL_RATE_WINDOW = 5          # Seconds of history used for throughput and ETA
+
+
+class PullProgress:
+    """Turns Engine API pull events into per-image and per-layer byte counters.
+
+    feed() is called from the pull threads, snapshot() from the UI timer.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.images = {}
+        self._samples = collections.deque()
+
+    def start_image(self, image):
+        with self._lock:
+            info = self.images.setdefault(image, {"layers": {}, "start": time.monotonic()})
+            # A retry keeps the layers (and bytes) of earlier attempts
+            info["end"] = None
+            info["status"] = "pulling"
+
+    def feed(self, image, event):
+        if "error" in event:
+            raise Exception(f"Pull of {image} failed: {event['error']}")
+        status = event.get("status", "")
+        layer_id = event.get("id")
+        detail = event.get("progressDetail") or {}
+        with self._lock:
+            info = self.images.setdefault(image, {"layers": {}, "start": time.monotonic(), "end": None, "status": "pulling"})
+            if not layer_id or layer_id == split_image_ref(image)[1]:
+                return
+            layer = info["layers"].setdefault(layer_id, {"current": 0, "total": 0, "done": False})
+            if status == "Downloading" and detail.get("total"):
+                layer["total"] = detail["total"]
+                layer["current"] = detail.get("current", 0)
+            elif status in ("Download complete", "Verifying Checksum", "Extracting", "Pull complete"):
+                layer["current"] = layer["total"]
+                layer["done"] = layer["done"] or status == "Pull complete"
+            elif status == "Already exists":
+                layer["done"] = True
+
+    def finish_image(self, image, status="done"):
+        with self._lock:
+            info = self.images.get(image)
+            if info:
+                info["end"] = time.monotonic()
+                info["status"] = status
+
+    def _image_bytes(self, info):
+        current = sum(layer["current"] for layer in info["layers"].values())
+        total = sum(layer["total"] for layer in info["layers"].values())
+        return current, total
+
+    def snapshot(self):
+        """Returns (fraction, downloaded_bytes, total_bytes, bytes_per_sec, eta_seconds)."""
+        with self._lock:
+            current = total = 0
+            finished = 0
+            for info in self.images.values():
+                image_current, image_total = self._image_bytes(info)
+                current += image_current
+                total += image_total
+                finished += info["status"] != "pulling"
+            now = time.monotonic()
+            self._samples.append((now, current))
+            while len(self._samples) > 2 and now - self._samples[0][0] > PULL_RATE_WINDOW:
+                self._samples.popleft()
+            elapsed = now - self._samples[0][0]
+            rate = (current - self._samples[0][1]) / elapsed if elapsed > 0 else 0
+            if self.images and finished == len(self.images):
+                fraction = 1.0
+            else:
+                fraction = current / total if total else 0.0
+            eta = (total - current) / rate if rate > 0 else None
+            return fraction, current, total, rate, eta
+
+    def summary(self, image):
+        """Returns (bytes, seconds, bytes_per_sec) for a finished image."""
+        with self._lock:
+            info = self.images[image]
+            current, _ = self._image_bytes(info)
+            duration = (info["end"] or time.monotonic()) - info["start"]
+            return current, duration, current / duration if duration > 0 else 0
+
+
+def format_duration(seconds):
+    seconds = int(seconds)
+    if seconds < 60:
+        return f"{seconds}s"
+    if seconds < 3600:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    if seconds < 86400:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    return f"{seconds // 86400}d{seconds % 86400 // 3600:02d}h"
+
+
+def format_progress(fraction, current, total, rate, eta):
+    text = f"{fraction * 100:.0f}%  {format_bytes(current)} / {format_bytes(total)}  {format_bytes(rate)}/s"
+    if eta is not None and fraction < 1:
+        text += f"  ETA {format_duration(eta)}"
+    return text
+
+
+# --- Readiness ---
+
+READY_TIMEOUT = 600           # Seconds to wait for all services after 'docker compose up -d'
+READY_POLL_MIN = 1            # First poll interval in seconds, grows by READY_POLL_FACTOR
+READY_POLL_MAX = 10
+READY_POLL_FACTOR = 1.5
+CRASH_LOOP_RESTARTS = 3       # Restarts after which a container counts as crash looping
+SERVER_PING_URL = "http://127.0.0.1:2283/api/server/ping"
+
+IMMICH_CONTAINERS = ["immich_server", "immich_machine_learning", "immich_redis", "immich_postgres"]
+
+
+def server_ping(url=None, timeout=3):
+    """True if the Immich server answers its ping endpoint."""
+    try:
+        with urllib.request.urlopen(url or SERVER_PING_URL, timeout=timeout) as response:
+            return response.status == 200
+    except Exception:
+        return False
+
+
+# --- Hot storage ---
+
+# Folders inside the upload location that Immich reads randomly and often, with
+# the .env key recording where each one lives when it is on separate storage
+HOT_STORAGE_DIRS = {"thumbs": "THUMB_LOCATION", "encoded-video": "ENCODED_VIDEO_LOCATION",
+                    "profile": "PROFILE_LOCATION"}
+MIGRATION_WORKERS = 4          # Files copied at the same time
+MIGRATION_REPORT_INTERVAL = 10  # Seconds between progress lines in the log
+
+# Runs as root: copies argv[1] into argv[2] with a pool of threads. Every file is
+# written to a .part file, read back from the device and compared by sha256, and
+# only then renamed into place, so a file under its final name is always complete.
+# Files already there with the same size and mtime are skipped, which makes an
+# interrupted copy resumable and a second pass cheap. Prints
+# "PROGRESS <copied> <skipped> <bytes>", "ERROR <message>" and finally "DONE ...".
+MIGRATE_SCRIPT = r"""
+import hashlib, os, sys, time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+src_root, dst_root, workers, interval = sys.argv[1], sys.argv[2], int(sys.argv[3]), float(sys.argv[4])
+counts = {"copied": 0, "skipped": 0, "bytes": 0, "errors": 0}
+def digest(f):
+    sha = hashlib.sha256()
+    for chunk in iter(lambda: f.read(1 << 20), b""):
+        sha.update(chunk)
+    return sha.digest()
+def copy(src, dst):
+    st = os.stat(src)
+    try:
+        existing = os.stat(dst)
+        if existing.st_size == st.st_size and existing.st_mtime_ns == st.st_mtime_ns:
+            return "skipped", 0
+    except FileNotFoundError:
+        pass
+    tmp = dst + ".part"
+    with open(src, "rb") as fin, open(tmp, "wb") as fout:
+        sha = hashlib.sha256()
+        for chunk in iter(lambda: fin.read(1 << 20), b""):
+            sha.update(chunk)
+            fout.write(chunk)
+        fout.flush()
+        os.fsync(fout.fileno())
+        expected = sha.digest()
+    with open(tmp, "rb") as f:
+        # Read back from the device, not from the page cache
+        if hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+        if digest(f) != expected:
+            os.remove(tmp)
+            raise OSError(f"{dst}: copy does not match the original")
+    os.chown(tmp, st.st_uid, st.st_gid)
+    os.chmod(tmp, st.st_mode & 0o7777)
+    os.utime(tmp, ns=(st.st_atime_ns, st.st_mtime_ns))
+    os.replace(tmp, dst)
+    return "copied", st.st_size
+def report():
+    print(f"PROGRESS {counts['copied']} {counts['skipped']} {counts['bytes']}", flush=True)
+last = time.monotonic()
+running = set()
+def collect(done):
+    for future in done:
+        running.discard(future)
+        try:
+            kind, size = future.result()
+            counts[kind] += 1
+            counts["bytes"] += size
+        except OSError as e:
+            counts["errors"] += 1
+            if counts["errors"] <= 20:
+                print(f"ERROR {e}", flush=True)
+with ThreadPoolExecutor(max_workers=workers) as pool:
+    for dirpath, dirnames, filenames in os.walk(src_root):
+        target = os.path.join(dst_root, os.path.relpath(dirpath, src_root))
+        try:
+            os.makedirs(target, exist_ok=True)
+            st = os.stat(dirpath)
+            os.chown(target, st.st_uid, st.st_gid)
+        except OSError as e:
+            counts["errors"] += 1
+            print(f"ERROR {e}", flush=True)
+            continue
+        for name in filenames:
+            if name.endswith(".part"):
+                continue
+            # Bounded queue: the tree is streamed, not listed up front
+            if len(running) >= workers * 4:
+                collect(wait(running, return_when=FIRST_COMPLETED)[0])
+            running.add(pool.submit(copy, os.path.join(dirpath, name), os.path.join(target, name)))
+        if time.monotonic() - last >= interval:
+            last = time.monotonic()
+            report()
+    collect(wait(running)[0])
+print(f"DONE {counts['copied']} {counts['skipped']} {counts['bytes']} {counts['errors']}", flush=True)
+sys.exit(1 if counts["errors"] else 0)
+"""
+
+
+def hot_storage_locations(photos_path, hot_path=None):
+    """Host folder of each HOT_STORAGE_DIRS entry: under hot_path if given, else inside the photo storage."""
+    return {name: os.path.join(hot_path or photos_path, name) for name in HOT_STORAGE_DIRS}
+
+
+def existing_hot_path(env):
+    """Fast storage folder used by an existing .env, or None if it has none.
+
+    Raises if the *_LOCATION folders do not share one parent, because the
+    installer could not write that layout back.
+    """
+    parents = {os.path.dirname(os.path.normpath(env[key])) for key in HOT_STORAGE_DIRS.values() if env.get(key)}
+    if len(parents) > 1:
+        raise Exception(f"The fast storage folders in .env are in different places ({', '.join(sorted(parents))}); "
+                        f"set the fast storage path explicitly.")
+    return parents.pop() if parents else None
+
+
+def hot_storage_moves(env, photos_path, hot_path=None):
+    """{name: (current folder, new folder)} for hot storage folders that change place and hold data.
+
+    env is the current .env; folders without a *_LOCATION key live inside
+    UPLOAD_LOCATION. Changing the photo path alone moves nothing: the
+    originals are the user's to move, and the thumbnails go with them.
+    Without hot_path, folders on fast storage move back to the photo storage,
+    so callers pass existing_hot_path(env) unless that is really wanted.
+    """
+    upload = env.get("UPLOAD_LOCATION") or photos_path
+    new = hot_storage_locations(photos_path, hot_path)
+    moves = {}
+    for name, key in HOT_STORAGE_DIRS.items():
+        if not env.get(key) and not hot_path:
+            continue
+        current = env.get(key) or os.path.join(upload, name)
+        if os.path.normpath(current) != os.path.normpath(new[name]) and os.path.isdir(current):
+            moves[name] = (current, new[name])
+    return moves
+
+
+# --- Reconfigure / update ---
+
+def render_config(inst_path, p_path, ext_path, db_password, tuning, hot_path=None, job_config=False):
+    """Contents of the generated files, keyed by file name (immich.json only with job_config)."""
+    volumes = env = config_volume = config_env = ""
+    if job_config:
+        config_volume = f"      - {inst_path}/immich.json:/config/immich.json:ro\n"
+        config_env = "IMMICH_CONFIG_FILE=/config/immich.json\n"
+    if hot_path:
+        # Mounted over the matching folders inside /usr/src/app/upload
+        locations = hot_storage_locations(p_path, hot_path)
+        volumes = "".join(f"      - {locations[name]}:/usr/src/app/upload/{name}\n" for name in HOT_STORAGE_DIRS)
+        env = ("\n# Fast storage for thumbnails, transcoded videos and profile pictures\n"
+               + "".join(f"{key}={locations[name]}\n" for name, key in HOT_STORAGE_DIRS.items()))
+    files = {
+        "docker-compose.yml": DOCKER_COMPOSE_TEMPLATE.format(
+            PHOTOS_PATH=p_path,
+            HOT_STORAGE_VOLUMES=volumes,
+            CONFIG_FILE_VOLUME=config_volume,
+            EXTERNAL_LIB_PATH=ext_path,
+            DB_PASSWORD=db_password,
+            INSTALL_PATH=inst_path,
+            **tuning
+        ),
+        ".env": ENV_TEMPLATE.format(
+            PHOTOS_PATH=p_path,
+            DB_PASSWORD=db_password,
+            HOT_STORAGE_ENV=env,
+            CONFIG_FILE_ENV=config_env,
+            **tuning
+        ),
+    }
+    if job_config:
+        files["immich.json"] = IMMICH_CONFIG_TEMPLATE.format(**tuning)
+    return files
+
+
+def read_env_file(path):
+    """KEY=VALUE pairs of a .env file."""
+    values = {}
+    try:
+        with open(path, "r") as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith("#") and "=" in line:
+                    key, _, value = line.partition("=")
+                    values[key.strip()] = value.strip()
+    except OSError:
+        pass
+    return values
+
+
+def compose_services(content):
+    """Splits the services section of a generated compose file into {service: block text}.
+
+    Only understands the layout of DOCKER_COMPOSE_TEMPLATE (two-space indented
+    service keys), which is all this installer writes.
+    """
+    services = {}
+    current = None
+    in_services = False
+    for line in content.splitlines():
+        if not line.strip():
+            continue
+        if not line.startswith(" "):
+            in_services = line.startswith("services:")
+            current = None
+            continue
+        if not in_services:
+            continue
+        match = re.match(r"^  ([\w.-]+):\s*$", line)
+        if match:
+            current = match.group(1)
+            services[current] = []
+        elif current:
+            services[current].append(line)
+    return {name: "\n".join(lines) for name, lines in services.items()}
+
+
+def compose_service_field(block, field):
+    """Value of a top-level field (image, container_name) in a service block."""
+    match = re.search(rf"^    {field}:\s*(\S+)", block, re.MULTILINE)
+    return match.group(1) if match else None
+
+
+def plan_update(old_files, new_files):
+    """Compares generated files with the ones on disk.
+
+    Returns (diff_lines, changed_services). A service counts as changed when
+    its compose block differs, or when a file it reads (.env, immich.json) does.
+    """
+    diff = []
+    for name, new_content in new_files.items():
+        old_content = old_files.get(name, "")
+        diff.extend(difflib.unified_diff(old_content.splitlines(), new_content.splitlines(),
+                                         fromfile=f"{name} (current)", tofile=f"{name} (new)", lineterm=""))
+
+    old_services = compose_services(old_files.get("docker-compose.yml", ""))
+    new_services = compose_services(new_files["docker-compose.yml"])
+    changed = {name for name, block in new_services.items() if old_services.get(name) != block}
+    env_changed = old_files.get(".env") != new_files[".env"]
+    config_changed = old_files.get("immich.json") != new_files.get("immich.json")
+    for name, block in new_services.items():
+        if env_changed and "- .env" in block:
+            changed.add(name)
+        if config_changed and "immich.json" in block:
+            changed.add(name)
+    return diff, sorted(changed)
+
+
+# --- Tracing ---
+
+TRACE_DIR = os.path.join(STATE_DIR, "traces")
+TRACE_NAME_CHARS = 80        # Longest span name taken from a shell command
+TRACE_COMMAND_CHARS = 300    # Longest command kept in a span's args
+
+
+def _cut(text, limit):
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
+
+def command_label(cmd):
+    """Short span name for a shell command: its first line, cut to TRACE_NAME_CHARS.
+
+    Commands that run one of the *_SCRIPT helpers pass their own name instead.
+    """
+    lines = cmd.strip().splitlines()
+    return _cut(lines[0] if lines else cmd, TRACE_NAME_CHARS)
+
+
+def wait_with_rusage(process):
+    """Reaps process like Popen.wait() and returns its CPU seconds (user + system, incl. waited-for children)."""
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    return usage.ru_utime + usage.ru_stime
+
+
+def communicate_with_rusage(process):
+    """Popen.communicate() that also returns the CPU seconds of the process."""
+    err = []
+    reader = threading.Thread(target=lambda: err.append(process.stderr.read()))
+    reader.start()
+    out = process.stdout.read()
+    reader.join()
+    return out, err[0], wait_with_rusage(process)
+
+
+class Tracer:
+    """Collects timed spans of one run and writes them as JSON lines and a Chrome trace.
+
+    Spans may be recorded from any thread. Open the .trace.json file in
+    chrome://tracing or https://ui.perfetto.dev to see phases side by side.
+    """
+
+    def __init__(self, run_name="install"):
+        self.run_name = run_name
+        self.started_at = time.time()
+        self._t0 = time.monotonic()
+        self._lock = threading.Lock()
+        self.events = []
+        self._threads = {}
+
+    def record(self, name, category, start, duration, **args):
+        """Adds a finished span; start is a time.monotonic() value."""
+        thread = threading.current_thread()
+        with self._lock:
+            tid = self._threads.setdefault(thread.ident, (len(self._threads) + 1, thread.name))[0]
+            self.events.append({
+                "name": name,
+                "category": category,
+                "start_s": round(start - self._t0, 6),
+                "duration_s": round(duration, 6),
+                "thread": tid,
+                **args
+            })
+
+    @contextlib.contextmanager
+    def span(self, name, category="phase", **args):
+        """Times the with-block. Yields a dict for extra fields (e.g. bytes) filled in by the caller."""
+        start = time.monotonic()
+        thread_cpu = time.thread_time()
+        info = dict(args)
+        info["status"] = "ok"
+        try:
+            yield info
+        except BaseException:
+            info["status"] = "error"
+            raise
+        finally:
+            info.setdefault("thread_cpu_s", round(time.thread_time() - thread_cpu, 6))
+            self.record(name, category, start, time.monotonic() - start, **info)
+
+    def write(self, directory=None):
+        """Writes <run>-<time>.jsonl and <run>-<time>.trace.json. Returns both paths."""
+        directory = directory or TRACE_DIR
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, f"{self.run_name}-{time.strftime('%Y%m%d-%H%M%S', time.localtime(self.started_at))}")
+        with self._lock:
+            events = sorted(self.events, key=lambda e: e["start_s"])
+            threads = dict(self._threads)
+
+        with open(base + ".jsonl", "w") as f:
+            f.write(json.dumps({"run": self.run_name, "started_at": self.started_at,
+                                "host": socket.gethostname()}) + "\n")
+            for event in events:
+                f.write(json.dumps(event) + "\n")
+
+        trace_events = [{"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": thread_name}}
+                        for tid, thread_name in threads.values()]
+        for event in events:
+            args = {k: v for k, v in event.items() if k not in ("name", "category", "start_s", "duration_s", "thread")}
+            trace_events.append({
+                "name": event["name"],
+                "cat": event["category"],
+                "ph": "X",
+                "ts": int(event["start_s"] * 1e6),
+                "dur": int(event["duration_s"] * 1e6),
+                "pid": 1,
+                "tid": event["thread"],
+                "args": args
+            })
+        with open(base + ".trace.json", "w") as f:
+            json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, f)
+        return base + ".jsonl", base + ".trace.json"
+
+
+# --- Scheduling ---
+
+class TaskGraph:
+    """Runs named steps on a bounded thread pool as soon as their dependencies are done.
+
+    A step that raises is marked 'failed' and every step depending on it is
+    'skipped'. Independent steps keep running. Optional steps (advisory checks)
+    get their own threads outside the max_workers pool, run() does not wait for
+    them (see wait_optional) and their failures are left out of fatal_errors().
+    """
+
+    def __init__(self, max_workers=4, on_status=None, tracer=None):
+        self.max_workers = max_workers
+        self.on_status = on_status
+        self.tracer = tracer
+        self.steps = {}
+        self.status = {}
+        self.results = {}
+        self.errors = {}
+        self.optional = set()
+        self.started = {}
+        self.durations = {}
+        self._pool = None
+        self._optional_pool = None
+        self._running = {}
+
+    def add(self, name, func, deps=(), optional=False):
+        """Adds a step. Dependencies must have been added before."""
+        for dep in deps:
+            if dep not in self.steps:
+                raise ValueError(f"Unknown dependency '{dep}' for step '{name}'")
+        self.steps[name] = (func, tuple(deps))
+        self.status[name] = "waiting"
+        if optional:
+            self.optional.add(name)
+        return name
+
+    def fatal_errors(self):
+        """Returns {name: error} for the failed steps that are not optional."""
+        return {name: error for name, error in self.errors.items() if name not in self.optional}
+
+    def _set_status(self, name, state):
+        if state == "running":
+            self.started[name] = time.monotonic()
+        elif name in self.started:
+            self.durations[name] = time.monotonic() - self.started[name]
+        self.status[name] = state
+        if self.on_status:
+            self.on_status(name, state)
+
+    def _run_step(self, name, func):
+        if self.tracer is None:
+            return func()
+        with self.tracer.span(name, "step"):
+            return func()
+
+    def _settle(self, done):
+        """Starts steps as their dependencies finish until done() or nothing can run any more."""
+        while not done():
+            # Steps were added in dependency order, so one pass settles everything that can start
+            for name, (func, deps) in self.steps.items():
+                if self.status[name] != "waiting":
+                    continue
+                if any(self.status[dep] in ("failed", "skipped") for dep in deps):
+                    self._set_status(name, "skipped")
+                elif all(self.status[dep] == "done" for dep in deps):
+                    if name in self.optional:
+                        pool = self._optional_pool
+                    elif sum(1 for n in self._running.values() if n not in self.optional) < self.max_workers:
+                        pool = self._pool
+                    else:
+                        continue
+                    self._set_status(name, "running")
+                    self._running[pool.submit(self._run_step, name, func)] = name
+            if not self._running or done():
+                break
+            finished, _ = wait(self._running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = self._running.pop(future)
+                try:
+                    self.results[name] = future.result()
+                    self._set_status(name, "done")
+                except Exception as e:
+                    self.errors[name] = e
+                    self._set_status(name, "failed")
+
+    def _required_settled(self):
+        return all(self.status[name] not in ("waiting", "running") for name in self.steps if name not in self.optional)
+
+    def run(self):
+        """Runs the required steps and returns {name: result} for the successful ones.
+
+        Optional steps that are still waiting or running then go on; see wait_optional().
+        """
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers)
+        self._optional_pool = ThreadPoolExecutor(max_workers=max(1, len(self.optional)))
+        self._settle(self._required_settled)
+        if not self._running:
+            self.wait_optional()
+        return self.results
+
+    def pending_optional(self):
+        """Optional steps that have not finished yet."""
+        return [name for name in self.steps if name in self.optional and self.status[name] in ("waiting", "running")]
+
+    def wait_optional(self):
+        """Lets the optional steps left over by run() finish."""
+        if self._pool is None:
+            return
+        self._settle(lambda: False)
+        self._pool.shutdown()
+        self._optional_pool.shutdown()
+        self._pool = self._optional_pool = None
+
+
+# --- Background deletion ---
+
+TRASH_DIR_NAME = ".immich-trash"
+TRASH_INDEX_FILE = os.path.join(STATE_DIR, "trash.json")
+REAPER_BATCH_FILES = 500      # Files deleted between two pauses
+REAPER_PAUSE = 0.05           # Seconds to pause after each batch
+REAPER_REPORT_INTERVAL = 5    # Seconds between progress lines in the log
+REAPER_LOG_FILE = os.path.join(STATE_DIR, "reaper.log")
+REAPER_FOLLOW_INTERVAL = 1    # Seconds between checks for new lines in REAPER_LOG_FILE
+
+# Runs as root, detached from the installer (see start_reaper), so the deletion goes on
+# after the installer exits. Deletes the directories in the trash index argv[1] one by
+# one, bottom-up in small batches, and drops each from the index once it is gone.
+# Prints "START <path>", "PROGRESS <files> <bytes> <path>", "FINISHED <files> <bytes>
+# <seconds> <path>", "FAILED <path>" and "IDLE" at the end. A second reaper waits
+# for the first one.
+REAPER_SCRIPT = r"""
+import fcntl, json, os, sys, time
+index, batch, pause, interval = sys.argv[1], int(sys.argv[2]), float(sys.argv[3]), float(sys.argv[4])
+running = open(index + ".reaper", "a")
+fcntl.flock(running, fcntl.LOCK_EX)
+
+def pending(drop=None):
+    # Same lock as update_pending_trash in the installer
+    with open(index + ".lock", "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            with open(index) as f:
+                paths = json.load(f).get("pending", [])
+        except (OSError, ValueError):
+            paths = []
+        if drop is not None:
+            paths = [p for p in paths if p != drop]
+            # The index belongs to the user who runs the installer
+            owner = os.stat(os.path.dirname(index))
+            tmp = index + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump({"pending": sorted(set(paths))}, f, indent=2)
+            os.chown(tmp, owner.st_uid, owner.st_gid)
+            os.replace(tmp, index)
+        return paths
+
+failed = set()
+while True:
+    todo = [p for p in pending() if p not in failed]
+    if not todo:
+        break
+    top = todo[0]
+    print(f"START {top}", flush=True)
+    start = last = time.monotonic()
+    files = size = 0
+    for dirpath, dirnames, filenames in os.walk(top, topdown=False):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            try:
+                size += os.lstat(path).st_size
+                os.unlink(path)
+                files += 1
+            except OSError:
+                continue
+            if files % batch == 0:
+                time.sleep(pause)
+            if time.monotonic() - last >= interval:
+                print(f"PROGRESS {files} {size} {top}", flush=True)
+                last = time.monotonic()
+        for name in dirnames:
+            path = os.path.join(dirpath, name)
+            try:
+                os.unlink(path) if os.path.islink(path) else os.rmdir(path)
+            except OSError:
+                pass
+    try:
+        os.rmdir(top)
+    except OSError:
+        pass
+    if os.path.lexists(top):
+        # Stays in the index for the next run; do not spin on it now
+        failed.add(top)
+        print(f"FAILED {top}", flush=True)
+    else:
+        pending(drop=top)
+        print(f"FINISHED {files} {size} {time.monotonic() - start:.0f} {top}", flush=True)
+print("IDLE", flush=True)
+"""
+
+
+def load_pending_trash():
+    """Trash directories that still have to be deleted (survives crashes and reboots)."""
+    try:
+        with open(TRASH_INDEX_FILE, "r") as f:
+            return list(json.load(f).get("pending", []))
+    except (OSError, ValueError):
+        return []
+
+
+def save_pending_trash(paths):
+    try:
+        os.makedirs(STATE_DIR, exist_ok=True)
+        tmp_file = TRASH_INDEX_FILE + ".tmp"
+        with open(tmp_file, "w") as f:
+            json.dump({"pending": sorted(set(paths))}, f, indent=2)
+        os.replace(tmp_file, TRASH_INDEX_FILE)
+    except OSError:
+        pass
+
+
+def update_pending_trash(change):
+    """Replaces the trash index with change(paths), under the lock the reaper uses too."""
+    try:
+        os.makedirs(STATE_DIR, exist_ok=True)
+        with open(TRASH_INDEX_FILE + ".lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            save_pending_trash(change(load_pending_trash()))
+    except OSError:
+        pass
+
+
+def format_bytes(num):
+    for unit in ("B", "KB", "MB", "GB"):
+        if num < 1024:
+            return f"{num:.1f} {unit}" if unit != "B" else f"{int(num)} B"
+        num /= 1024
+    return f"{num:.1f} TB"
+
+
+# --- Logging ---
+
+LOG_FLUSH_INTERVAL_MS = 100   # How often queued lines are pushed to the log window
+LOG_MAX_LINES = 2000          # Lines kept in the log window (older lines are dropped)
+LOG_FILE = os.path.join(os.path.expanduser("~"), "immich-installer.log")
+
+
+class LogSink:
+    """Collects log lines from any thread and flushes them to the log window in batches.
+
+    Every line is also appended to LOG_FILE, so nothing is lost when the window
+    drops old lines to stay within max_lines.
+    """
+
+    def __init__(self, root, widget, max_lines=LOG_MAX_LINES,
+                 interval_ms=LOG_FLUSH_INTERVAL_MS, log_file=LOG_FILE):
+        self.root = root
+        self.widget = widget
+        self.max_lines = max_lines
+        self.interval_ms = interval_ms
+        self.log_file = log_file
+        self._queue = queue.SimpleQueue()
+        self._file_lock = threading.Lock()
+        self._file = None
+        try:
+            self._file = open(log_file, "a", encoding="utf-8")
+            self._file.write(f"\n===== Immich Installer started {time.strftime('%Y-%m-%d %H:%M:%S')} =====\n")
+        except OSError:
+            self.log_file = None
+        self.root.after(self.interval_ms, self._flush)
+
+    def write(self, message):
+        """Queue a message for the window and stream it to the log file. Safe to call from any thread."""
+        line = str(message).strip()
+        self._queue.put(line)
+        if self._file:
+            with self._file_lock:
+                self._file.write(line + "\n")
+
+    def _drain(self):
+        lines = []
+        while True:
+            try:
+                lines.append(self._queue.get_nowait())
+            except queue.Empty:
+                return lines
+
+    def _flush(self):
+        """Runs on the Tk thread: insert everything queued since the last tick in one go."""
+        try:
+            lines = self._drain()
+            if lines:
+                # No point inserting lines that would be trimmed right away
+                lines = lines[-self.max_lines:]
+                self.widget.configure(state='normal')
+                self.widget.insert(tk.END, "\n".join(lines) + "\n")
+                line_count = int(self.widget.index('end-1c').split('.')[0]) - 1
+                if line_count > self.max_lines:
+                    self.widget.delete('1.0', f"{line_count - self.max_lines + 1}.0")
+                self.widget.see(tk.END)
+                self.widget.configure(state='disabled')
+            if self._file:
+                with self._file_lock:
+                    self._file.flush()
+        finally:
+            self.root.after(self.interval_ms, self._flush)
+
+# --- Headless mode ---
+
+# Exit codes of install_logic/export_logic, returned by the command line
+EXIT_OK = 0
+EXIT_FAILED = 1       # A step failed, see the log
+EXIT_USAGE = 2        # Missing or invalid settings
+EXIT_NOT_READY = 3    # Installed, but not every service answered in time
+EXIT_CANCELLED = 4    # Update changes were not confirmed (use --yes)
+
+# Config file keys (JSON) and their defaults; command-line options override them
+CONFIG_DEFAULTS = {
+    "install_path": "",
+    "photos_path": "",
+    "external_library_path": "",
+    "hot_storage_path": "",
+    "bundle": "",
+    "backup_path": "",
+    "model_bundle": "",
+    "sudo_password": "",
+    "stop_existing": True,
+    "rescan": False,
+    "preflight": True,
+    "library_scan": True,
+    "job_config_file": False,
+    "update": False,
+    "migrate_hot_storage": True,
+    "remove_hot_storage": False,
+    "restore_backup": False,
+    "prewarm_models": True,
+    "pull_concurrency": PULL_CONCURRENCY,
+}
+SUDO_PASSWORD_ENV = "IMMICH_SUDO_PASSWORD"
+
+
+def load_settings(config_file=None, overrides=None, password=None):
+    """Merges CONFIG_DEFAULTS, the config file, the environment and command-line overrides."""
+    settings = dict(CONFIG_DEFAULTS)
+    if config_file:
+        try:
+            with open(config_file, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            raise Exception(f"Could not read config file {config_file}: {e}")
+        if not isinstance(data, dict):
+            raise Exception(f"{config_file} must contain a JSON object")
+        unknown = sorted(set(data) - set(CONFIG_DEFAULTS))
+        if unknown:
+            raise Exception(f"Unknown setting(s) in {config_file}: {', '.join(unknown)}")
+        settings.update(data)
+    if os.environ.get(SUDO_PASSWORD_ENV):
+        settings["sudo_password"] = os.environ[SUDO_PASSWORD_ENV]
+    settings.update({k: v for k, v in (overrides or {}).items() if v is not None})
+    if password is not None:
+        settings["sudo_password"] = password
+    if not isinstance(settings["pull_concurrency"], int) or settings["pull_concurrency"] < 1:
+        raise Exception(f"pull_concurrency must be a whole number of at least 1, not {settings['pull_concurrency']!r}")
+    if settings["update"]:
+        # Updating and wiping are mutually exclusive
+        settings["stop_existing"] = False
+    for key in ("install_path", "photos_path", "external_library_path", "hot_storage_path", "backup_path"):
+        if settings[key] and not os.path.isabs(settings[key]):
+            raise Exception(f"{key} must be an absolute path: {settings[key]}")
+    return settings
+
+
+class Setting:
+    """Holds a value like tk.StringVar/BooleanVar, for runs without a window."""
+
+    def __init__(self, value=None):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+
+
+class ConsoleRoot:
+    """Stands in for the Tk root without a window: after() runs callbacks on timer threads."""
+
+    def after(self, ms, func, *args):
+        timer = threading.Timer(ms / 1000, func, args)
+        timer.daemon = True
+        timer.start()
+
+
+class ConsoleSink:
+    """Prints log lines to stdout as text or as JSON lines (one object per line).
+
+    Like LogSink, every line is also appended to LOG_FILE.
+    """
+
+    def __init__(self, output="text", stream=None, log_file=LOG_FILE):
+        self.output = output
+        self.stream = stream or sys.stdout
+        self.log_file = log_file
+        self._lock = threading.Lock()
+        self._file = None
+        try:
+            self._file = open(log_file, "a", encoding="utf-8")
+            self._file.write(f"\n===== Immich Installer started {time.strftime('%Y-%m-%d %H:%M:%S')} (headless) =====\n")
+        except OSError:
+            self.log_file = None
+
+    def _print(self, line):
+        with self._lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+    def emit(self, event, **fields):
+        """Prints a structured event; only shown in JSON output."""
+        if self.output == "json":
+            self._print(json.dumps({"time": round(time.time(), 3), "event": event, **fields}))
+
+    def write(self, message):
+        line = str(message).strip()
+        if self._file:
+            with self._lock:
+                self._file.write(line + "\n")
+                self._file.flush()
+        if self.output == "json":
+            self.emit("log", message=line)
+        else:
+            self._print(line)
+
+    def progress(self, text, fraction):
+        # Text output already gets a progress line every PULL_LOG_INTERVAL seconds
+        self.emit("progress", text=text, fraction=round(fraction, 4))
+
+
+# --- Fleet rollout ---
+
+FLEET_CONCURRENCY = 4          # Hosts installed at the same time
+FLEET_RETRIES = 2              # Extra attempts for a host whose install failed
+FLEET_RETRY_DELAY = 30         # Seconds before a failed host is tried again
+FLEET_REFRESH = 2              # Seconds between summary table updates
+FLEET_REMOTE_DIR = "immich-installer"  # On each host, relative to the login directory
+FLEET_LOG_DIR = os.path.join(STATE_DIR, "fleet")
+FLEET_HOST_KEYS = ("host", "user", "port", "identity_file", "python")
+FLEET_BUNDLE_KEYS = ("bundle", "model_bundle")  # Local files uploaded to every host
+SSH_OPTIONS = ["-o", "BatchMode=yes", "-o", "ConnectTimeout=15", "-o", "ServerAliveInterval=30"]
+
+
+def load_inventory(path, overrides=None):
+    """Hosts from an inventory file, each merged with the file's defaults and overrides.
+
+    Format: {"defaults": {...}, "hosts": ["pi1.local", {"host": "pi2.local", ...}]}
+    with CONFIG_DEFAULTS keys plus FLEET_HOST_KEYS. "bundle" and "model_bundle"
+    are local files that are uploaded to the hosts.
+    """
+    try:
+        with open(path, "r") as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        raise Exception(f"Could not read inventory {path}: {e}")
+    if not isinstance(data, dict) or not isinstance(data.get("hosts"), list) or not data["hosts"]:
+        raise Exception(f"{path} needs a non-empty \"hosts\" list")
+    allowed = set(CONFIG_DEFAULTS) | set(FLEET_HOST_KEYS)
+    hosts = []
+    for entry in data["hosts"]:
+        host = {**CONFIG_DEFAULTS, **data.get("defaults", {}),
+                **({"host": entry} if isinstance(entry, str) else entry)}
+        host.update({k: v for k, v in (overrides or {}).items() if v is not None})
+        unknown = sorted(set(host) - allowed)
+        if unknown:
+            raise Exception(f"Unknown setting(s) for {host.get('host', '?')} in {path}: {', '.join(unknown)}")
+        if not host.get("host"):
+            raise Exception(f"Every host in {path} needs a \"host\"")
+        for key in ("install_path", "photos_path", "external_library_path"):
+            if not os.path.isabs(host[key] or ""):
+                raise Exception(f"{host['host']}: {key} must be an absolute path")
+        for key in ("hot_storage_path", "backup_path"):
+            if host[key] and not os.path.isabs(host[key]):
+                raise Exception(f"{host['host']}: {key} must be an absolute path")
+        if host["update"]:
+            host["stop_existing"] = False
+        hosts.append(host)
+    names = [host["host"] for host in hosts]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise Exception(f"Hosts listed more than once in {path}: {', '.join(duplicates)}")
+    return hosts
+
+
+class SSHTransport:
+    """Runs commands on a host over ssh. Needs key-based login (BatchMode)."""
+
+    def __init__(self, host):
+        self.args = ["ssh", *SSH_OPTIONS]
+        if host.get("port"):
+            self.args += ["-p", str(host["port"])]
+        if host.get("identity_file"):
+            self.args += ["-i", os.path.expanduser(host["identity_file"])]
+        self.args.append(f"{host['user']}@{host['host']}" if host.get("user") else host["host"])
+
+    def popen(self, cmd, **kwargs):
+        return subprocess.Popen(self.args + [cmd], **kwargs)
+
+
+class LocalTransport:
+    """Runs the "remote" commands locally, each host in its own home directory.
+
+    For trying out a rollout without SSH (e.g. with benchmark.py's fake docker/sudo).
+    """
+
+    def __init__(self, host, root_dir):
+        self.home = os.path.join(root_dir, re.sub(r"[^\w.-]", "_", host["host"]))
+        os.makedirs(self.home, exist_ok=True)
+
+    def popen(self, cmd, **kwargs):
+        return subprocess.Popen(["sh", "-c", cmd], cwd=self.home, env={**os.environ, "HOME": self.home}, **kwargs)
+
+
+class FleetRollout:
+    """Installs Immich on many hosts at once by running this script headless on each of them.
+
+    Per host: upload installer.py (and the image bundle, unless the host already
+    has it), then run it with --config --output json and follow its events.
+    Failed hosts go to a retry queue; a summary table shows where every host is.
+    """
+
+    def __init__(self, hosts, transport, password="", concurrency=FLEET_CONCURRENCY, retries=FLEET_RETRIES,
+                 retry_delay=FLEET_RETRY_DELAY, assume_yes=False, output="text", stream=None, log_dir=None):
+        self.hosts = hosts
+        self.transport = transport
+        self.password = password
+        self.concurrency = max(1, concurrency)
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.assume_yes = assume_yes
+        self.output = output
+        self.stream = stream or sys.stdout
+        self.log_dir = log_dir or os.path.join(FLEET_LOG_DIR, time.strftime("%Y%m%d-%H%M%S"))
+        os.makedirs(self.log_dir, exist_ok=True)
+        self.states = {host["host"]: {"state": "queued", "attempt": 0, "detail": "", "start": None, "end": None,
+                                      "code": None} for host in hosts}
+        self._lock = threading.Lock()
+        self._digests = {}
+        self._table_lines = 0
+
+    # Output
+
+    def _print(self, line):
+        with self._lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+    def _emit(self, event, host, **fields):
+        if self.output == "json":
+            self._print(json.dumps({"time": round(time.time(), 3), "event": event, "host": host, **fields}))
+
+    def _host_log(self, name, message):
+        with self._lock:
+            with open(os.path.join(self.log_dir, re.sub(r"[^\w.-]", "_", name) + ".log"), "a", encoding="utf-8") as f:
+                f.write(message + "\n")
+
+    def _set_state(self, name, state, detail=""):
+        info = self.states[name]
+        info["state"], info["detail"] = state, detail
+        self._host_log(name, f"== {state}{': ' + detail if detail else ''}")
+        self._emit("host", name, state=state, detail=detail, attempt=info["attempt"])
+        if self.output == "text" and not self.stream.isatty():
+            self._print(f"{name}: {state}{' (' + detail + ')' if detail else ''}")
+
+    def table(self):
+        rows = [("HOST", "STATE", "TRY", "TIME", "DETAIL")]
+        for name, info in self.states.items():
+            elapsed = ""
+            if info["start"] is not None:
+                elapsed = format_duration((info["end"] or time.monotonic()) - info["start"])
+            rows.append((name, info["state"], str(info["attempt"] or ""), elapsed, info["detail"][:50]))
+        widths = [max(len(row[i]) for row in rows) for i in range(4)]
+        return ["  ".join(cell.ljust(width) for cell, width in zip(row, widths + [0])).rstrip() for row in rows]
+
+    def _refresh(self, final=False):
+        """Redraws the summary table in place on a terminal; otherwise prints it once at the end."""
+        if self.output != "text" or not (final or self.stream.isatty()):
+            return
+        lines = self.table()
+        with self._lock:
+            if self.stream.isatty() and self._table_lines:
+                self.stream.write(f"\x1b[{self._table_lines}F\x1b[J")
+            self.stream.write("\n".join(lines) + "\n")
+            self.stream.flush()
+            self._table_lines = len(lines)
+
+    # Remote commands
+
+    def _run(self, transport, cmd, input_text=None, on_line=None):
+        """Runs cmd on the host; returns (returncode, output lines)."""
+        process = transport.popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                  stderr=subprocess.STDOUT, text=True)
+        try:
+            process.stdin.write(input_text or "")
+            process.stdin.close()
+        except BrokenPipeError:
+            pass
+        output = []
+        for line in process.stdout:
+            line = line.rstrip("\n")
+            output.append(line)
+            if on_line:
+                on_line(line)
+        return process.wait(), output
+
+    def _upload(self, transport, local_path, remote_path):
+        part = shlex.quote(remote_path + ".part")
+        process = transport.popen(f"cat > {part} && mv {part} {shlex.quote(remote_path)}",
+                                  stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        try:
+            with open(local_path, "rb") as f:
+                shutil.copyfileobj(f, process.stdin, BUNDLE_CHUNK_SIZE)
+            process.stdin.close()
+        except BrokenPipeError:
+            pass
+        output = process.stdout.read().decode(errors="replace").strip()
+        if process.wait() != 0:
+            raise Exception(f"Upload of {os.path.basename(local_path)} failed: {output or 'exit ' + str(process.returncode)}")
+
+    def _bundle_digest(self, path):
+        """sha256 of a local bundle, computed once for all hosts."""
+        with self._lock:
+            if path not in self._digests:
+                self._digests[path] = read_checksum_file(path) or file_sha256(path)
+            return self._digests[path]
+
+    def _on_remote_line(self, name, line):
+        try:
+            event = json.loads(line)
+        except ValueError:
+            event = {"event": "log", "message": line}
+        if not isinstance(event, dict):
+            return
+        info = self.states[name]
+        message = str(event.get("message", ""))
+        if event.get("event") == "log":
+            self._host_log(name, message)
+            if message.startswith("▶ "):
+                info["detail"] = message[2:].replace(" started", "")
+            elif message.startswith("ERROR:"):
+                info["detail"] = message[len("ERROR:"):].strip()
+        elif event.get("event") == "progress":
+            info["detail"] = event.get("text", "")
+        if event.get("event") != "result":
+            self._emit(event.get("event", "log"), name, **{k: v for k, v in event.items() if k not in ("event", "time")})
+
+    def install_host(self, host):
+        """One attempt on one host. Returns one of the EXIT_* codes."""
+        name = host["host"]
+        transport = self.transport(host)
+        remote_dir = FLEET_REMOTE_DIR
+        self._set_state(name, "preparing")
+        returncode, output = self._run(transport, f"mkdir -p {shlex.quote(remote_dir)}")
+        if returncode != 0:
+            raise Exception(f"Could not reach host: {' '.join(output[-3:]) or 'exit ' + str(returncode)}")
+        self._upload(transport, os.path.abspath(__file__), f"{remote_dir}/installer.py")
+
+        config = {key: host[key] for key in CONFIG_DEFAULTS if key != "sudo_password"}
+        for key in FLEET_BUNDLE_KEYS:
+            if not host[key]:
+                continue
+            remote_bundle = f"{remote_dir}/{os.path.basename(host[key])}"
+            digest = self._bundle_digest(host[key])
+            _, output = self._run(transport, f"sha256sum {shlex.quote(remote_bundle)} 2>/dev/null")
+            if output and output[0].split()[0] == digest:
+                self._host_log(name, f"{os.path.basename(host[key])} is already on the host, not uploading it again")
+            else:
+                self._set_state(name, "uploading", f"{format_bytes(os.path.getsize(host[key]))} {key.replace('_', ' ')}")
+                self._upload(transport, host[key], remote_bundle)
+            self._run(transport, f"cat > {shlex.quote(remote_bundle + '.sha256')}",
+                      input_text=f"{digest}  {os.path.basename(remote_bundle)}\n")
+            # The installer runs from remote_dir
+            config[key] = os.path.basename(remote_bundle)
+        self._run(transport, f"cat > {shlex.quote(remote_dir + '/install.json')}", input_text=json.dumps(config, indent=2))
+
+        self._set_state(name, "installing")
+        python = host.get("python") or "python3"
+        cmd = (f"cd {shlex.quote(remote_dir)} && {python} installer.py --config install.json "
+               f"--password-stdin --output json{' --yes' if self.assume_yes else ''}")
+        returncode, _ = self._run(transport, cmd, input_text=(host["sudo_password"] or self.password) + "\n",
+                                  on_line=lambda line: self._on_remote_line(name, line))
+        # ssh itself exits with 255 when the connection drops
+        return returncode if returncode in (EXIT_OK, EXIT_USAGE, EXIT_NOT_READY, EXIT_CANCELLED) else EXIT_FAILED
+
+    def _attempt(self, host):
+        name = host["host"]
+        try:
+            return self.install_host(host)
+        except Exception as e:
+            self._host_log(name, f"ERROR: {e}")
+            self.states[name]["detail"] = str(e)
+            return EXIT_FAILED
+
+    def run(self):
+        """Installs on all hosts; returns {host: exit code}."""
+        by_name = {host["host"]: host for host in self.hosts}
+        queued = collections.deque(by_name)
+        retry_queue = []  # (due time, host name)
+        running = {}
+        outcomes = {EXIT_OK: "done", EXIT_NOT_READY: "not ready", EXIT_CANCELLED: "cancelled", EXIT_USAGE: "failed"}
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            while queued or running or retry_queue:
+                now = time.monotonic()
+                for due, name in sorted(retry_queue):
+                    if due <= now:
+                        retry_queue.remove((due, name))
+                        queued.append(name)
+                while queued and len(running) < self.concurrency:
+                    name = queued.popleft()
+                    info = self.states[name]
+                    info["attempt"] += 1
+                    info["start"], info["end"] = time.monotonic(), None
+                    running[pool.submit(self._attempt, by_name[name])] = name
+                if running:
+                    finished, _ = wait(running, timeout=FLEET_REFRESH, return_when=FIRST_COMPLETED)
+                else:
+                    finished = ()
+                    time.sleep(min(FLEET_REFRESH, max(0, min(due for due, _ in retry_queue) - now)))
+                for future in finished:
+                    name = running.pop(future)
+                    info = self.states[name]
+                    info["code"], info["end"] = future.result(), time.monotonic()
+                    if info["code"] == EXIT_FAILED and info["attempt"] <= self.retries:
+                        retry_queue.append((time.monotonic() + self.retry_delay, name))
+                        self._set_state(name, "retry queued", info["detail"])
+                    else:
+                        self._set_state(name, outcomes.get(info["code"], "failed"),
+                                        "" if info["code"] == EXIT_OK else info["detail"])
+                self._refresh()
+        self._refresh(final=True)
+        return {name: info["code"] for name, info in self.states.items()}
+
+
+# --- Installer window ---
+
+WINDOW_SIZE = "600x900"
+OPTIONS_HEIGHT = 470  # Pixels for the settings; they scroll once they need more
+
+
+class ImmichInstallerApp:
+    # How to switch off update mode and how to force a disk search, for messages
+    FRESH_INSTALL_HINT = "Uncheck 'Update existing installation' for a fresh install."
+    RESCAN_HINT = "Tick 'Rescan disks for existing installations' if an installation is missing."
+
+    def __init__(self, root):
+        self.root = root
+        self.root.title("Immich Installer for Raspberry Pi")
+        self.root.geometry(WINDOW_SIZE)
+
+        # Variables
+        self.root_pass = tk.StringVar()
+        self.install_path = tk.StringVar()
+        self.photos_path = tk.StringVar()
+        self.ext_lib_path = tk.StringVar()
+        self.hot_storage_path = tk.StringVar()
+        self.bundle_path = tk.StringVar()
+        self.backup_path = tk.StringVar()
+        self.model_bundle_path = tk.StringVar()
+        self.stop_existing_var = tk.BooleanVar(value=True)  # Default: checked
+        self.rescan_var = tk.BooleanVar(value=False)
+        self.preflight_var = tk.BooleanVar(value=True)
+        self.library_scan_var = tk.BooleanVar(value=True)
+        self.job_config_var = tk.BooleanVar(value=False)
+        self.update_var = tk.BooleanVar(value=False)
+        self.migrate_var = tk.BooleanVar(value=True)
+        self.remove_hot_var = tk.BooleanVar(value=False)
+        self.restore_backup_var = tk.BooleanVar(value=False)
+        self.prewarm_var = tk.BooleanVar(value=True)
+        self.pull_concurrency_var = tk.IntVar(value=PULL_CONCURRENCY)
+
+        self._init_state()
+        self._build_ui()
+
+    def _init_state(self):
+        """State that does not depend on the window (shared with HeadlessInstaller)."""
+        # Shared sudo helper, see PrivilegedSession
+        self._session = None
+        self._session_lock = threading.Lock()
+
+        # Timing of the current run, see Tracer
+        self.tracer = Tracer()
+
+        # Background deletion of trashed data, see start_reaper
+        self._reaper_thread = None
+        self._trash_lock = threading.Lock()
+
+    def _build_ui(self):
+        pad_opts = {'padx': 10, 'pady': 2}
+        
+        # Header
+        tk.Label(self.root, text="Immich Auto-Installer", font=("Arial", 16, "bold")).pack(pady=15)
+
+        # The settings scroll, so the install button, progress and log stay in view
+        options = self._scrollable_frame(self.root, OPTIONS_HEIGHT)
+
+        # 1. Root Password
+        frame1 = tk.Frame(options)
+        frame1.pack(fill='x', padx=10, pady=5)
+        tk.Label(frame1, text="Root Password (sudo):", width=25, anchor='w', font=("Arial", 10, "bold")).pack(side='left')
+        tk.Entry(frame1, textvariable=self.root_pass, show="*").pack(side='left', fill='x', expand=True)
+        # Hint 1
+        tk.Label(options, text="Required to install Docker and system services.", 
+                 fg="gray", font=("Arial", 9)).pack(anchor='w', padx=10)
+
+        tk.Frame(options, height=10).pack() # Spacer
+
+        # 2. Install Path
+        frame2 = tk.Frame(options)
+        frame2.pack(fill='x', padx=10, pady=5)
+        tk.Label(frame2, text="Where to install Immich:", width=25, anchor='w', font=("Arial", 10, "bold")).pack(side='left')
+        tk.Entry(frame2, textvariable=self.install_path).pack(side='left', fill='x', expand=True)
+        tk.Button(frame2, text="Browse", command=lambda: self.browse_dir(self.install_path)).pack(side='left', padx=5)
+        # Hint 2
+        tk.Label(options, text="Absolute path, e.g. /home/<username>/immich", 
+                 fg="gray", font=("Arial", 9)).pack(anchor='w', padx=10)
+
+        tk.Frame(options, height=10).pack() # Spacer
+
+        # 3. Photos Path
+        frame3 = tk.Frame(options)
+        frame3.pack(fill='x', padx=10, pady=5)
+        tk.Label(frame3, text="Where to store photo files:", width=25, anchor='w', font=("Arial", 10, "bold")).pack(side='left')
+        tk.Entry(frame3, textvariable=self.photos_path).pack(side='left', fill='x', expand=True)
+        tk.Button(frame3, text="Browse", command=lambda: self.browse_dir(self.photos_path)).pack(side='left', padx=5)
+        # Hint 3
+        tk.Label(options, text="Absolute path, e.g. /mnt/external_drive/photos", 
+                 fg="gray", font=("Arial", 9)).pack(anchor='w', padx=10)
+
+        tk.Frame(options, height=10).pack() # Spacer
+
+        # 3b. Fast storage for thumbnails (optional)
+        frame3b = tk.Frame(options)
+        frame3b.pack(fill='x', padx=10, pady=5)
+        tk.Label(frame3b, text="Fast storage (optional):", width=25, anchor='w', font=("Arial", 10, "bold")).pack(side='left')
+        tk.Entry(frame3b, textvariable=self.hot_storage_path).pack(side='left', fill='x', expand=True)
+        tk.Button(frame3b, text="Browse", command=lambda: self.browse_dir(self.hot_storage_path)).pack(side='left', padx=5)
+        tk.Label(options, text="Thumbnails, transcoded videos and profile pictures, e.g. /mnt/ssd/immich",
+                 fg="gray", font=("Arial", 9)).pack(anchor='w', padx=10)
+
+        tk.Frame(options, height=10).pack() # Spacer
+
+        # 4. External Library
+        frame4 = tk.Frame(options)
+        frame4.pack(fill='x', padx=10, pady=5)
+        tk.Label(frame4, text="External Library Path:", width=25, anchor='w', font=("Arial", 10, "bold")).pack(side='left')
+        tk.Entry(frame4, textvariable=self.ext_lib_path).pack(side='left', fill='x', expand=True)
+        tk.Button(frame4, text="Browse", command=lambda: self.browse_dir(self.ext_lib_path)).pack(side='left', padx=5)
+        # Hint 4
+        tk.Label(options, text="Absolute path, e.g. /mnt/nas/photos", 
+                 fg="gray", font=("Arial", 9)).pack(anchor='w', padx=10)
+
+        tk.Frame(options, height=15).pack() # Spacer
+
+        # 5. Offline image bundle
+        frame5 = tk.Frame(options)
+        frame5.pack(fill='x', padx=10, pady=5)
+        tk.Label(frame5, text="Offline image bundle:", width=25, anchor='w', font=("Arial", 10, "bold")).pack(side='left')
+        tk.Entry(frame5, textvariable=self.bundle_path).pack(side='left', fill='x', expand=True)
+        tk.Button(frame5, text="Browse", command=lambda: self.browse_file(self.bundle_path)).pack(side='left', padx=5)
+        self.btn_export = tk.Button(frame5, text="Export", command=self.start_export)
+        self.btn_export.pack(side='left')
+        # Hint 5
+        tk.Label(options, text="Optional. Installs images from a bundle instead of downloading them.",
+                 fg="gray", font=("Arial", 9)).pack(anchor='w', padx=10)
+
+        tk.Frame(options, height=10).pack() # Spacer
+
+        # 5b. Database backup before removal (optional)
+        frame5b = tk.Frame(options)
+        frame5b.pack(fill='x', padx=10, pady=5)
+        tk.Label(frame5b, text="Database backup folder:", width=25, anchor='w', font=("Arial", 10, "bold")).pack(side='left')
+        tk.Entry(frame5b, textvariable=self.backup_path).pack(side='left', fill='x', expand=True)
+        tk.Button(frame5b, text="Browse", command=lambda: self.browse_dir(self.backup_path)).pack(side='left', padx=5)
+        tk.Label(options, text="Optional. The database is backed up here before existing instances are removed.",
+                 fg="gray", font=("Arial", 9)).pack(anchor='w', padx=10)
+
+        tk.Frame(options, height=10).pack() # Spacer
+
+        # 5c. Machine learning model bundle (optional)
+        frame5c = tk.Frame(options)
+        frame5c.pack(fill='x', padx=10, pady=5)
+        tk.Label(frame5c, text="ML model bundle:", width=25, anchor='w', font=("Arial", 10, "bold")).pack(side='left')
+        tk.Entry(frame5c, textvariable=self.model_bundle_path).pack(side='left', fill='x', expand=True)
+        tk.Button(frame5c, text="Browse", command=lambda: self.browse_file(self.model_bundle_path, "Model bundle")).pack(side='left', padx=5)
+        tk.Label(options, text="Optional. Fills the model cache from this file instead of downloading the models.",
+                 fg="gray", font=("Arial", 9)).pack(anchor='w', padx=10)
+
+        tk.Frame(options, height=15).pack() # Spacer
+
+        # 6. Checkbox to stop existing Immich instances
+        stop_frame = tk.Frame(options)
+        stop_frame.pack(fill='x', padx=10, pady=5)
+        
+        stop_existing_check = tk.Checkbutton(
+            stop_frame, 
+            text='⚠️ Completely remove existing Immich instances (including database)',
+            variable=self.stop_existing_var,
+            font=('Arial', 10, 'bold')
+        )
+        stop_existing_check.pack(anchor='w')
+
+        tk.Checkbutton(
+            stop_frame,
+            text='Restore the database backup into the new installation',
+            variable=self.restore_backup_var
+        ).pack(anchor='w', padx=20)
+
+        tk.Checkbutton(
+            stop_frame,
+            text='Update existing installation instead (keeps database and photos)',
+            variable=self.update_var,
+            command=self._on_update_toggled
+        ).pack(anchor='w')
+
+        tk.Checkbutton(
+            stop_frame,
+            text='Move existing thumbnails when the fast storage changes',
+            variable=self.migrate_var
+        ).pack(anchor='w', padx=20)
+
+        tk.Checkbutton(
+            stop_frame,
+            text='Stop using fast storage (move its folders back to the photo storage)',
+            variable=self.remove_hot_var
+        ).pack(anchor='w', padx=20)
+
+        tk.Checkbutton(
+            stop_frame,
+            text='Rescan disks for existing installations (slower)',
+            variable=self.rescan_var
+        ).pack(anchor='w', padx=20)
+
+        tk.Checkbutton(
+            stop_frame,
+            text='Test storage speed before installing',
+            variable=self.preflight_var
+        ).pack(anchor='w')
+
+        tk.Checkbutton(
+            stop_frame,
+            text='Scan the external library and estimate the processing time',
+            variable=self.library_scan_var
+        ).pack(anchor='w')
+
+        tk.Checkbutton(
+            stop_frame,
+            text='Prepare the machine learning models during install',
+            variable=self.prewarm_var
+        ).pack(anchor='w')
+
+        tk.Checkbutton(
+            stop_frame,
+            text='Set job concurrency with a config file (makes Immich\'s Settings page read-only)',
+            variable=self.job_config_var
+        ).pack(anchor='w')
+
+        pull_frame = tk.Frame(stop_frame)
+        pull_frame.pack(anchor='w', pady=(5, 0))
+        tk.Label(pull_frame, text="Images downloaded at the same time:").pack(side='left')
+        tk.Spinbox(pull_frame, from_=1, to=4, width=3, state='readonly',
+                   textvariable=self.pull_concurrency_var).pack(side='left', padx=5)
+        
+
+        # Install Button
+        self.btn_install = tk.Button(self.root, text="INSTALL IMMICH", bg="green", fg="white", font=("Arial", 12, "bold"), command=self.start_install)
+        self.btn_install.pack(pady=(25, 10), ipadx=20)
+
+        # Download progress (filled while images are pulled)
+        self.progress_bar = ttk.Progressbar(self.root, mode='determinate', maximum=100)
+        self.progress_bar.pack(fill='x', padx=10)
+        self.progress_label = tk.Label(self.root, text="", fg="gray", font=("Arial", 9))
+        self.progress_label.pack(anchor='w', padx=10, pady=(0, 10))
+
+        # Log Window
+        tk.Label(self.root, text="Installation Log:").pack(anchor='w', padx=10)
+        self.log_area = scrolledtext.ScrolledText(self.root, height=12, state='disabled')
+        self.log_area.pack(fill='both', expand=True, padx=10, pady=(0, 10))
+        self.log_sink = LogSink(self.root, self.log_area)
+        if self.log_sink.log_file:
+            self.log(f"Full log is written to: {self.log_sink.log_file}")
+
+    def _scrollable_frame(self, parent, height):
+        """Returns a frame inside a canvas of the given height, with a vertical scrollbar."""
+        outer = tk.Frame(parent)
+        outer.pack(fill='x')
+        canvas = tk.Canvas(outer, height=height, highlightthickness=0)
+        scrollbar = tk.Scrollbar(outer, orient='vertical', command=canvas.yview)
+        canvas.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side='right', fill='y')
+        canvas.pack(side='left', fill='both', expand=True)
+        inner = tk.Frame(canvas)
+        window = canvas.create_window((0, 0), window=inner, anchor='nw')
+        # Follow the content height and the window width
+        inner.bind('<Configure>', lambda e: canvas.configure(scrollregion=canvas.bbox('all')))
+        canvas.bind('<Configure>', lambda e: canvas.itemconfigure(window, width=e.width))
+
+        def on_wheel(event):
+            # X11 sends Button-4/5, Windows and macOS send MouseWheel with a delta
+            up = event.num == 4 or event.delta > 0
+            canvas.yview_scroll(-1 if up else 1, 'units')
+
+        # The wheel only scrolls the settings while the pointer is over them, not the log
+        def bind_wheel(event):
+            for sequence in ('<MouseWheel>', '<Button-4>', '<Button-5>'):
+                canvas.bind_all(sequence, on_wheel)
+
+        def unbind_wheel(event):
+            for sequence in ('<MouseWheel>', '<Button-4>', '<Button-5>'):
+                canvas.unbind_all(sequence)
+
+        inner.bind('<Enter>', bind_wheel)
+        inner.bind('<Leave>', unbind_wheel)
+        return inner
+
+    def _on_update_toggled(self):
+        # Updating and wiping are mutually exclusive
+        if self.update_var.get():
+            self.stop_existing_var.set(False)
+
+    def browse_dir(self, var):
+        directory = filedialog.askdirectory()
+        if directory:
+            var.set(directory)
+
+    def browse_file(self, var, kind="Image bundle"):
+        path = filedialog.askopenfilename(filetypes=[(kind, "*.tar.gz"), ("All files", "*")])
+        if path:
+            var.set(path)
+
+    def log(self, message):
+        """Thread-safe logging to the text area (batched, see LogSink)"""
+        self.log_sink.write(message)
+
+    def notify(self, title, message, error=False):
+        if error:
+            messagebox.showerror(title, message)
+        else:
+            messagebox.showinfo(title, message)
+
+    def confirm(self, title, message):
+        return messagebox.askyesno(title, message)
+
+    def privileged_session(self, sudo_pw):
+        """Returns the shared root session, starting it on first use."""
+        with self._session_lock:
+            session = self._session
+            if session is None or not session.is_alive() or session.password != sudo_pw:
+                if session:
+                    session.close()
+                session = self._session = PrivilegedSession(sudo_pw)
+            return session
+
+    def close_privileged_session(self):
+        with self._session_lock:
+            if self._session:
+                self._session.close()
+                self._session = None
+
+    def run_command(self, cmd, sudo_pw=None, cwd=None, name=None):
+        """Runs shell command and waits for result (no streaming).
+
+        name labels the command in the trace and in errors (default: command_label).
+        """
+        start = time.monotonic()
+        if sudo_pw:
+            returncode, stdout, stderr, cpu = self.privileged_session(sudo_pw).run_measured(cmd, cwd=cwd)
+        else:
+            process = subprocess.Popen(cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, cwd=cwd)
+            stdout, stderr, cpu = communicate_with_rusage(process)
+            returncode = process.returncode
+
+        self.tracer.record(name or command_label(cmd), "subprocess", start, time.monotonic() - start,
+                           command=_cut(cmd, TRACE_COMMAND_CHARS), sudo=bool(sudo_pw), returncode=returncode,
+                           child_cpu_s=round(cpu, 6), output_bytes=len(stdout) + len(stderr))
+        if returncode != 0:
+            raise Exception(f"Command failed: {name or cmd}\nError: {stderr}")
+        return stdout
+
+    def run_live_command(self, cmd, sudo_pw=None, cwd=None, name=None):
+        """Runs shell command and streams output to log window line-by-line (name: see run_command)."""
+        start = time.monotonic()
+        output_bytes = 0
+
+        def on_line(line):
+            nonlocal output_bytes
+            output_bytes += len(line)
+            self.log(line)
+
+        if sudo_pw:
+            # Merge stderr into stdout to capture Docker progress
+            returncode, _, _, cpu = self.privileged_session(sudo_pw).run_measured(cmd, cwd=cwd, on_line=on_line)
+        else:
+            process = subprocess.Popen(
+                cmd,
+                shell=True,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                cwd=cwd,
+                bufsize=1
+            )
+
+            # Read output stream
+            for line in process.stdout:
+                on_line(line)
+
+            cpu = wait_with_rusage(process)
+            returncode = process.returncode
+
+        self.tracer.record(name or command_label(cmd), "subprocess", start, time.monotonic() - start,
+                           command=_cut(cmd, TRACE_COMMAND_CHARS), sudo=bool(sudo_pw), returncode=returncode,
+                           child_cpu_s=round(cpu, 6), output_bytes=output_bytes)
+        if returncode != 0:
+            raise Exception(f"Command failed: {name or cmd}")
+
+    def write_trace(self):
+        """Writes the spans of the current run; the paths go to the log."""
+        try:
+            jsonl_path, trace_path = self.tracer.write()
+            self.log(f"Timing trace written to {trace_path} (events: {jsonl_path})")
+        except OSError as e:
+            self.log(f"Warning: Could not write timing trace: {e}")
+
+    def docker_api_stream(self, sudo_pw, method, path, query, on_event):
+        """Streams a Docker Engine API endpoint, through the sudo session if the socket needs root."""
+        if DockerAPI.available():
+            for event in DockerAPI().stream(method, path, query):
+                on_event(event)
+            return
+
+        def on_line(line):
+            try:
+                event = json.loads(line)
+            except ValueError:
+                return
+            on_event(event)
+
+        full_path = f"{path}?{urllib.parse.urlencode(query)}" if query else path
+        cmd = (f"{shlex.quote(sys.executable)} -c {shlex.quote(DOCKER_API_RELAY)} "
+               f"{shlex.quote(DOCKER_SOCKET)} {method} {shlex.quote(full_path)}")
+        returncode, _, _ = self.privileged_session(sudo_pw).run(cmd, on_line=on_line)
+        if returncode != 0:
+            raise Exception(f"Docker API {method} {path} failed")
+
+    def docker_api_request(self, sudo_pw, method, path, query=None):
+        """Single Engine API request, through the sudo session if the socket needs root."""
+        if DockerAPI.available():
+            return DockerAPI().request(method, path, query)
+        lines = []
+        full_path = f"{path}?{urllib.parse.urlencode(query)}" if query else path
+        cmd = (f"{shlex.quote(sys.executable)} -c {shlex.quote(DOCKER_API_RELAY)} "
+               f"{shlex.quote(DOCKER_SOCKET)} {method} {shlex.quote(full_path)}")
+        returncode, _, _ = self.privileged_session(sudo_pw).run(cmd, on_line=lines.append)
+        try:
+            data = json.loads("".join(lines)) if "".join(lines).strip() else None
+        except ValueError:
+            data = None
+        if returncode != 0:
+            message = data.get("error", "") if isinstance(data, dict) else ""
+            raise Exception(f"Docker API {method} {path} failed: {message}")
+        return data
+
+    def is_image_current(self, sudo_pw, image):
+        """True if the local image has the digest the registry currently serves for its tag.
+
+        When the registry cannot be reached, any local copy counts as current.
+        """
+        ref = urllib.parse.quote(image, safe="/:@")
+        try:
+            local = self.docker_api_request(sudo_pw, "GET", f"/images/{ref}/json")
+        except Exception:
+            return False
+        try:
+            remote = self.docker_api_request(sudo_pw, "GET", f"/distribution/{ref}/json")
+        except Exception as e:
+            self.log(f"  Could not check {image} against the registry, using local copy ({e})")
+            return True
+        digest = (remote or {}).get("Descriptor", {}).get("digest")
+        return bool(digest) and any(d.endswith("@" + digest) for d in local.get("RepoDigests") or [])
+
+    def _show_progress(self, text, fraction):
+        """Runs on the Tk thread."""
+        self.progress_bar['value'] = fraction * 100
+        self.progress_label.config(text=text)
+
+    def _poll_pull_progress(self, progress, done):
+        """Redraws the progress bar at a fixed rate instead of once per pull event."""
+        if done.is_set():
+            return
+        fraction, current, total, rate, eta = progress.snapshot()
+        text = "Downloading images: " + format_progress(fraction, current, total, rate, eta)
+        self._show_progress(text, fraction)
+        if time.monotonic() - self._last_progress_log >= PULL_LOG_INTERVAL:
+            self._last_progress_log = time.monotonic()
+            self.log(text)
+        self.root.after(PROGRESS_REFRESH_MS, self._poll_pull_progress, progress, done)
+
+    def pull_image(self, sudo_pw, image, progress):
+        from_image, tag = split_image_ref(image)
+        query = {"fromImage": from_image}
+        if tag:
+            query["tag"] = tag
+        progress.start_image(image)
+        try:
+            self.docker_api_stream(sudo_pw, "POST", "/images/create", query,
+                                   lambda event: progress.feed(image, event))
+        except Exception:
+            progress.finish_image(image, "failed")
+            raise
+        progress.finish_image(image)
+        size, duration, rate = progress.summary(image)
+        self.tracer.record(f"pull {image}", "pull", time.monotonic() - duration, duration, bytes=size)
+        self.log(f"✓ Pulled {image}: {format_bytes(size)} in {format_duration(duration)} ({format_bytes(rate)}/s)")
+
+    def _pull_with_retry(self, sudo_pw, image, progress):
+        delay = PULL_RETRY_BACKOFF
+        for attempt in range(1, PULL_RETRIES + 1):
+            try:
+                self.pull_image(sudo_pw, image, progress)
+                return
+            except Exception as e:
+                if attempt == PULL_RETRIES:
+                    raise
+                self.log(f"Warning: {e}. Retrying {image} in {delay}s (attempt {attempt + 1}/{PULL_RETRIES})...")
+                time.sleep(delay)
+                delay *= 2
+
+    def pull_images(self, sudo_pw, images, concurrency=PULL_CONCURRENCY):
+        """Pulls images that are not up to date, a few at a time, with one aggregated progress bar."""
+        self.log("Checking which images are already up to date...")
+        with ThreadPoolExecutor(max_workers=max(1, len(images))) as pool:
+            current = dict(zip(images, pool.map(lambda image: self.is_image_current(sudo_pw, image), images)))
+        for image in images:
+            if current[image]:
+                self.log(f"✓ {image} is up to date, skipping download")
+        to_pull = [image for image in images if not current[image]]
+        if not to_pull:
+            self.root.after(0, self._show_progress, "All images are up to date", 1.0)
+            return
+
+        progress = PullProgress()
+        done = threading.Event()
+        start = time.monotonic()
+        self._last_progress_log = start
+        self.root.after(0, self._poll_pull_progress, progress, done)
+        failed = []
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+                futures = {pool.submit(self._pull_with_retry, sudo_pw, image, progress): image for image in to_pull}
+                for future, image in futures.items():
+                    try:
+                        future.result()
+                    except Exception as e:
+                        self.log(f"ERROR: Could not download {image}: {e}")
+                        failed.append(image)
+        finally:
+            done.set()
+        if failed:
+            raise Exception(f"Download failed for: {', '.join(failed)}")
+        _, downloaded, _, _, _ = progress.snapshot()
+        duration = time.monotonic() - start
+        self.log(f"✓ Downloaded {format_bytes(downloaded)} in {format_duration(duration)} "
+                 f"({format_bytes(downloaded / duration if duration > 0 else 0)}/s)")
+        self.root.after(0, self._show_progress, f"Images ready ({format_bytes(downloaded)} downloaded)", 1.0)
+
+    def export_bundle(self, sudo_pw, images, bundle_path):
+        """Streams 'docker save' of images into a compressed, checksummed bundle."""
+        start = time.monotonic()
+        self.log(f"Exporting {len(images)} image(s) to {bundle_path} ({BUNDLE_WORKERS} compression threads)...")
+        tmp_path = bundle_path + ".part"
+        process = None
+        if DockerAPI.available():
+            src = DockerAPI().save_images(images)
+        else:
+            process = sudo_popen(["docker", "save"] + list(images), sudo_pw,
+                                 stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            src = process.stdout
+        try:
+            with open(tmp_path, "wb") as dst:
+                digest, size_in, size_out = parallel_gzip(src, dst)
+        finally:
+            src.close()
+        if process:
+            process.wait()
+            if process.returncode != 0:
+                os.remove(tmp_path)
+                raise Exception(f"docker save failed: {process.stderr.read().decode(errors='replace').strip()}")
+        os.replace(tmp_path, bundle_path)
+        write_checksum_file(bundle_path, digest)
+        duration = time.monotonic() - start
+        self.tracer.record("export bundle", "bundle", start, duration, bytes_in=size_in, bytes_out=size_out)
+        self.log(f"✓ Bundle written: {format_bytes(size_in)} -> {format_bytes(size_out)} "
+                 f"in {format_duration(duration)} ({format_bytes(size_in / duration if duration > 0 else 0)}/s)")
+        self.log(f"✓ Checksum: {digest} ({os.path.basename(bundle_path)}.sha256)")
+
+    def import_bundle(self, sudo_pw, bundle_path):
+        """Verifies a bundle and streams it into 'docker load' without writing the tar to disk."""
+        expected = read_checksum_file(bundle_path)
+        if expected:
+            self.log(f"Verifying {os.path.basename(bundle_path)}...")
+            if file_sha256(bundle_path) != expected:
+                raise Exception(f"Checksum mismatch for {bundle_path}, the bundle is damaged")
+            self.log("✓ Checksum OK")
+        else:
+            self.log(f"Warning: No {os.path.basename(bundle_path)}.sha256 found, skipping verification")
+
+        start = time.monotonic()
+        self.log("Loading images from bundle...")
+        with gzip.open(bundle_path, "rb") as src:
+            if DockerAPI.available():
+                for message in DockerAPI().load_images(iter(lambda: src.read(BUNDLE_CHUNK_SIZE), b"")):
+                    self.log(f"  {message}")
+            else:
+                process = sudo_popen(["docker", "load"], sudo_pw, stdin=subprocess.PIPE,
+                                     stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+                try:
+                    shutil.copyfileobj(src, process.stdin, BUNDLE_CHUNK_SIZE)
+                    process.stdin.close()
+                except BrokenPipeError:
+                    pass
+                for line in process.stdout:
+                    self.log(f"  {line.decode(errors='replace')}")
+                process.wait()
+                if process.returncode != 0:
+                    raise Exception("docker load failed")
+        self.tracer.record("import bundle", "bundle", start, time.monotonic() - start,
+                           bytes=os.path.getsize(bundle_path))
+        self.log(f"✓ Images loaded from bundle in {format_duration(time.monotonic() - start)}")
+
+    def export_logic(self, bundle_path):
+        """Returns one of the EXIT_* codes."""
+        pw = self.root_pass.get()
+        self.tracer = Tracer("export")
+        try:
+            images = compose_images(DOCKER_COMPOSE_TEMPLATE)
+            self.pull_images(pw, images, self.pull_concurrency_var.get())
+            self.export_bundle(pw, images, bundle_path)
+            self.notify("Export finished", f"Image bundle written to:\n{bundle_path}")
+            return EXIT_OK
+        except Exception as e:
+            self.log(f"ERROR: {str(e)}")
+            self.notify("Export Failed", str(e), error=True)
+            return EXIT_FAILED
+        finally:
+            self.close_privileged_session()
+            self.write_trace()
+
+    def start_export(self):
+        bundle_path = filedialog.asksaveasfilename(
+            defaultextension=".tar.gz",
+            initialfile=f"immich-images-{time.strftime('%Y%m%d')}.tar.gz",
+            filetypes=[("Image bundle", "*.tar.gz")])
+        if not bundle_path:
+            return
+        self.btn_export.config(state='disabled')
+        self.btn_install.config(state='disabled')
+
+        def run():
+            self.export_logic(bundle_path)
+            self.btn_export.config(state='normal')
+            self.btn_install.config(state='normal')
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def _container_state(self, sudo_pw, name):
+        """(status, health, restart_count) of a container via the Engine API."""
+        info = self.docker_api_request(sudo_pw, "GET", f"/containers/{name}/json")
+        state = info.get("State", {})
+        health = (state.get("Health") or {}).get("Status", "none")
+        return state.get("Status", "unknown"), health, info.get("RestartCount", 0)
+
+    def _probe(self, sudo_pw, name, check, crashed, deadline):
+        """Polls check() with backoff until it succeeds. Returns seconds to ready or None."""
+        start = time.monotonic()
+        delay = READY_POLL_MIN
+        while time.monotonic() < deadline and not crashed.is_set():
+            try:
+                if check():
+                    return time.monotonic() - start
+            except Exception:
+                pass
+            crashed.wait(delay)
+            delay = min(delay * READY_POLL_FACTOR, READY_POLL_MAX)
+        return None
+
+    def _watch_containers(self, sudo_pw, crashed, finished, deadline):
+        """Flags a crash loop as soon as a container keeps restarting."""
+        while not finished.is_set() and time.monotonic() < deadline:
+            for name in IMMICH_CONTAINERS:
+                try:
+                    status, _, restarts = self._container_state(sudo_pw, name)
+                except Exception:
+                    continue
+                if restarts >= CRASH_LOOP_RESTARTS or status in ("exited", "dead"):
+                    crashed.reason = f"{name} is {status} after {restarts} restart(s)"
+                    crashed.container = name
+                    crashed.set()
+                    return
+            finished.wait(5)
+
+    def wait_until_ready(self, sudo_pw, timeout=READY_TIMEOUT):
+        """Probes all services in parallel and logs the time-to-ready of each one.
+
+        Raises if a container is crash looping. Returns {service: seconds or None}.
+        """
+        self.log("Waiting for Immich services to become ready...")
+
+        def container_healthy(name):
+            def check():
+                status, health, _ = self._container_state(sudo_pw, name)
+                return status == "running" and health in ("healthy", "none")
+            return check
+
+        def exec_check(cmd):
+            def check():
+                self.run_command(cmd, sudo_pw=sudo_pw)
+                return True
+            return check
+
+        probes = {
+            "postgres": exec_check("docker exec immich_postgres pg_isready --dbname=immich --username=postgres"),
+            "redis": lambda: self.run_command("docker exec immich_redis redis-cli ping", sudo_pw=sudo_pw).strip() == "PONG",
+            "machine-learning": container_healthy("immich_machine_learning"),
+            "server": server_ping,
+        }
+        crashed = threading.Event()
+        finished = threading.Event()
+        deadline = time.monotonic() + timeout
+        watcher = threading.Thread(target=self._watch_containers, args=(sudo_pw, crashed, finished, deadline), daemon=True)
+        watcher.start()
+
+        times = {}
+        with ThreadPoolExecutor(max_workers=len(probes)) as pool:
+            futures = {name: pool.submit(self._probe, sudo_pw, name, check, crashed, deadline)
+                       for name, check in probes.items()}
+            for name, future in futures.items():
+                times[name] = future.result()
+                if times[name] is not None:
+                    self.log(f"✓ {name} ready after {times[name]:.1f}s")
+                    self.tracer.record(f"ready {name}", "readiness", deadline - timeout, times[name])
+        finished.set()
+
+        if crashed.is_set():
+            try:
+                tail = self.run_command(f"docker logs --tail 15 {crashed.container} 2>&1", sudo_pw=sudo_pw)
+            except Exception as e:
+                tail = str(e)
+            raise Exception(f"Immich failed to start: {crashed.reason}.\nLast log lines:\n{tail.strip()}")
+        for name, seconds in times.items():
+            if seconds is None:
+                self.log(f"Warning: {name} was not ready after {timeout}s, it may still be initialising")
+        return times
+
+    def outdated_services(self, sudo_pw, compose_content):
+        """Services whose running container uses a different image than the tag now points to."""
+        outdated = []
+        for name, block in compose_services(compose_content).items():
+            image = compose_service_field(block, "image")
+            container = compose_service_field(block, "container_name")
+            if not image or not container:
+                continue
+            try:
+                running = self.docker_api_request(sudo_pw, "GET", f"/containers/{container}/json").get("Image")
+                local = self.docker_api_request(sudo_pw, "GET", f"/images/{urllib.parse.quote(image, safe='/:@')}/json").get("Id")
+            except Exception:
+                outdated.append(name)  # Missing container: needs to be created anyway
+                continue
+            if running != local:
+                outdated.append(name)
+        return outdated
+
+    def update_existing(self, sudo_pw, inst_path, p_path, ext_path, tuning, hot_path=None):
+        """Re-renders the config for an existing install and recreates only changed services.
+
+        The database password and the postgres data are kept. Returns the readiness
+        times (see wait_until_ready), or None if the update was not confirmed.
+        """
+        self.log("=" * 60)
+        self.log(f"UPDATING EXISTING IMMICH INSTALLATION IN {inst_path}")
+        self.log("=" * 60)
+        compose_file = find_compose_file(inst_path)
+        env = read_env_file(os.path.join(inst_path, ".env"))
+        db_password = env.get("DB_PASSWORD")
+        if not compose_file or not db_password:
+            raise Exception(f"No existing installation found in {inst_path} (compose file and .env with DB_PASSWORD needed). "
+                            + self.FRESH_INSTALL_HINT)
+        self.log("✓ Keeping existing database password and data")
+
+        old_files = {}
+        for filename, path in (("docker-compose.yml", compose_file),
+                               (".env", os.path.join(inst_path, ".env")),
+                               ("immich.json", os.path.join(inst_path, "immich.json"))):
+            try:
+                with open(path, "r") as f:
+                    old_files[filename] = f.read()
+            except OSError:
+                pass
+        if not hot_path and not self.remove_hot_var.get():
+            # An empty path means "keep what is there", not "move everything back to the slow disk"
+            hot_path = existing_hot_path(env)
+            if hot_path:
+                self.log(f"✓ Keeping fast storage at {hot_path}")
+        new_files = render_config(inst_path, p_path, ext_path, db_password, tuning, hot_path,
+                                  self.job_config_var.get())
+        diff, changed = plan_update(old_files, new_files)
+
+        if diff:
+            self.log("Planned configuration changes:")
+            for line in diff:
+                # Context lines may contain the database password
+                self.log("  " + re.sub(r"(PASSWORD[:=]\s*)\S+", r"\1********", line))
+        else:
+            self.log("Configuration is unchanged")
+        self.log(f"Services to recreate for config changes: {', '.join(changed) if changed else 'none'}")
+        if diff and not self.confirm("Apply update?", f"Apply the configuration changes shown in the log?\n\n"
+                                                      f"Services to recreate: {', '.join(changed) or 'none'}"):
+            self.log("Update cancelled, nothing was changed")
+            return None
+
+        moves = hot_storage_moves(env, p_path, hot_path)
+        if moves and self.migrate_var.get():
+            self.migrate_hot_storage(sudo_pw, inst_path, moves)
+        elif moves:
+            self._warn_unmoved_hot_storage(moves)
+
+        # Keep the previous files next to the new ones
+        for filename, content in new_files.items():
+            path = compose_file if filename == "docker-compose.yml" else os.path.join(inst_path, filename)
+            if filename in old_files:
+                shutil.copyfile(path, path + ".bak")
+            with open(path, "w") as f:
+                f.write(content)
+        if diff:
+            self.log("✓ Configuration files updated (previous versions saved as *.bak)")
+
+        bundle = self.bundle_path.get()
+        if bundle:
+            self.import_bundle(sudo_pw, bundle)
+        else:
+            self.pull_images(sudo_pw, compose_images(new_files["docker-compose.yml"]), self.pull_concurrency_var.get())
+        for name in self.outdated_services(sudo_pw, new_files["docker-compose.yml"]):
+            if name not in changed:
+                self.log(f"  {name}: new image")
+                changed.append(name)
+
+        if changed:
+            self.log(f"Recreating: {', '.join(changed)}")
+            self.run_live_command(f"docker compose up -d --no-deps --force-recreate {' '.join(changed)}",
+                                  sudo_pw=sudo_pw, cwd=inst_path)
+        else:
+            self.log("✓ Everything is up to date, no service needs to be recreated")
+        # Starts anything that is not running; unchanged services are left alone
+        self.run_live_command("docker compose up -d", sudo_pw=sudo_pw, cwd=inst_path)
+        if moves and self.migrate_var.get():
+            # The verified copies are in use now; the old folders are deleted in the background
+            for name, (current, _) in moves.items():
+                self.log(f"Moving old {name} folder {current} to trash...")
+                self.move_to_trash(sudo_pw, current)
+            self.start_reaper(sudo_pw)
+        save_known_installations(load_known_installations() + [inst_path])
+
+        times = self.wait_until_ready(sudo_pw)
+        self.log("-----------------------------------------")
+        self.log("SUCCESS! Immich has been updated.")
+        self.log("-----------------------------------------")
+        self.notify("Success", "Immich updated!")
+        return times
+
+    def _copy_hot_storage(self, sudo_pw, name, source, target):
+        """One pass of MIGRATE_SCRIPT as root; raises if any file could not be copied and verified."""
+        summary = {}
+
+        def on_line(line):
+            parts = line.split(maxsplit=1)
+            if parts[0] == "PROGRESS":
+                copied, skipped, size = map(int, parts[1].split())
+                self.log(f"  {name}: {copied:,} files copied ({format_bytes(size)}), {skipped:,} already there")
+            elif parts[0] == "ERROR":
+                self.log(f"  {name}: ERROR {parts[1] if len(parts) > 1 else ''}")
+            elif parts[0] == "DONE":
+                summary["copied"], summary["skipped"], summary["bytes"], summary["errors"] = map(int, parts[1].split())
+
+        start = time.monotonic()
+        cmd = (f"{shlex.quote(sys.executable)} -c {shlex.quote(MIGRATE_SCRIPT)} {shlex.quote(source)} "
+               f"{shlex.quote(target)} {MIGRATION_WORKERS} {MIGRATION_REPORT_INTERVAL}")
+        returncode, _, _ = self.privileged_session(sudo_pw).run(cmd, on_line=on_line)
+        if returncode != 0 or not summary:
+            raise Exception(f"Copying {source} to {target} failed for {summary.get('errors', 'some')} file(s); "
+                            f"nothing was switched. Run the update again to resume the copy.")
+        self.log(f"  ✓ {name}: {summary['copied']:,} files copied and verified ({format_bytes(summary['bytes'])}), "
+                 f"{summary['skipped']:,} already there, in {format_duration(time.monotonic() - start)}")
+
+    def _warn_unmoved_hot_storage(self, moves):
+        for name, (current, new) in moves.items():
+            self.log(f"Warning: {name} stays in {current}; Immich will not see it at {new}. "
+                     f"Missing thumbnails can be regenerated with the 'Generate Thumbnails' job, profile pictures cannot.")
+
+    def _move_hot_storage_for_install(self, sudo_pw, p_path, hot_path):
+        """Fresh install with fast storage: moves the folders an earlier install left in the
+        photo storage, so the new mounts do not hide them (a restored database points at them).
+
+        Immich is not running yet, so one copy pass is enough.
+        """
+        moves = hot_storage_moves({}, p_path, hot_path)
+        if not moves:
+            return
+        if not self.migrate_var.get():
+            self._warn_unmoved_hot_storage(moves)
+            return
+        self.log(f"Copying {', '.join(moves)} from the photo storage to the fast storage...")
+        for name, (source, target) in moves.items():
+            self.log(f"  {source} -> {target}")
+            self._copy_hot_storage(sudo_pw, name, source, target)
+        for name, (source, _) in moves.items():
+            self.log(f"Moving old {name} folder {source} to trash...")
+            self.move_to_trash(sudo_pw, source)
+        self.start_reaper(sudo_pw)
+        self.log("✓ Hot storage copied and verified")
+
+    def migrate_hot_storage(self, sudo_pw, inst_path, moves):
+        """Copies hot storage folders to their new place before the new config is written.
+
+        The first pass runs while Immich is up. The server is then stopped for a
+        second pass that only copies what changed meanwhile, so the downtime is short.
+        """
+        self.log(f"Copying {', '.join(moves)} to the new storage (Immich keeps running)...")
+        for name, (source, target) in moves.items():
+            self.log(f"  {source} -> {target}")
+            self._copy_hot_storage(sudo_pw, name, source, target)
+        self.log("Stopping immich-server for the final pass...")
+        self.run_live_command("docker compose stop immich-server", sudo_pw=sudo_pw, cwd=inst_path)
+        try:
+            for name, (source, target) in moves.items():
+                self._copy_hot_storage(sudo_pw, name, source, target)
+        except Exception:
+            # The old configuration is still in place, so just bring the server back
+            self.run_live_command("docker compose start immich-server", sudo_pw=sudo_pw, cwd=inst_path)
+            raise
+        self.log("✓ Hot storage copied and verified")
+
+    def _discover_as_root(self, sudo_pw, request):
+        """Runs discover_installations through the root helper, see DISCOVERY_SCRIPT."""
+        cmd = (f"{shlex.quote(sys.executable)} -c {shlex.quote(DISCOVERY_SCRIPT)} "
+               f"{shlex.quote(os.path.abspath(__file__))} {shlex.quote(json.dumps(request))}")
+        returncode, stdout, stderr = self.privileged_session(sudo_pw).run(cmd)
+        if returncode != 0 or not stdout.strip():
+            raise Exception(stderr.strip().splitlines()[-1] if stderr.strip() else f"exit code {returncode}")
+        locations, scanned = json.loads(stdout.strip().splitlines()[-1])
+        return locations, scanned
+
+    def find_immich_installations(self, sudo_pw, rescan=False, skip_paths=()):
+        """Find all possible Immich installation directories.
+
+        Installations remembered from earlier runs are checked first; the disks
+        are only searched when there are none or when rescan is requested. The
+        search runs as root, so other users' private home directories are included.
+        """
+        self.log("Searching for existing Immich installations...")
+        start = time.monotonic()
+
+        # Known installations from the index, else a scan for compose files mentioning
+        # 'immich'; plus the common installation paths
+        request = {"known": load_known_installations(), "rescan": rescan, "roots": DISCOVERY_ROOTS,
+                   "patterns": COMMON_INSTALL_PATHS, "skip_paths": [p for p in skip_paths if p]}
+        try:
+            possible_locations, scanned = self._discover_as_root(sudo_pw, request)
+        except Exception as e:
+            self.log(f"Warning: Could not search as root ({e}); directories only root can read are skipped")
+            possible_locations, scanned = discover_installations(**request)
+        if not scanned:
+            self.log(f"  Using the installation(s) remembered from earlier runs, the disks were not searched. "
+                     f"{self.RESCAN_HINT}")
+
+        for path in possible_locations:
+            self.log(f"  Found: {path}")
+        self.log(f"  Search finished in {time.monotonic() - start:.1f}s")
+        self.tracer.record("discovery", "phase", start, time.monotonic() - start,
+                           rescan=scanned, found=len(possible_locations))
+
+        save_known_installations(possible_locations)
+        return possible_locations
+
+    def _remove_docker_resources(self, sudo_pw, kind):
+        """Removes all Immich containers/volumes/networks in bulk through the Engine API.
+
+        Without direct socket access (e.g. right after usermod) the requests go
+        through the sudo relay, see docker_api_request.
+        """
+        list_path, list_query, remove_path, remove_query = DOCKER_RESOURCES[kind]
+        query = dict(list_query, filters=json.dumps({"name": ["immich"]}))
+        listed = self.docker_api_request(sudo_pw, "GET", list_path, query) or []
+        if kind == "container":
+            items = [(c["Id"], c["Names"][0].lstrip("/") if c.get("Names") else c["Id"][:12]) for c in listed]
+        elif kind == "volume":
+            items = [(v["Name"], v["Name"]) for v in listed.get("Volumes") or []]
+        else:
+            items = [(n["Id"], n["Name"]) for n in listed]
+        if items:
+            self.log(f"Removing {len(items)} {kind}(s): {', '.join(label for _, label in items)}")
+            with ThreadPoolExecutor(max_workers=TEARDOWN_WORKERS) as pool:
+                list(pool.map(lambda item_id: self.docker_api_request(
+                    sudo_pw, "DELETE", remove_path.format(urllib.parse.quote(item_id, safe="")), remove_query),
+                    [item_id for item_id, _ in items]))
+        return len(items)
+
+    def _teardown_compose_down(self, sudo_pw, install_dir):
+        if not find_compose_file(install_dir):
+            return
+        self.log(f"Running 'docker compose down -v' in {install_dir}...")
+        try:
+            self.run_command("docker compose down -v --remove-orphans", sudo_pw=sudo_pw, cwd=install_dir)
+            self.log(f"✓ Stopped and removed containers from {install_dir}")
+        except Exception as e:
+            self.log(f"Warning: Could not run docker compose down in {install_dir}: {e}")
+
+    def _teardown_resources(self, sudo_pw, kind):
+        try:
+            count = self._remove_docker_resources(sudo_pw, kind)
+            if count:
+                self.log(f"✓ {count} {kind}(s) removed")
+            else:
+                self.log(f"No remaining Immich {kind}s found")
+        except Exception as e:
+            self.log(f"Warning: {e}")
+
+    def move_to_trash(self, sudo_pw, path):
+        """Renames path into a trash directory next to it, which is quick on any drive.
+
+        The trash lives on the same filesystem, so the rename is atomic. The
+        actual deletion is done later by the background reaper.
+        """
+        trash_dir = os.path.join(os.path.dirname(path.rstrip("/")), TRASH_DIR_NAME)
+        target = os.path.join(trash_dir, f"{os.path.basename(path.rstrip('/'))}-{time.strftime('%Y%m%d-%H%M%S')}-{secrets.token_hex(3)}")
+        # Remember the target before moving, so a crash right after the rename still gets cleaned up
+        update_pending_trash(lambda paths: paths + [target])
+        try:
+            self.run_command(f"mkdir -p {shlex.quote(trash_dir)} && mv -T {shlex.quote(path)} {shlex.quote(target)}",
+                             sudo_pw=sudo_pw)
+        except Exception:
+            update_pending_trash(lambda paths: [p for p in paths if p != target])
+            raise
+        return target
+
+    def start_reaper(self, sudo_pw):
+        """Starts a detached root process that deletes everything in the trash index.
+
+        It keeps going after the installer exits (a rollout slot or the headless
+        result does not wait for it); its progress is shown while we still run.
+        """
+        if not load_pending_trash():
+            return
+        try:
+            # Created by us first, so the log does not end up owned by root
+            with open(REAPER_LOG_FILE, "a"):
+                pass
+            offset = os.path.getsize(REAPER_LOG_FILE)
+        except OSError as e:
+            self.log(f"Warning: Background cleanup could not start: {e}")
+            return
+        ionice = "ionice -c3 " if shutil.which("ionice") else ""
+        cmd = (f"setsid nohup {ionice}nice -n 19 {shlex.quote(sys.executable)} -c {shlex.quote(REAPER_SCRIPT)} "
+               f"{shlex.quote(TRASH_INDEX_FILE)} {REAPER_BATCH_FILES} {REAPER_PAUSE} {REAPER_REPORT_INTERVAL} "
+               f">> {shlex.quote(REAPER_LOG_FILE)} 2>&1 < /dev/null &")
+        try:
+            self.run_command(cmd, sudo_pw=sudo_pw, name="start REAPER_SCRIPT")
+        except Exception as e:
+            self.log(f"Warning: Background cleanup could not start: {e}")
+            return
+        self.log(f"Background cleanup started; it continues after the installer exits (log: {REAPER_LOG_FILE})")
+        with self._trash_lock:
+            if self._reaper_thread and self._reaper_thread.is_alive():
+                return
+            self._reaper_thread = threading.Thread(target=self._follow_reaper, args=(offset,), daemon=True)
+            self._reaper_thread.start()
+
+    def _follow_reaper(self, offset):
+        """Copies the reaper's progress from REAPER_LOG_FILE into our log until it is idle."""
+        try:
+            with open(REAPER_LOG_FILE, "r") as f:
+                f.seek(offset)
+                while True:
+                    position = f.tell()
+                    line = f.readline()
+                    if not line.endswith("\n"):
+                        # Nothing new, or a line that is still being written
+                        f.seek(position)
+                        time.sleep(REAPER_FOLLOW_INTERVAL)
+                        continue
+                    kind, _, rest = line.rstrip("\n").partition(" ")
+                    if kind == "START":
+                        self.log(f"Background cleanup: deleting {rest}...")
+                    elif kind == "PROGRESS":
+                        files, size, path = rest.split(" ", 2)
+                        self.log(f"Background cleanup: {int(files):,} files ({format_bytes(int(size))}) deleted from {path}")
+                    elif kind == "FINISHED":
+                        files, size, seconds, path = rest.split(" ", 3)
+                        self.log(f"✓ Background cleanup finished {path} in {seconds}s "
+                                 f"({int(files):,} files, {format_bytes(int(size))})")
+                    elif kind == "FAILED":
+                        self.log(f"Warning: Background cleanup could not fully delete {rest}; it will be retried next run")
+                    elif kind == "IDLE":
+                        return
+        except (OSError, ValueError):
+            return
+
+    def _teardown_postgres(self, sudo_pw, install_dir):
+        """CRITICAL - Remove bind-mounted PostgreSQL data directory"""
+        postgres_dir = os.path.join(install_dir, "postgres")
+        if not os.path.exists(postgres_dir):
+            return
+        try:
+            # Rename now, delete in the background: a multi-GB database on an SD card takes minutes to unlink
+            trash_path = self.move_to_trash(sudo_pw, postgres_dir)
+            self.log(f"✓ Moved PostgreSQL data out of the way: {postgres_dir} -> {trash_path}")
+            return
+        except Exception as e:
+            self.log(f"Warning: Could not move {postgres_dir} to trash, deleting it now: {e}")
+        self.log(f"Deleting PostgreSQL data at: {postgres_dir}")
+        try:
+            # Use sudo to remove as postgres user may own these files
+            self.run_command(f"rm -rf '{postgres_dir}'", sudo_pw=sudo_pw)
+            self.log(f"✓ Deleted: {postgres_dir}")
+        except Exception as e:
+            self.log(f"Error deleting {postgres_dir}: {e}")
+            # Try with shutil as fallback
+            try:
+                shutil.rmtree(postgres_dir, ignore_errors=True)
+                self.log(f"✓ Deleted (fallback): {postgres_dir}")
+            except Exception as e2:
+                self.log(f"Could not delete {postgres_dir}: {e2}")
+
+    def _teardown_leftover_config(self, inst_path):
+        # Remove any leftover .env and compose file at the new installation path
+        for filename in ('.env',) + COMPOSE_FILENAMES:
+            filepath = os.path.join(inst_path, filename)
+            if os.path.exists(filepath):
+                try:
+                    os.remove(filepath)
+                    self.log(f"✓ Removed old {filename}")
+                except Exception as e:
+                    self.log(f"Warning: Could not remove {filepath}: {e}")
+
+    def _teardown_prune(self, sudo_pw):
+        self.log("Cleaning up orphaned Docker volumes...")
+        try:
+            self.docker_api_request(sudo_pw, "POST", "/volumes/prune")
+            self.log("✓ Orphaned volumes cleaned")
+        except Exception as e:
+            self.log(f"Warning: {e}")
+
+    def _database_container(self, sudo_pw):
+        """(running, compose directory, image) of the Immich database container; (False, None, None) if there is none."""
+        try:
+            info = self.docker_api_request(sudo_pw, "GET", f"/containers/{BACKUP_CONTAINER}/json") or {}
+        except Exception:
+            return False, None, None
+        config = info.get("Config") or {}
+        labels = config.get("Labels") or {}
+        return (bool((info.get("State") or {}).get("Running")), labels.get("com.docker.compose.project.working_dir"),
+                config.get("Image"))
+
+    def _wait_for_database(self, sudo_pw, timeout=BACKUP_READY_TIMEOUT):
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                self.run_command(f"docker exec {BACKUP_CONTAINER} pg_isready --dbname=immich --username=postgres",
+                                 sudo_pw=sudo_pw)
+                return
+            except Exception:
+                if time.monotonic() > deadline:
+                    raise Exception(f"The database did not accept connections within {timeout} s")
+                time.sleep(2)
+
+    def _table_counts(self, sudo_pw):
+        """Row counts of the BACKUP_COUNT_TABLES that exist in the running database."""
+        psql = (f"docker exec {BACKUP_CONTAINER} psql --username=postgres --dbname=immich "
+                f"--tuples-only --no-align --command=")
+        names = ", ".join(f"'{table}'" for table in BACKUP_COUNT_TABLES)
+        tables = self.run_command(psql + shlex.quote(f"SELECT tablename FROM pg_tables WHERE schemaname = 'public' "
+                                                     f"AND tablename IN ({names})"), sudo_pw=sudo_pw).split()
+        tables = [table for table in tables if table in BACKUP_COUNT_TABLES]
+        if not tables:
+            return {}
+        query = " UNION ALL ".join(f"SELECT '{table}', count(*) FROM \"{table}\"" for table in tables)
+        counts = {}
+        for line in self.run_command(psql + shlex.quote(query), sudo_pw=sudo_pw).splitlines():
+            name, _, count = line.partition("|")
+            if name in tables and count.strip().isdigit():
+                counts[name] = int(count)
+        return counts
+
+    @contextlib.contextmanager
+    def _postgres_env_file(self, install_dir):
+        """--env-file with the installation's DB_PASSWORD, so it stays off command lines and traces."""
+        password = read_env_file(os.path.join(install_dir, ".env")).get("DB_PASSWORD", "") if install_dir else ""
+        fd, path = tempfile.mkstemp(prefix="immich-db-", suffix=".env")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(f"PGPASSWORD={password}\n")
+            yield path
+        finally:
+            os.remove(path)
+
+    def _postgres_tool(self, tool, image, env_file, mount, args):
+        """Command that runs a PostgreSQL client in a one-off container next to the database.
+
+        The container shares the database's network, so it connects to
+        127.0.0.1, and runs as the current user, so the files it writes to the
+        bind mount belong to us.
+        """
+        return (f"docker run --rm --network container:{BACKUP_CONTAINER} --user {os.getuid()}:{os.getgid()} "
+                f"--env-file {shlex.quote(env_file)} -v {shlex.quote(mount)} --entrypoint {tool} "
+                f"{shlex.quote(image)} --host=127.0.0.1 --username=postgres {args}")
+
+    def backup_database(self, sudo_pw, backup_root, install_dir, image):
+        """Dumps the running Immich database into a new folder under backup_root and returns its path.
+
+        pg_dump writes a compressed directory-format dump with BACKUP_JOBS jobs
+        straight into the backup folder, so nothing is staged on the root
+        filesystem. The folder only gets its final name once the manifest is written.
+        """
+        start = time.monotonic()
+        target = os.path.join(backup_root, backup_name(install_dir))
+        partial = target + ".part"
+        os.makedirs(partial)
+        self.log(f"Backing up the database of {install_dir} ({BACKUP_JOBS} parallel jobs)...")
+        with self.tracer.span("backup-database", install_dir=install_dir):
+            try:
+                counts = self._table_counts(sudo_pw)
+                with self._postgres_env_file(install_dir) as env_file:
+                    self.run_command(self._postgres_tool(
+                        "pg_dump", image, env_file, f"{partial}:/backup",
+                        f"--dbname=immich --format=directory --jobs={BACKUP_JOBS} "
+                        f"--compress={BACKUP_COMPRESSLEVEL} --file=/backup"), sudo_pw=sudo_pw)
+                dump_seconds = time.monotonic() - start
+                size = sum(os.path.getsize(os.path.join(partial, name)) for name in os.listdir(partial))
+                with open(os.path.join(partial, BACKUP_INFO), "w") as f:
+                    json.dump({"source": install_dir, "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                               "image": image, "counts": counts}, f, indent=2)
+                write_manifest(partial)
+                os.rename(partial, target)
+            except Exception:
+                shutil.rmtree(partial, ignore_errors=True)
+                raise
+
+        seconds = time.monotonic() - start
+        rows = ", ".join(f"{count:,} {table}" for table, count in counts.items())
+        self.log(f"✓ Database backed up to {target}: {format_bytes(size)} in {format_duration(dump_seconds)} "
+                 f"({size / max(dump_seconds, 0.001) / 1e6:.1f} MB/s compressed), verified in "
+                 f"{format_duration(seconds - dump_seconds)}" + (f"; {rows}" if rows else ""))
+        return target
+
+    def _backup_before_removal(self, sudo_pw, installation_dirs, inst_path, backup_root):
+        """Backs up every database that is about to be removed. Returns {install dir: backup folder}.
+
+        All installations use the container name immich_postgres, so their
+        databases are started one at a time. If any backup fails, the running
+        installation is brought back and nothing is removed.
+        """
+        running, running_dir, _ = self._database_container(sudo_pw)
+        running_dir = (running_dir or inst_path) if running else None
+        dirs = [d for d in dict.fromkeys(installation_dirs + [inst_path])
+                if d and os.path.isdir(os.path.join(d, "postgres"))]
+        if running and running_dir not in dirs:
+            dirs.append(running_dir)
+        # The running database first, before anything is stopped
+        dirs.sort(key=lambda d: d != running_dir)
+        if not dirs:
+            self.log("No existing database found, nothing to back up")
+            return {}
+        unusable = [d for d in dirs if d != running_dir and not find_compose_file(d)]
+        if unusable:
+            raise Exception(f"Cannot start the database of {', '.join(unusable)} (no compose file) to back it up")
+
+        backups = {}
+        try:
+            if running:
+                # Nothing may change the database between the row counts and the dump
+                self.run_command("docker stop immich_server || true", sudo_pw=sudo_pw)
+            for d in dirs:
+                if d != running_dir:
+                    self.log(f"Starting the database of {d} for the backup...")
+                    self.run_command(f"docker rm -f {BACKUP_CONTAINER} || true", sudo_pw=sudo_pw)
+                    self.run_live_command("docker compose up -d database", sudo_pw=sudo_pw, cwd=d)
+                self._wait_for_database(sudo_pw)
+                _, _, image = self._database_container(sudo_pw)
+                backups[d] = self.backup_database(sudo_pw, backup_root, d, image)
+        except Exception:
+            if running and find_compose_file(running_dir):
+                self.log(f"Starting {running_dir} again...")
+                try:
+                    self.run_command(f"docker rm -f {BACKUP_CONTAINER} || true", sudo_pw=sudo_pw)
+                    self.run_live_command("docker compose up -d", sudo_pw=sudo_pw, cwd=running_dir)
+                except Exception as e:
+                    self.log(f"Warning: Could not start {running_dir} again: {e}")
+            raise
+        return backups
+
+    def restore_database(self, sudo_pw, inst_path, backup_dir):
+        """Loads a backup_database folder into the freshly started installation.
+
+        immich-server is stopped while the empty database it created is
+        replaced. The restore only counts as done when the row counts of the
+        main tables match the backup; otherwise immich-server stays stopped.
+        """
+        start = time.monotonic()
+        self.log(f"Verifying backup {backup_dir}...")
+        damaged = verify_backup(backup_dir)
+        if damaged:
+            raise Exception(f"Backup {backup_dir} is damaged ({', '.join(damaged[:5])}); it was not restored")
+        expected = read_backup_info(backup_dir).get("counts")
+        self._wait_for_database(sudo_pw)
+        _, _, image = self._database_container(sudo_pw)
+        self.log("Stopping immich-server for the restore...")
+        self.run_live_command("docker compose stop immich-server", sudo_pw=sudo_pw, cwd=inst_path)
+        docker_exec = f"docker exec {BACKUP_CONTAINER}"
+        with self.tracer.span("restore-database", backup=backup_dir):
+            # Immich created an empty schema on its first start; replace it with the backup
+            self.run_command(f"{docker_exec} psql --username=postgres --dbname=postgres --command="
+                             f"{shlex.quote('DROP DATABASE IF EXISTS immich WITH (FORCE)')}", sudo_pw=sudo_pw)
+            self.run_command(f"{docker_exec} createdb --username=postgres immich", sudo_pw=sudo_pw)
+            self.log(f"Restoring the database ({BACKUP_JOBS} parallel jobs)...")
+            with self._postgres_env_file(inst_path) as env_file:
+                returncode, _, stderr = self.privileged_session(sudo_pw).run(self._postgres_tool(
+                    "pg_restore", image, env_file, f"{backup_dir}:/backup:ro",
+                    f"--dbname=immich --jobs={BACKUP_JOBS} /backup"))
+            counts = self._table_counts(sudo_pw)
+
+        ignored = re.search(r"errors ignored on restore: (\d+)", stderr)
+        if expected:
+            mismatched = [f"{table}: {counts.get(table, 0):,} of {count:,} rows"
+                          for table, count in expected.items() if counts.get(table) != count]
+            if mismatched:
+                raise Exception(f"Restore from {backup_dir} is incomplete ({'; '.join(mismatched)}). "
+                                f"immich-server was left stopped; the backup is unchanged.")
+        elif returncode != 0:
+            raise Exception(f"pg_restore failed ({stderr.strip()[-300:]}). "
+                            f"immich-server was left stopped; the backup is unchanged.")
+        if returncode != 0:
+            # The data is complete, so these are harmless (e.g. objects Immich had already created)
+            self.log(f"Warning: pg_restore ignored {ignored.group(1) if ignored else 'some'} error(s); "
+                     f"all row counts match the backup")
+        self.run_live_command("docker compose start immich-server", sudo_pw=sudo_pw, cwd=inst_path)
+        seconds = time.monotonic() - start
+        size = sum(os.path.getsize(os.path.join(backup_dir, name)) for name in os.listdir(backup_dir))
+        rows = ", ".join(f"{count:,} {table}" for table, count in counts.items())
+        self.log(f"✓ Database restored from {backup_dir} in {format_duration(seconds)} "
+                 f"({format_bytes(size)}, {size / max(seconds, 0.001) / 1e6:.1f} MB/s)" + (f"; {rows}" if rows else ""))
+
+    def completely_remove_immich(self, sudo_pw, inst_path, skip_paths=(), backup_root=None):
+        """Completely remove all Immich containers, volumes, networks, and data.
+
+        The removal is a small dependency graph: 'compose down' runs in all
+        installation directories at once, each postgres directory is deleted as
+        soon as its own installation is down, and leftover containers, volumes
+        and networks are removed in bulk. With backup_root, every database is
+        backed up first and nothing is removed if a backup fails. Returns
+        {install dir: backup folder}.
+        """
+        try:
+            self.log("=" * 60)
+            self.log("REMOVING EXISTING IMMICH INSTALLATION")
+            self.log("=" * 60)
+
+            # Find all Immich installation directories
+            installation_dirs = self.find_immich_installations(
+                sudo_pw, rescan=self.rescan_var.get(), skip_paths=skip_paths)
+            if inst_path and inst_path not in installation_dirs:
+                postgres_dirs = installation_dirs + [inst_path]
+            else:
+                postgres_dirs = list(installation_dirs)
+
+            backups = {}
+            if backup_root:
+                try:
+                    backups = self._backup_before_removal(sudo_pw, installation_dirs, inst_path, backup_root)
+                except Exception as e:
+                    raise Exception(f"Database backup failed, nothing was removed: {e}")
+
+            graph = TaskGraph(max_workers=TEARDOWN_WORKERS, tracer=self.tracer)
+            down_steps = [
+                graph.add(f"down:{d}", lambda d=d: self._teardown_compose_down(sudo_pw, d))
+                for d in installation_dirs
+            ]
+            graph.add("containers", lambda: self._teardown_resources(sudo_pw, "container"), deps=down_steps)
+            graph.add("volumes", lambda: self._teardown_resources(sudo_pw, "volume"), deps=["containers"])
+            graph.add("networks", lambda: self._teardown_resources(sudo_pw, "network"), deps=["containers"])
+            postgres_steps = []
+            for d in postgres_dirs:
+                # A directory we could not 'compose down' is only wiped after the force removal
+                deps = [f"down:{d}"] if d in installation_dirs else ["containers"]
+                postgres_steps.append(graph.add(f"postgres:{d}", lambda d=d: self._teardown_postgres(sudo_pw, d), deps=deps))
+            if inst_path:
+                # Last: 'compose down' in inst_path needs its compose file and .env
+                graph.add("leftover-config", lambda: self._teardown_leftover_config(inst_path),
+                          deps=["containers"] + postgres_steps)
+            graph.add("prune", lambda: self._teardown_prune(sudo_pw),
+                      deps=["volumes", "networks"] + postgres_steps)
+
+            self.log(f"\nRunning {len(graph.steps)} removal steps ({TEARDOWN_WORKERS} at a time)...")
+            graph.run()
+            for name, error in graph.errors.items():
+                self.log(f"Warning: step '{name}' failed: {error}")
+
+            # Old data is deleted in the background while the new install continues
+            self.start_reaper(sudo_pw)
+
+            self.log("\n" + "=" * 60)
+            self.log("✓ COMPLETE REMOVAL FINISHED")
+            self.log("All Immich containers, volumes, networks, and data removed")
+            for backup in backups.values():
+                self.log(f"Database backup kept at {backup}")
+            if not backups:
+                self.log("Database will be created fresh with new password")
+            self.log("=" * 60 + "\n")
+            return backups
+
+        except Exception as e:
+            self.log(f"ERROR during removal: {str(e)}")
+            raise
+
+    def _log_step_status(self, graph, name, state):
+        """Live view of the install graph: one line per change plus who is running/waiting."""
+        if state == "running":
+            self.log(f"▶ {name} started")
+        elif state == "done":
+            self.log(f"✓ {name} done ({format_duration(graph.durations.get(name, 0))})")
+        elif state == "failed" and name in graph.optional:
+            self.log(f"Warning: {name} failed, continuing without it: {graph.errors.get(name)}")
+        elif state == "failed":
+            self.log(f"✗ {name} failed: {graph.errors.get(name)}")
+        elif state == "skipped":
+            self.log(f"- {name} skipped (a step it depends on failed)")
+        running = [n for n, st in graph.status.items() if st == "running"]
+        waiting = [n for n, st in graph.status.items() if st == "waiting"]
+        if running or waiting:
+            self.log(f"  Steps running: {', '.join(running) or '-'} | waiting: {', '.join(waiting) or '-'}")
+
+    def _check_docker(self, pw):
+        """Checks for Docker and installs it if missing."""
+        self.log("Checking for Docker...")
+        try:
+            self.run_command("docker --version")
+            self.log("Docker is already installed.")
+        except:
+            self.log("Docker not found. Installing...")
+
+            # --- Docker Install ---
+            self.log("Downloading Docker installation script...")
+            try:
+                urllib.request.urlretrieve("https://get.docker.com", "get-docker.sh")
+            except Exception as e:
+                raise Exception(f"Failed to download Docker script: {e}")
+
+            self.log("Running Docker installer...")
+            self.run_command("sh get-docker.sh", sudo_pw=pw)
+            self.log("Docker installed successfully.")
+
+    def _ensure_docker_group(self, pw):
+        # ALWAYS ensure user is in the docker group (even if docker was already installed)
+        user = os.getenv('USER')
+        self.log(f"Ensuring {user} is in 'docker' group...")
+        try:
+            self.run_command(f"usermod -aG docker {user}", sudo_pw=pw)
+        except Exception as e:
+            self.log(f"Warning: Could not add user to group: {e}")
+
+    def _tune(self, inst_path, p_path, ext_path):
+        # Pick settings for this hardware and show them before anything is changed
+        profile, tuning = hardware_tuning(inst_path, p_path, ext_path)
+        if self.prewarm_var.get() and profile["size"] != "small":
+            # Keep the prewarmed models loaded; small Pis still unload them to free RAM
+            tuning["ML_MODEL_TTL"] = 0
+        self.log("Tuning for this machine:")
+        for line in describe_tuning(profile, tuning):
+            self.log(f"  {line}")
+        if not self.job_config_var.get():
+            self.log("  The job values are not applied automatically. Set them in Immich under Administration > "
+                     "Settings > Job Settings (a job config file would make that page read-only).")
+        return tuning
+
+    def _preflight(self, inst_path, p_path, ext_path, hot_path=None):
+        # Storage preflight: short I/O tests on every configured path
+        self.log("Testing storage speed...")
+        paths = {"install": inst_path, "photos": p_path, "external": ext_path}
+        if hot_path:
+            paths["fast"] = hot_path
+        results = run_preflight(paths, self.log)
+        for warning in preflight_warnings(paths, results):
+            self.log(f"Warning: {warning}")
+        self.log(f"  Report saved to {PREFLIGHT_REPORT_FILE}")
+
+    def _scan_library(self, p_path, ext_path, hot_path=None):
+        # Tell the user up front what the first Immich library scan will cost
+        self.log(f"Scanning external library {ext_path}...")
+        stats = scan_library(ext_path, log=self.log, stop=self._install_finished)
+        estimate = estimate_workload(stats, read_cpuinfo()[0])
+        for line in describe_library(stats, estimate):
+            self.log(f"  {line}")
+        # Thumbnails and transcoded videos go to the fast storage, or else under the photo storage path
+        for warning in library_warnings(estimate, hot_path or p_path):
+            self.log(f"Warning: {warning}")
+        try:
+            os.makedirs(STATE_DIR, exist_ok=True)
+            with open(LIBRARY_REPORT_FILE, "w") as f:
+                json.dump({"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "path": ext_path,
+                           "stats": stats, "estimate": estimate}, f, indent=2)
+            self.log(f"  Report saved to {LIBRARY_REPORT_FILE}")
+        except OSError:
+            pass
+        return estimate
+
+    def _write_config(self, inst_path, p_path, ext_path, tuning, hot_path=None):
+        # Ensure Install Directory exists
+        if not os.path.exists(inst_path):
+            os.makedirs(inst_path)
+            self.log(f"Created installation directory: {inst_path}")
+
+        # Generate Credentials & Config
+        db_password = secrets.token_urlsafe(16)
+        self.log(f"Generated new database password: {db_password[:8]}... (truncated)")
+
+        # Create docker-compose.yml, .env file and Immich job settings
+        files = render_config(inst_path, p_path, ext_path, db_password, tuning, hot_path,
+                              self.job_config_var.get())
+        self.log(f"Writing configuration files to {inst_path}...")
+        for filename, content in files.items():
+            with open(os.path.join(inst_path, filename), "w") as f:
+                f.write(content)
+        self.log("✓ Configuration files written")
+
+    def _fetch_images(self, pw):
+        """Gets the images from DOCKER_COMPOSE_TEMPLATE; needs Docker but no config files."""
+        images = compose_images(DOCKER_COMPOSE_TEMPLATE)
+        self.log("Downloading Immich Images...")
+        self.log("This may take a while. Please wait...")
+        bundle = self.bundle_path.get()
+        if bundle:
+            # Offline install: no network pulls at all
+            self.import_bundle(pw, bundle)
+            return
+        try:
+            self.pull_images(pw, images, self.pull_concurrency_var.get())
+        except Exception as e:
+            self.log(f"Warning: Image download via Docker API failed ({e}), falling back to 'docker pull'")
+            for image in images:
+                self.run_live_command(f"docker pull {image}", sudo_pw=pw)
+
+    def _restore_backup(self, pw, inst_path, backup_root, backups=None):
+        # This run's backup of inst_path, or of the installation that was running (backed up
+        # first), or else the newest backup in the folder
+        backups = backups or {}
+        backup = backups.get(inst_path) or next(iter(backups.values()), None) or next(iter(find_backups(backup_root)), None)
+        if not backup:
+            self.log(f"No database backup found in {backup_root}, starting with an empty database")
+            return
+        self.restore_database(pw, inst_path, backup)
+
+    def _download_models(self):
+        """Downloads the ML models on this machine (no Docker needed). Returns the seconds it took, or None."""
+        self.log(f"Downloading machine learning models ({', '.join(ML_MODELS.values())})...")
+        start = time.monotonic()
+        try:
+            downloaded, total = fetch_models(ML_MODELS, ML_MODEL_DIR, self.log)
+        except Exception as e:
+            self.log(f"Warning: Could not download the machine learning models: {e}")
+            return None
+        seconds = time.monotonic() - start
+        self.log(f"✓ Models: {format_bytes(downloaded)} downloaded, {format_bytes(total - downloaded)} already there "
+                 f"({format_duration(seconds)}, {format_bytes(downloaded / max(seconds, 0.001))}/s)")
+        return seconds
+
+    def _fill_model_cache(self, pw, model_bundle=None, download_seconds=None):
+        """Copies the models into the model-cache volume. Returns True if the volume was filled."""
+        if not model_bundle and download_seconds is None:
+            return False  # The download failed and already said so
+        image = next(image for image in compose_images(DOCKER_COMPOSE_TEMPLATE) if "machine-learning" in image)
+        if model_bundle:
+            source = model_bundle
+
+            def feed(stdin):
+                with model_bundle_reader(model_bundle) as f:
+                    shutil.copyfileobj(f, stdin, BUNDLE_CHUNK_SIZE)
+        else:
+            source = ML_MODEL_DIR
+
+            def feed(stdin):
+                with tarfile.open(fileobj=stdin, mode="w|") as tar:
+                    for model_type, name in ML_MODELS.items():
+                        tar.add(os.path.join(ML_MODEL_DIR, model_type, name), arcname=f"{model_type}/{name}",
+                                filter=lambda info: None if info.name.endswith(".part") else info)
+
+        start = time.monotonic()
+        try:
+            # Labelled like compose's own volume, so 'docker compose up' uses it as is
+            self.run_command(f"docker volume create --label com.docker.compose.project=immich "
+                             f"--label com.docker.compose.volume=model-cache {ML_CACHE_VOLUME}", sudo_pw=pw)
+            sudo_stream_in(["docker", "run", "--rm", "-i", "-v", f"{ML_CACHE_VOLUME}:/cache", "--entrypoint", "tar",
+                            image, "-C", "/cache", "-xf", "-"], pw, feed)
+        except Exception as e:
+            self.log(f"Warning: Could not fill the model cache: {e}")
+            return False
+        self.log(f"✓ Model cache filled from {source} ({format_duration(time.monotonic() - start)})")
+        return True
+
+    def _warm_up_models(self, pw, filled, download_seconds=None, model_ttl=0):
+        """Loads the models with test requests, so the first real job runs at full speed.
+
+        Returns the seconds the first real job saves: the download, plus the
+        load time if the models stay loaded (model_ttl 0).
+        """
+        if not filled:
+            return None
+        self.log("Warming up machine learning (loading the models)...")
+        cmd = (f"docker exec immich_machine_learning python3 -c {shlex.quote(ML_WARMUP_SCRIPT)} "
+               f"{ML_MODELS['clip']} {ML_MODELS['facial-recognition']} {ML_WARMUP_TIMEOUT}")
+        try:
+            output = self.run_command(cmd, sudo_pw=pw, name="docker exec ML_WARMUP_SCRIPT")
+        except Exception as e:
+            self.log(f"Warning: Machine learning warmup failed: {e}")
+            return None
+        times = {}
+        for line in output.splitlines():
+            parts = line.split()
+            if len(parts) == 2 and parts[0] in ("COLD", "WARM"):
+                times[parts[0]] = float(parts[1])
+        if len(times) < 2:
+            self.log(f"Warning: Unexpected warmup output: {output.strip()[-200:]}")
+            return None
+        load_seconds = max(0.0, times["COLD"] - times["WARM"])
+        self.log(f"✓ Machine learning is warm: first request {times['COLD']:.1f}s, then {times['WARM']:.1f}s")
+        if model_ttl:
+            # The models are unloaded again after model_ttl idle seconds, so only the download is saved
+            saved = download_seconds or 0
+            self.log(f"  Models are unloaded after {model_ttl}s without jobs to free RAM; "
+                     f"the first job loads them again (about {load_seconds:.1f}s)")
+        else:
+            saved = (download_seconds or 0) + load_seconds
+        if saved:
+            self.log(f"  The first smart search and face detection jobs start about {format_duration(saved)} sooner")
+        return saved
+
+    def _start_immich(self, pw, inst_path):
+        self.log("Starting Immich containers...")
+        self.run_live_command("docker compose up -d", sudo_pw=pw, cwd=inst_path)
+
+        # Remember this install so the next run finds it without a disk scan
+        save_known_installations(load_known_installations() + [inst_path])
+
+    def install_logic(self):
+        """Runs the install (or update). Returns one of the EXIT_* codes."""
+        pw = self.root_pass.get()
+        inst_path = self.install_path.get()
+        p_path = self.photos_path.get()
+        ext_path = self.ext_lib_path.get()
+        hot_path = self.hot_storage_path.get() or None
+        backup_root = self.backup_path.get() or None
+        restore = self.restore_backup_var.get() and not self.update_var.get()
+
+        if not all([pw, inst_path, p_path, ext_path]):
+            self.notify("Error", "All fields are required.", error=True)
+            return EXIT_USAGE
+        if hot_path and not os.path.isabs(hot_path):
+            self.notify("Error", "The fast storage path must be an absolute path.", error=True)
+            return EXIT_USAGE
+        if hot_path and self.remove_hot_var.get():
+            self.notify("Error", "Either set a fast storage path or stop using fast storage, not both.", error=True)
+            return EXIT_USAGE
+        if backup_root and not os.path.isabs(backup_root):
+            self.notify("Error", "The database backup folder must be an absolute path.", error=True)
+            return EXIT_USAGE
+        if restore and not backup_root:
+            self.notify("Error", "Restoring the database needs a database backup folder.", error=True)
+            return EXIT_USAGE
+
+        self.tracer = Tracer("install")
+        # Set once the required steps are through; advisory steps then wrap up
+        self._install_finished = threading.Event()
+        graph = None
+        try:
+            # Finish deleting data trashed by an earlier, interrupted run
+            if load_pending_trash():
+                self.log("Resuming background cleanup of old data...")
+                self.start_reaper(pw)
+
+            # The install is a graph of steps: the image download starts as soon as Docker
+            # works and overlaps with the storage test and the removal of old installs.
+            graph = TaskGraph(max_workers=INSTALL_WORKERS,
+                              on_status=lambda name, state: self._log_step_status(graph, name, state),
+                              tracer=self.tracer)
+            graph.add("tuning", lambda: self._tune(inst_path, p_path, ext_path))
+            if self.preflight_var.get():
+                graph.add("preflight", lambda: self._preflight(inst_path, p_path, ext_path, hot_path), optional=True)
+            graph.add("docker", lambda: self._check_docker(pw))
+            graph.add("docker-group", lambda: self._ensure_docker_group(pw), deps=["docker"])
+
+            update = self.update_var.get()
+            if update:
+                # Update mode: keep database and photos, only recreate what changed
+                graph.add("update", lambda: self.update_existing(pw, inst_path, p_path, ext_path, graph.results["tuning"],
+                                                                 hot_path),
+                          deps=["tuning", "docker"])
+            else:
+                config_deps = ["tuning"]
+                if self.stop_existing_var.get():
+                    # Removal also deletes old config files in inst_path, so it has to finish first
+                    graph.add("remove-existing", lambda: self.completely_remove_immich(
+                                  pw, inst_path, skip_paths=(p_path, ext_path, backup_root), backup_root=backup_root),
+                              deps=["docker"])
+                    config_deps.append("remove-existing")
+                graph.add("config", lambda: self._write_config(inst_path, p_path, ext_path, graph.results["tuning"],
+                                                               hot_path),
+                          deps=config_deps)
+                graph.add("images", lambda: self._fetch_images(pw), deps=["docker"])
+                model_bundle = self.model_bundle_path.get() or None
+                if self.prewarm_var.get() and not model_bundle:
+                    # Needs no Docker, so it overlaps with the removal and the image download
+                    graph.add("models-download", self._download_models, optional=True)
+                start_deps = ["config", "images"]
+                if hot_path:
+                    # After the removal, so no old container writes to the folders being copied
+                    graph.add("hot-storage", lambda: self._move_hot_storage_for_install(pw, p_path, hot_path),
+                              deps=["remove-existing"] if "remove-existing" in graph.steps else [])
+                    start_deps.append("hot-storage")
+                graph.add("start", lambda: self._start_immich(pw, inst_path), deps=start_deps)
+                ready_deps = ["start"]
+                if restore:
+                    graph.add("restore", lambda: self._restore_backup(pw, inst_path, backup_root,
+                                                                      graph.results.get("remove-existing")),
+                              deps=["start"])
+                    ready_deps = ["restore"]
+                graph.add("readiness", lambda: self.wait_until_ready(pw), deps=ready_deps)
+                if self.prewarm_var.get():
+                    # Into the volume while the database initialises (the removal deletes Immich's volumes)
+                    model_deps = ["images"] + [step for step in ("remove-existing", "models-download")
+                                               if step in graph.steps]
+                    graph.add("models", lambda: self._fill_model_cache(pw, model_bundle,
+                                                                       graph.results.get("models-download")),
+                              deps=model_deps, optional=True)
+                    graph.add("warmup", lambda: self._warm_up_models(pw, graph.results["models"],
+                                                                     graph.results.get("models-download"),
+                                                                     graph.results["tuning"]["ML_MODEL_TTL"]),
+                              deps=["models", "readiness"], optional=True)
+
+            if self.library_scan_var.get():
+                # Stopped when the install is done, its estimate then covers what was seen so far
+                graph.add("library-scan", lambda: self._scan_library(p_path, ext_path, hot_path), optional=True)
+
+            self.log("-----------------------------------------")
+            self.log(f"Running {len(graph.steps)} install steps ({INSTALL_WORKERS} at a time, "
+                     f"advisory steps alongside)...")
+            start = time.monotonic()
+            graph.run()
+            self._install_finished.set()
+            errors = graph.fatal_errors()
+            if errors:
+                name, error = next(iter(errors.items()))
+                raise Exception(f"Step '{name}' failed: {error}")
+            if update:
+                times = graph.results["update"]
+                if times is None:
+                    return EXIT_CANCELLED
+                return EXIT_OK if all(seconds is not None for seconds in times.values()) else EXIT_NOT_READY
+
+            times = graph.results["readiness"]
+            ready = all(seconds is not None for seconds in times.values())
+            self.log("-----------------------------------------")
+            if ready:
+                self.log(f"SUCCESS! Immich is ready (install took {format_duration(time.monotonic() - start)}).")
+            else:
+                self.log("SUCCESS! Immich is starting up.")
+            self.log("Access Immich at: http://<YOUR_PI_IP>:2283")
+            self.log("-----------------------------------------")
+            self.log("NOTE: To run 'docker' commands without sudo later,")
+            self.log("you MUST reboot your Raspberry Pi or log out/in.")
+            self.log("-----------------------------------------")
+            self.notify("Success", "Immich Installed!\n\nPlease reboot your system to finalize Docker permissions.")
+            return EXIT_OK if ready else EXIT_NOT_READY
+
+        except Exception as e:
+            self.log(f"ERROR: {str(e)}")
+            self.notify("Installation Failed", str(e), error=True)
+            return EXIT_FAILED
+        finally:
+            self._install_finished.set()
+            if graph is not None and graph.pending_optional():
+                self.log(f"Finishing advisory steps: {', '.join(graph.pending_optional())}")
+                graph.wait_optional()
+            self.close_privileged_session()
+            self.write_trace()
+            if os.path.exists("get-docker.sh"):
+                os.remove("get-docker.sh")
+
+    def start_install(self):
+        self.btn_install.config(state='disabled')
+
+        def run():
+            self.install_logic()
+            self.btn_install.config(state='normal')
+
+        threading.Thread(target=run, daemon=True).start()
+
+
+class HeadlessInstaller(ImmichInstallerApp):
+    """Runs the same install steps without a window, for headless machines.
+
+    Settings come from load_settings; progress goes to stdout (see ConsoleSink).
+    """
+
+    FRESH_INSTALL_HINT = "Use --no-update (or \"update\": false in the config file) for a fresh install."
+    RESCAN_HINT = "Use --rescan if an installation is missing."
+
+    def __init__(self, settings, output="text", assume_yes=False):
+        self.root = ConsoleRoot()
+        self.root_pass = Setting(settings["sudo_password"])
+        self.install_path = Setting(settings["install_path"])
+        self.photos_path = Setting(settings["photos_path"])
+        self.ext_lib_path = Setting(settings["external_library_path"])
+        self.hot_storage_path = Setting(settings["hot_storage_path"])
+        self.bundle_path = Setting(settings["bundle"])
+        self.backup_path = Setting(settings["backup_path"])
+        self.model_bundle_path = Setting(settings["model_bundle"])
+        self.stop_existing_var = Setting(settings["stop_existing"])
+        self.rescan_var = Setting(settings["rescan"])
+        self.preflight_var = Setting(settings["preflight"])
+        self.library_scan_var = Setting(settings["library_scan"])
+        self.job_config_var = Setting(settings["job_config_file"])
+        self.update_var = Setting(settings["update"])
+        self.migrate_var = Setting(settings["migrate_hot_storage"])
+        self.remove_hot_var = Setting(settings["remove_hot_storage"])
+        self.restore_backup_var = Setting(settings["restore_backup"])
+        self.prewarm_var = Setting(settings["prewarm_models"])
+        self.pull_concurrency_var = Setting(settings["pull_concurrency"])
+        self.assume_yes = assume_yes
+        self._init_state()
+        self.log_sink = ConsoleSink(output)
+
+    def _show_progress(self, text, fraction):
+        self.log_sink.progress(text, fraction)
+
+    def notify(self, title, message, error=False):
+        # The same information is already in the log
+        self.log_sink.emit("error" if error else "notice", title=title, message=message)
+
+    def confirm(self, title, message):
+        if not self.assume_yes:
+            self.log(f"{title} Not confirmed; run again with --yes to apply.")
+        return self.assume_yes
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Immich installer for Raspberry Pi. Opens the installer window unless "
+                    "--config or --headless is given.")
+    parser.add_argument("--config", help="JSON file with the install settings (keys: "
+                                         f"{', '.join(CONFIG_DEFAULTS)})")
+    parser.add_argument("--headless", action="store_true", help="run without a window")
+    parser.add_argument("--install-path", dest="install_path", help="where to install Immich")
+    parser.add_argument("--photos-path", dest="photos_path", help="where to store photo files")
+    parser.add_argument("--external-library", dest="external_library_path", help="external library path")
+    parser.add_argument("--hot-storage", dest="hot_storage_path",
+                        help="fast storage for thumbnails, transcoded videos and profile pictures")
+    parser.add_argument("--remove-hot-storage", dest="remove_hot_storage", action="store_true", default=None,
+                        help="with --update and no --hot-storage: move the fast storage folders back to the photo storage")
+    parser.add_argument("--no-migrate", dest="migrate_hot_storage", action="store_false", default=None,
+                        help="do not move existing thumbnails when the fast storage changes (--update)")
+    parser.add_argument("--bundle", help="offline image bundle to install from")
+    parser.add_argument("--model-bundle", dest="model_bundle",
+                        help="machine learning model bundle (tar.gz of the model cache) to install from")
+    parser.add_argument("--no-prewarm-models", dest="prewarm_models", action="store_false", default=None,
+                        help="do not download and load the machine learning models during install")
+    parser.add_argument("--pull-concurrency", dest="pull_concurrency", type=int,
+                        help=f"images downloaded at the same time (default {PULL_CONCURRENCY}, 1 on slow Wi-Fi)")
+    parser.add_argument("--backup-path", dest="backup_path",
+                        help="back up the database into this folder before removing existing installations")
+    parser.add_argument("--restore-backup", dest="restore_backup", action="store_true", default=None,
+                        help="restore the database backup into the new installation")
+    parser.add_argument("--update", action="store_true", default=None,
+                        help="update the existing installation, keeping the database")
+    parser.add_argument("--no-update", dest="update", action="store_false", default=None,
+                        help="install fresh even if the config file sets \"update\"")
+    parser.add_argument("--keep-existing", dest="stop_existing", action="store_false", default=None,
+                        help="do not remove existing Immich installations")
+    parser.add_argument("--rescan", action="store_true", default=None,
+                        help="search the disks for installations even if some are known")
+    parser.add_argument("--no-preflight", dest="preflight", action="store_false", default=None,
+                        help="skip the storage speed test")
+    parser.add_argument("--job-config-file", dest="job_config_file", action="store_true", default=None,
+                        help="apply the tuned job concurrency with a config file; Immich's Settings page becomes read-only")
+    parser.add_argument("--no-library-scan", dest="library_scan", action="store_false", default=None,
+                        help="skip the external library pre-scan")
+    parser.add_argument("--export-bundle", metavar="PATH",
+                        help="download the images and write an offline bundle instead of installing")
+    parser.add_argument("--fleet", metavar="INVENTORY",
+                        help="install on all hosts in this inventory file (JSON) instead of this machine")
+    parser.add_argument("--transport", choices=["ssh", "local"], default="ssh",
+                        help="how --fleet reaches the hosts (local: run each host in a directory here, for testing)")
+    parser.add_argument("--concurrency", type=int, default=FLEET_CONCURRENCY,
+                        help=f"hosts installed at the same time with --fleet (default {FLEET_CONCURRENCY})")
+    parser.add_argument("--retries", type=int, default=FLEET_RETRIES,
+                        help=f"extra attempts for hosts that failed with --fleet (default {FLEET_RETRIES})")
+    parser.add_argument("--password-stdin", action="store_true",
+                        help=f"read the sudo password from stdin (or set {SUDO_PASSWORD_ENV})")
+    parser.add_argument("--yes", action="store_true", help="apply update changes without asking")
+    parser.add_argument("--output", choices=["text", "json"], default="text",
+                        help="progress format on stdout (json: one object per line)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Command-line entry point. Returns the process exit code."""
+    args = parse_args(argv)
+    if not (args.config or args.headless or args.export_bundle or args.fleet):
+        load_tk()
+        root = tk.Tk()
+        ImmichInstallerApp(root)
+        root.mainloop()
+        return EXIT_OK
+
+    overrides = {key: getattr(args, key) for key in CONFIG_DEFAULTS if hasattr(args, key)}
+    password = sys.stdin.readline().rstrip("\n") if args.password_stdin else None
+    if args.fleet:
+        return fleet_main(args, overrides, password)
+    try:
+        settings = load_settings(args.config, overrides, password)
+    except Exception as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        return EXIT_USAGE
+    required = ["sudo_password"] if args.export_bundle else ["sudo_password", "install_path", "photos_path",
+                                                             "external_library_path"]
+    missing = [key for key in required if not settings[key]]
+    if missing:
+        print(f"ERROR: Missing setting(s): {', '.join(missing)} (see --help)", file=sys.stderr)
+        return EXIT_USAGE
+
+    app = HeadlessInstaller(settings, output=args.output, assume_yes=args.yes)
+    if args.export_bundle:
+        code = app.export_logic(os.path.abspath(args.export_bundle))
+    else:
+        code = app.install_logic()
+    app.log_sink.emit("result", exit_code=code)
+    return code
+
+
+def fleet_main(args, overrides, password):
+    try:
+        hosts = load_inventory(args.fleet, overrides)
+    except Exception as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        return EXIT_USAGE
+    password = password if password is not None else os.environ.get(SUDO_PASSWORD_ENV, "")
+    missing = [host["host"] for host in hosts if not (host["sudo_password"] or password)]
+    if missing:
+        print(f"ERROR: No sudo password for {', '.join(missing)} (use --password-stdin or {SUDO_PASSWORD_ENV})",
+              file=sys.stderr)
+        return EXIT_USAGE
+    for bundle in {host[key] for host in hosts for key in FLEET_BUNDLE_KEYS if host[key]}:
+        if not os.path.isfile(bundle):
+            print(f"ERROR: Bundle not found: {bundle}", file=sys.stderr)
+            return EXIT_USAGE
+
+    log_dir = os.path.join(FLEET_LOG_DIR, time.strftime("%Y%m%d-%H%M%S"))
+    if args.transport == "local":
+        transport = lambda host: LocalTransport(host, os.path.join(log_dir, "hosts"))
+    else:
+        transport = SSHTransport
+    rollout = FleetRollout(hosts, transport, password=password, concurrency=args.concurrency,
+                           retries=args.retries, assume_yes=args.yes, output=args.output, log_dir=log_dir)
+    if args.output == "text":
+        print(f"Installing on {len(hosts)} host(s), {rollout.concurrency} at a time. Logs: {log_dir}", flush=True)
+    codes = rollout.run()
+    failed = [name for name, code in codes.items() if code in (EXIT_FAILED, EXIT_USAGE)]
+    if args.output == "text":
+        ok = sum(code == EXIT_OK for code in codes.values())
+        print(f"{ok}/{len(codes)} host(s) installed" + (f"; failed: {', '.join(failed)}" if failed else ""))
+    if failed:
+        return EXIT_FAILED
+    return max(codes.values())
 
-    def start_install(self):
-        self.btn_install.config(state='disabled')
-        threading.Thread(target=self.install_logic, daemon=True).start()
 
 if __name__ == "__main__":
-    root = tk.Tk()
-    app = ImmichInstallerApp(root)
-    root.mainloop()
+    sys.exit(main())
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""Tests for the image download, against benchmark.py's fake Docker Engine API.
+
+Run with: python3 -m unittest test_installer
+"""
+import io
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+import installer
+from benchmark import FakeEngine, _UnixServer, make_handler
+
+IMAGE = "ghcr.io/immich-app/immich-server:release"
+OTHER_IMAGE = "docker.io/valkey/valkey:8"
+
+
+class PullImagesTest(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp(prefix="immich-test-")
+        self.engine = FakeEngine(pull_events=20, fail_rate=0.0, latency=0.0)
+        socket_path = os.path.join(self.workdir, "docker.sock")
+        self.server = _UnixServer(socket_path, make_handler(self.engine))
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        self.saved = {name: getattr(installer, name) for name in ("DOCKER_SOCKET", "PULL_RETRY_BACKOFF")}
+        installer.DOCKER_SOCKET = socket_path
+        installer.PULL_RETRY_BACKOFF = 0
+
+    def tearDown(self):
+        for name, value in self.saved.items():
+            setattr(installer, name, value)
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def make_app(self, **overrides):
+        settings = installer.load_settings(overrides=overrides, password="test")
+        app = installer.HeadlessInstaller(settings)
+        self.output = io.StringIO()
+        app.log_sink = installer.ConsoleSink("text", stream=self.output, log_file=os.devnull)
+        return app
+
+    def test_skips_images_that_are_up_to_date(self):
+        self.engine.present.add(IMAGE)
+        app = self.make_app()
+        app.pull_images("test", [IMAGE, OTHER_IMAGE])
+        self.assertEqual(self.engine.pulls, 1)
+        self.assertIn(f"✓ {IMAGE} is up to date, skipping download", self.output.getvalue())
+        self.assertIn(OTHER_IMAGE, self.engine.present)
+
+    def test_no_pull_when_everything_is_up_to_date(self):
+        self.engine.present.update({IMAGE, OTHER_IMAGE})
+        self.make_app().pull_images("test", [IMAGE, OTHER_IMAGE])
+        self.assertEqual(self.engine.pulls, 0)
+
+    def test_retries_a_failed_pull(self):
+        self.engine.fail_first = 1
+        self.make_app().pull_images("test", [IMAGE])
+        self.assertEqual(self.engine.pulls, 2)
+        self.assertEqual(self.engine.failures, 1)
+        self.assertIn(IMAGE, self.engine.present)
+        self.assertIn(f"Retrying {IMAGE}", self.output.getvalue())
+
+    def test_gives_up_after_the_last_retry(self):
+        self.engine.fail_first = installer.PULL_RETRIES
+        app = self.make_app()
+        with self.assertRaisesRegex(Exception, "Download failed for"):
+            app.pull_images("test", [IMAGE, OTHER_IMAGE], concurrency=1)
+        # The other image is still downloaded
+        self.assertEqual(self.engine.pulls, installer.PULL_RETRIES + 1)
+        self.assertEqual(self.engine.present, {OTHER_IMAGE})
+
+    def test_pull_concurrency_setting(self):
+        images = installer.compose_images(installer.DOCKER_COMPOSE_TEMPLATE)
+        self.engine.layer_delay = 0.05
+        self.make_app(pull_concurrency=1)._fetch_images("test")
+        self.assertEqual(self.engine.max_active, 1)
+        self.assertEqual(self.engine.present, set(images))
+
+        self.engine.present.clear()
+        self.make_app(pull_concurrency=len(images))._fetch_images("test")
+        self.assertGreater(self.engine.max_active, 1)
+
+    def test_pull_concurrency_must_be_positive(self):
+        with self.assertRaisesRegex(Exception, "pull_concurrency"):
+            installer.load_settings(overrides={"pull_concurrency": 0}, password="test")
+
+
+if __name__ == "__main__":
+    unittest.main()